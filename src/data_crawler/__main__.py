@@ -1,36 +1,233 @@
 import asyncio
 import logging
 
+from pathlib import Path
+
+from httpx import AsyncClient, Client
+
+from src.data_crawler.cli import get_args
 from src.data_crawler.logger import safely_start_logger
-from src.data_crawler.constants import DATA_SRC_URLS, N_PAGES, LOGGER_NAME
+from src.data_crawler.constants import (
+    DATA_SRC_URLS, N_PAGES, LOGGER_NAME, HTTP_CLIENT_CONFIG, DATA_JSONL_PATH, NO_REQUEST_CONSUMERS, DATASET_DIR,
+    NO_CONVERSION_WORKERS, BLOB_DOCUMENT_INDEX_PATH, TRACE_PATH, CONVERSION_PROFILE, PAGE_TRIAGE
+)
+from src.data_crawler.conversion import ConversionPool, convert_blobs
+from src.data_crawler.politeness import HostScheduler, SharedHostScheduler
+from src.data_crawler.frontier import SqliteFrontier
+from src.data_crawler.frontier.sqlite_frontier import get_worker_id
+from src.data_crawler.tracing import tracer
 from src.data_crawler.scraping import scrape_ar_stocks_table, scrape_hl_index_stocks_table
 from src.data_crawler.scrape_requests.handlers.scrape_request_handler import scrape_request_handler
+from src.data_crawler.storage import (
+    CrawlState, ValidatorStore, ResponseCache, DocumentIndex, JsonlWriter, ShardedDatasetWriter, BlobStore, Checkpoint,
+    RedirectMap, ConversionCache
+)
 
 
 logger: logging.Logger = logging.getLogger(LOGGER_NAME)
 
 
-async def main():
+async def main(
+        fresh: bool = False,
+        record: bool = False,
+        replay: bool = False,
+        output_format: str = 'jsonl',
+        shard_size: int = 256,
+        metrics_port: int or None = None,
+        frontier_path: str or None = None,
+        defer_conversion: bool = False,
+        trace_sample_rate: float or None = None,
+        conversion_profile: str = CONVERSION_PROFILE,
+        triage: bool = PAGE_TRIAGE
+):
     await safely_start_logger()     # initialize the logger
 
     logger.info(f'starting')
 
+    # Record every GET response into the HTTP cache if asked to, or serve them from it when replaying
+    response_cache = ResponseCache(replay=replay) if record or replay else None
+    if response_cache is not None:
+        client = AsyncClient(**HTTP_CLIENT_CONFIG, transport=response_cache.async_transport())
+        sync_client = Client(**HTTP_CLIENT_CONFIG, transport=response_cache.transport())
+    else:
+        client, sync_client = AsyncClient(**HTTP_CLIENT_CONFIG), Client(**HTTP_CLIENT_CONFIG)
+
+    # Convert the PDFs linked under several urls only once
+    document_index = DocumentIndex()
+
+    # Convert the useful pages of the PDFs with the selected profile, cheaper profiles can be upgraded later, reusing
+    # the conversions of the earlier runs and of the pdf_converter
+    conversion_cache = ConversionCache()
+    conversion_pool = ConversionPool(profile=conversion_profile, triage=triage, cache=conversion_cache)
+
+    # Store the PDFs to convert them later with the convert command, instead of converting them while crawling
+    blob_store = BlobStore() if defer_conversion else None
+
+    if frontier_path is not None and (record or replay):
+        logger.warning('The shared frontier is not used when recording or replaying, crawling in a single worker.')
+        frontier_path = None
+
+    # Write the documents into data.jsonl, or into the compressed shards of the dataset
+    dataset = None
+    if output_format != 'jsonl':
+        dataset = ShardedDatasetWriter(
+            DATASET_DIR, compression=output_format, shard_size=shard_size * 1024 * 1024,
+            name='data' if frontier_path is None else f'data-{get_worker_id()}'     # shards of each worker
+        )
+    writer = JsonlWriter(datasets={DATA_JSONL_PATH: dataset} if dataset is not None else None)
+
+    if replay:
+        # Rebuild the whole dataset from the cache, as fast as the disk allows
+        logger.info('Replaying the recorded crawl, the dataset is rebuilt from the HTTP cache.')
+        Path(DATA_JSONL_PATH).unlink(missing_ok=True)
+        if dataset is not None:
+            dataset.clear()
+        document_index.clear_outputs()
+        crawl_state, validator_store, checkpoint, redirect_map = None, None, None, None   # urls as they were recorded
+        scheduler = HostScheduler(max_in_flight=NO_REQUEST_CONSUMERS, ignore_delays=True)
+        pending_requests = []
+    elif record:
+        # Request every url again, unconditionally, so the cache holds the whole crawl the replays rebuild the dataset
+        # from, including the documents completed and the pages left unchanged since the earlier runs
+        logger.info('Recording a fresh crawl, the crawl state and the validators of the earlier runs are not used.')
+        crawl_state, validator_store, checkpoint, redirect_map = None, None, None, None
+        scheduler = None
+        pending_requests = []
+    else:
+        # Resume the last interrupted crawl run, or start a new one
+        crawl_state, validator_store, redirect_map = CrawlState(), ValidatorStore(), RedirectMap()
+        scheduler = None
+        crawl_state.start(fresh=fresh)
+        pending_requests = crawl_state.pending_requests()
+        logger.info(f'Got {len(pending_requests)} pending requests from the crawl state.')
+
+        # Queues and downloaded documents of the last stopped crawl, checkpointed again if this one is stopped
+        checkpoint = Checkpoint()
+        if not crawl_state.is_resumed:
+            checkpoint.clear(payloads=True)
+
+    # Share the requests and the per host crawl delays with the other workers of the run
+    frontier = None
+    if frontier_path is not None:
+        frontier = SqliteFrontier(client, frontier_path, run_id=crawl_state.run_id)
+        scheduler = SharedHostScheduler(frontier_path)
+        checkpoint = None   # the requests of a stopped worker are claimed again by the others once their lease expires
+        logger.info(f'Crawling as worker {frontier.worker_id} of the shared frontier {frontier_path}.')
+
     # Get stocks list from HL Stocks Table
     hr_scrape_requests = await scrape_hl_index_stocks_table(
         DATA_SRC_URLS['hl-base'] + DATA_SRC_URLS['hl-ftse-all-share-index'],
-        N_PAGES
+        N_PAGES,
+        client
     )
 
     # Get stocks list from AR Stocks Table
-    ar_scrape_requests = scrape_ar_stocks_table(DATA_SRC_URLS['ar-base'] + DATA_SRC_URLS['ar-ftse-all-share-index'])
+    ar_scrape_requests = scrape_ar_stocks_table(
+        DATA_SRC_URLS['ar-base'] + DATA_SRC_URLS['ar-ftse-all-share-index'],
+        sync_client
+    )
 
-    scrape_requests = hr_scrape_requests + ar_scrape_requests
+    scrape_requests = pending_requests + hr_scrape_requests + ar_scrape_requests
+
+    # Trace a sample of the requests through the crawler's stages
+    if trace_sample_rate is not None:
+        tracer.start(TRACE_PATH, trace_sample_rate)
 
     # Start the scraping process
-    await scrape_request_handler(scrape_requests)
+    finished = await scrape_request_handler(
+        scrape_requests, client,
+        crawl_state=crawl_state, validator_store=validator_store, scheduler=scheduler, document_index=document_index,
+        writer=writer, metrics_port=metrics_port, task_queue=frontier, blob_store=blob_store, checkpoint=checkpoint,
+        redirect_map=redirect_map, conversion_pool=conversion_pool
+    )
+    try:
+        await writer.close()
+    except Exception:
+        finished = False    # the run is resumed by the next crawl, the records left unwritten are crawled again
+        raise
+    finally:
+        tracer.stop()
+
+        if frontier is not None:
+            logger.info(f'Frontier stats: {frontier.stats()}')
+            frontier.close()
+            scheduler.close()
+
+        if crawl_state is not None:
+            if finished:
+                crawl_state.finish()
+            else:
+                logger.info(f'Crawl run {crawl_state.run_id} stopped, it is resumed by the next crawl.')
+            crawl_state.close()
+        if validator_store is not None:
+            validator_store.close()
+        if redirect_map is not None:
+            logger.info(f'Redirect map stats: {redirect_map.stats()}')
+            redirect_map.close()
+        document_index.close()
+        logger.info(f'Conversion cache stats: {conversion_cache.stats()}')
+        conversion_cache.close()
+        if blob_store is not None:
+            logger.info(f'Blob store stats: {blob_store.stats()}')
+            blob_store.close()
+        await client.aclose()
+        sync_client.close()
+        if response_cache is not None:
+            logger.info(f'HTTP cache stats: {response_cache.stats()}')
+            response_cache.close()
+
+    logger.info('DONE')
+
+
+async def convert(
+        reconvert: bool = False,
+        workers: int = NO_CONVERSION_WORKERS,
+        conversion_profile: str = CONVERSION_PROFILE,
+        triage: bool = PAGE_TRIAGE,
+        output_format: str = 'jsonl',
+        shard_size: int = 256
+):
+    await safely_start_logger()     # initialize the logger
+
+    logger.info(f'starting convert stage')
+
+    # Write the documents into documents.jsonl, or into shards of their own in the crawl's sharded dataset
+    dataset = None
+    if output_format != 'jsonl':
+        dataset = ShardedDatasetWriter(
+            DATASET_DIR, compression=output_format, shard_size=shard_size * 1024 * 1024, name='documents'
+        )
+
+    blob_store = BlobStore()
+    document_index = DocumentIndex(BLOB_DOCUMENT_INDEX_PATH)
+    conversion_cache = ConversionCache()
+    conversion_pool = ConversionPool(workers, profile=conversion_profile, triage=triage, cache=conversion_cache)
+    try:
+        await convert_blobs(
+            blob_store, conversion_pool=conversion_pool, document_index=document_index, reconvert=reconvert,
+            dataset=dataset
+        )
+    finally:
+        conversion_pool.shutdown()
+        logger.info(f'Conversion cache stats: {conversion_cache.stats()}')
+        conversion_cache.close()
+        document_index.close()
+        blob_store.close()
 
     logger.info('DONE')
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    args = get_args()
+    if args.command == 'convert':
+        asyncio.run(convert(
+            reconvert=args.all, workers=args.workers, conversion_profile=args.conversion,
+            triage=not args.keep_all_pages, output_format=args.output_format, shard_size=args.shard_size
+        ))
+    else:
+        asyncio.run(main(
+            fresh=args.fresh, record=args.record, replay=args.replay, output_format=args.output_format,
+            shard_size=args.shard_size, metrics_port=args.metrics_port, frontier_path=args.frontier,
+            defer_conversion=args.defer_conversion, trace_sample_rate=args.trace, conversion_profile=args.conversion,
+            triage=not args.keep_all_pages
+        ))
@@ -0,0 +1,111 @@
+import argparse
+
+from src.data_crawler.constants import (
+    FRONTIER_PATH, NO_CONVERSION_WORKERS, TRACE_PATH, TRACE_SAMPLE_RATE, CONVERSION_PROFILES, CONVERSION_PROFILE
+)
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='')
+    parser.add_argument(
+        '--fresh',
+        action='store_true',
+        help='Start a new crawl run instead of resuming the last interrupted one.',
+    )
+    parser.add_argument(
+        '--record',
+        action='store_true',
+        help='Crawl every url again, without resuming the crawl state nor sending conditional requests, and record '
+             'every GET response into the HTTP cache, so the whole crawl can be replayed later. Not resumable.',
+    )
+    parser.add_argument(
+        '--replay',
+        action='store_true',
+        help='Rebuild data.jsonl from the recorded HTTP responses only, without any network access.',
+    )
+    parser.add_argument(
+        '--output-format',
+        choices=['jsonl', 'gzip', 'zstd'],
+        default='jsonl',
+        help='Write data.jsonl, or a sharded dataset of gzip or zstd compressed shards with a metadata index. The '
+             'convert command writes documents.jsonl, or its own shards of the same dataset.',
+    )
+    parser.add_argument(
+        '--shard-size',
+        type=int,
+        default=256,
+        help='Size in MB after which a new dataset shard is started.',
+    )
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        default=None,
+        help='Serve the crawler metrics in the Prometheus text format on this local port.',
+    )
+    parser.add_argument(
+        '--trace',
+        nargs='?',
+        type=float,
+        const=TRACE_SAMPLE_RATE,
+        default=None,
+        metavar='SAMPLE_RATE',
+        help=f'Trace the lifecycle of this share of the requests into {TRACE_PATH}, in the Chrome trace event format, '
+             f'{TRACE_SAMPLE_RATE} if no share is given.',
+    )
+    parser.add_argument(
+        '--frontier',
+        nargs='?',
+        const=FRONTIER_PATH,
+        default=None,
+        help='Share the crawl with the other workers using the SQLite frontier at this path, '
+             f'{FRONTIER_PATH} if no path is given. Not used with --record and --replay.',
+    )
+    parser.add_argument(
+        '--defer-conversion',
+        action='store_true',
+        help='Store the downloaded PDFs into the blob store instead of converting them, to be converted later by the '
+             'convert command.',
+    )
+    parser.add_argument(
+        '--conversion',
+        choices=CONVERSION_PROFILES,
+        default=CONVERSION_PROFILE,
+        help='Convert the PDFs into plain text, text with markdown headings, or markdown with tables, the slowest. '
+             'The profile is recorded in the documents\' conversion field.',
+    )
+    parser.add_argument(
+        '--keep-all-pages',
+        action='store_true',
+        help='Convert every page of the PDFs, instead of skipping their blank, image-only and boilerplate pages.',
+    )
+
+    commands = parser.add_subparsers(dest='command')
+    convert = commands.add_parser(
+        'convert',
+        help='Convert the PDFs of the blob store pending conversion into documents.jsonl, or into the sharded dataset '
+             'with --output-format, without any network access.'
+    )
+    convert.add_argument(
+        '--all',
+        action='store_true',
+        help='Convert every stored PDF again and rewrite documents.jsonl, instead of the pending ones only.',
+    )
+    convert.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        default=NO_CONVERSION_WORKERS,
+        help='Number of conversion worker processes, defaults to the number of available cores.',
+    )
+    convert.add_argument(
+        '--conversion',
+        choices=CONVERSION_PROFILES,
+        default=CONVERSION_PROFILE,
+        help='Convert the PDFs into plain text, text with markdown headings, or markdown with tables, the slowest.',
+    )
+    convert.add_argument(
+        '--keep-all-pages',
+        action='store_true',
+        help='Convert every page of the PDFs, instead of skipping their blank, image-only and boilerplate pages.',
+    )
+    return parser.parse_args()
@@ -1,3 +1,5 @@
+import os
+
 import httpx
 from logging import INFO, DEBUG
 
@@ -26,6 +28,100 @@ HTTP_CLIENT_CONFIG = {
 }
 
 
+# Directory where streamed PDF downloads are spooled to disk until converted
+PDF_SPOOL_DIR = './out/data-crawler/spool'
+
+# Size in bytes of the chunks read from streamed downloads
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# SQLite database holding the crawl frontier and the completed documents, used to resume and refresh crawls
+CRAWL_STATE_PATH = './out/data-crawler/crawl-state.sqlite'
+
+# SQLite database holding the HTTP validators (ETag, Last-Modified) of the crawled urls for conditional requests
+VALIDATOR_STORE_PATH = './out/data-crawler/validators.sqlite'
+
+# SQLite database mapping the permanently redirected urls (301, 308) to their location, shared between runs
+REDIRECT_MAP_PATH = './out/data-crawler/redirects.sqlite'
+
+# Maximum number of redirects followed from a request, longer redirect chains are dropped
+MAX_REDIRECT_HOPS = 10
+
+# SQLite database mapping the content hash of the downloaded PDFs to their conversion and written document
+DOCUMENT_INDEX_PATH = './out/data-crawler/documents.sqlite'
+
+# On-disk conversion cache shared by the crawler, its convert stage and the pdf_converter, keyed by the content hash of
+# the PDFs, the converter version and the conversion options
+CONVERSION_CACHE_PATH = './out/conversion-cache.sqlite'
+
+# Maximum total size in bytes of the cached conversions, the least recently used ones being evicted past it
+CONVERSION_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Shared crawl frontier of the crawler workers, and their shared per host politeness state
+FRONTIER_PATH = './out/data-crawler/frontier.sqlite'
+
+# Time in seconds a worker holds a request it claimed from the shared frontier before other workers can claim it again
+FRONTIER_LEASE_TIME = 10 * 60
+
+# Time in seconds between two attempts to claim a request from an empty shared frontier
+FRONTIER_POLL_INTERVAL = 0.5
+
+# Checkpoint of the queued requests and downloaded documents of a crawl stopped by SIGTERM or SIGINT
+CHECKPOINT_DIR = './out/data-crawler/checkpoint'
+
+# Time in seconds a stopped crawl waits for the in-flight requests and conversions before checkpointing its queues
+SHUTDOWN_TIMEOUT = 30
+
+# Content addressed on-disk HTTP response cache, recorded by crawls run with --record and used to replay crawls offline
+RESPONSE_CACHE_DIR = './out/data-crawler/http-cache'
+
+# Content addressed store of the downloaded PDFs and their manifest, when their conversion is deferred
+BLOB_STORE_DIR = './out/data-crawler/blobs'
+
+# Output file of the documents converted from the blob store by the convert stage
+DOCUMENTS_JSONL_PATH = './out/data-crawler/documents.jsonl'
+
+# Content hash index of the convert stage, mapping the blobs to their conversion and to the documents it wrote
+BLOB_DOCUMENT_INDEX_PATH = './out/data-crawler/blobs/documents.sqlite'
+
+# Number of documents converted at once by the convert stage for each conversion worker process
+BLOB_CONVERSIONS_PER_WORKER = 2
+
+# Output dataset file
+DATA_JSONL_PATH = './out/data-crawler/data.jsonl'
+
+# Directory of the sharded and compressed dataset, written instead of data.jsonl when a compression is chosen
+DATASET_DIR = './out/data-crawler/dataset'
+
+# Compression of the dataset shards, 'gzip' or 'zstd'
+DATASET_COMPRESSION = 'gzip'
+
+# Size in bytes after which a new dataset shard is started
+DATASET_SHARD_SIZE = 256 * 1024 * 1024
+
+# Log of the requests and responses that could not be processed
+ERROR_JSONL_PATH = './out/data-crawler/error.jsonl'
+
+# Buffered bytes that trigger a flush of the jsonlines writer
+WRITER_FLUSH_SIZE = 1024 * 1024
+
+# Maximum time in seconds a record stays in the jsonlines writer buffer
+WRITER_FLUSH_INTERVAL = 1.0
+
+# Crawler metrics snapshots, a JSON line appended every METRICS_INTERVAL seconds
+METRICS_PATH = './out/data-crawler/metrics.jsonl'
+
+# Time in seconds between two metrics snapshots
+METRICS_INTERVAL = 10
+
+# Lifecycle trace of the sampled requests, in the Chrome trace event format
+TRACE_PATH = './out/data-crawler/trace.json'
+
+# Share of the requests traced when tracing is enabled
+TRACE_SAMPLE_RATE = 0.01
+
+# Number of trace events buffered before they are appended to the trace file
+TRACE_BUFFER_SIZE = 1000
+
 # Async await Timeout limit
 ASYNC_AWAIT_TIMEOUT = 10
 
@@ -38,9 +134,89 @@ NO_REQUEST_CONSUMERS = 10
 # Number of ScrapeResponse Consumers
 NO_RESPONSE_CONSUMERS = 15
 
+# Bounds of the ScrapeRequest consumer pool, resized by the autoscaler starting from NO_REQUEST_CONSUMERS
+MIN_REQUEST_CONSUMERS = 2
+MAX_REQUEST_CONSUMERS = 50
+
+# Bounds of the ScrapeResponse consumer pool, resized by the autoscaler starting from NO_RESPONSE_CONSUMERS
+MIN_RESPONSE_CONSUMERS = 2
+MAX_RESPONSE_CONSUMERS = 50
+
+# Time in seconds between two autoscaler decisions
+AUTOSCALE_INTERVAL = 1.0
+
+# Maximum number of consumers added or removed from a pool in a single autoscaler decision
+AUTOSCALE_STEP = 5
+
+# Maximum number of ScrapeRequest objects in the task queue, producers wait once it is reached
+TASK_QUEUE_SIZE = 1000
+
+# Maximum number of ScrapeResponse objects in the response queue
+RESPONSE_QUEUE_SIZE = 100
+
+# Maximum total size in bytes of the response bodies in the response queue, request consumers wait once it is reached
+RESPONSE_QUEUE_MAX_BYTES = 256 * 1024 * 1024
+
+# Number of PDF to markdown conversion worker processes
+NO_CONVERSION_WORKERS = os.cpu_count() or 1
+
+# Multiprocessing start method for the conversion worker processes
+CONVERSION_MP_CONTEXT = 'spawn'
+
+# Version of the conversion code, to be bumped whenever a change alters the converted text of the PDFs
+CONVERTER_VERSION = 2
+
+# PDF conversion profiles, from the cheapest to the most faithful: plain text, text with markdown headings, and the
+# pymupdf4llm markdown with its tables
+CONVERSION_PROFILES = ('text', 'headings', 'markdown')
+
+# PDF conversion profile used unless another one is selected
+CONVERSION_PROFILE = 'markdown'
+
+# Minimum number of pages of the PDFs split into page ranges converted in parallel by the conversion workers
+PAGE_RANGE_MIN_PAGES = 100
+
+# Minimum number of pages of each page range of a split PDF
+PAGE_RANGE_MIN_SIZE = 25
+
+# Whether the PDF pages are triaged before their conversion, the image-only, blank and boilerplate pages being skipped
+PAGE_TRIAGE = True
+
+# Share of a page covered by images or drawings over which a page with little text is an image page
+TRIAGE_IMAGE_COVERAGE = 0.5
+
+# Maximum number of non-blank characters of the image pages, such as covers, photo spreads and full-page charts
+TRIAGE_IMAGE_PAGE_MAX_CHARS = 300
+
+# Known boilerplate phrases, the pages of at most TRIAGE_BOILERPLATE_MAX_CHARS characters containing one are skipped
+TRIAGE_BOILERPLATE_PATTERNS = (
+    r'(intentionally|deliberately) (been )?left blank',
+    r'left blank (intentionally|deliberately)',
+    r'printed (by|on) .{0,80}(paper|stock)',
+    r'(designed|produced) (and produced )?by .{0,80}(agency|design|consultancy|communications)',
+)
+
+# Maximum number of non-blank characters of the boilerplate pages
+TRIAGE_BOILERPLATE_MAX_CHARS = 1500
+
+# Maximum number of in-flight requests to the same host
+MAX_IN_FLIGHT_PER_HOST = 4
+
 # Maximum number of request attempts
 MAX_RETRIES = 3
 
+# Retry policies by error class: exponential backoff from base_delay, with full jitter, up to max_delay seconds
+RETRY_POLICIES = {
+    'throttled': {'base_delay': 5, 'max_delay': 300, 'max_retries': 6},    # 429 and 503 responses
+    'server': {'base_delay': 2, 'max_delay': 60, 'max_retries': MAX_RETRIES},  # other 5xx responses
+    'network': {'base_delay': 1, 'max_delay': 30, 'max_retries': MAX_RETRIES},     # connection errors and timeouts
+    'default': {'base_delay': 0.5, 'max_delay': 10, 'max_retries': MAX_RETRIES},   # any other error
+    'permanent': {'base_delay': 0, 'max_delay': 0, 'max_retries': 0},  # never retried, e.g. replay cache misses
+}
+
+# Maximum time in seconds a Retry-After header is honored for
+MAX_RETRY_AFTER = 60 * 60
+
 # ID for the logger
 LOGGER_NAME = 'data-crawler'
 
@@ -60,3 +236,12 @@ LOGGING_CONFIG = {
 
 # robots.txt url suffix
 ROBOTS_TXT_SUFFIX = '/robots.txt'
+
+# User agent whose robots.txt rules are followed
+ROBOTS_USER_AGENT = '*'
+
+# On-disk cache of the parsed robots.txt rules, shared between runs and crawler processes
+ROBOTS_CACHE_PATH = './out/data-crawler/robots.json'
+
+# Time in seconds the cached robots.txt rules are valid for
+ROBOTS_CACHE_TTL = 24 * 60 * 60
@@ -0,0 +1,10 @@
+from .converter import convert_pdf, convert_pdf_pages, get_page_count, get_page_ranges, get_content_hash
+from .page_triage import triage_pdf
+from .conversion_pool import ConversionPool
+from .blob_converter import convert_blob, convert_blobs
+
+
+__all__ = [
+    'ConversionPool', 'convert_pdf', 'convert_pdf_pages', 'get_page_count', 'get_page_ranges', 'convert_blob',
+    'convert_blobs', 'triage_pdf', 'get_content_hash'
+]
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import time
+
+from functools import partial
+from pathlib import Path
+
+from src.data_crawler.constants import LOGGER_NAME, DOCUMENTS_JSONL_PATH, ERROR_JSONL_PATH, BLOB_CONVERSIONS_PER_WORKER
+from src.data_crawler.conversion.conversion_pool import ConversionPool
+from src.data_crawler.storage import BlobStore, DocumentIndex, JsonlWriter, ShardedDatasetWriter
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+async def convert_blob(
+        entry: dict,
+        blob_store: BlobStore,
+        writer: JsonlWriter,
+        conversion_pool: ConversionPool,
+        document_index: DocumentIndex or None = None,
+        output_path: str = DOCUMENTS_JSONL_PATH
+) -> bool or None:
+    """Convert a pending document of the blob store and queue its record to the output file
+
+    The document is marked as converted once its record is written, or right away if it is a copy of a document
+    already written under another url, which is recorded as an alias instead. Documents whose pages are all skipped by
+    the page triage are logged to the error file instead of the output file.
+
+    :param entry: dict pending document of the blob store manifest
+    :param blob_store: BlobStore store holding the document
+    :param writer: JsonlWriter writer of the output file
+    :param conversion_pool: ConversionPool worker pool to triage and convert the PDF on, with its conversion profile
+    :param document_index: DocumentIndex content hash index, content converted in flight is reused if not None
+    :param output_path: str path of the output jsonlines file
+    :return: bool or None whether the document is written, False for aliases, None for documents with no page left
+    """
+    url, digest, record = entry['url'], entry['digest'], entry['record']
+    source = str(blob_store.blob_path(digest))
+    label = f'{record["title"]} : {record["document_type"]} {record["year"]}'
+    triage = await conversion_pool.triage_pages(source, digest) if conversion_pool.triage else None
+    pages = triage['pages'] if triage is not None else None
+    if triage is not None and not pages:
+        logger.warning(f'Skipping {url}, every page was skipped by the page triage.')
+        writer.write(ERROR_JSONL_PATH, {
+            'type': 'Blob', 'metadata': {**record, 'url': url, 'digest': digest},
+            'exception': 'Every page skipped by the page triage', 'outcome': 'skipped', 'pages': triage['stats']
+        }, partial(blob_store.mark_converted, url))
+        return None
+    if document_index is None:
+        markdown = await conversion_pool.convert(source, label, pages, digest)
+    else:
+        markdown = await document_index.get_document(
+            digest, lambda: conversion_pool.convert(source, label, pages, digest), conversion_pool.profile, pages
+        )
+        primary_url = document_index.get_primary_url(digest)
+        if primary_url is not None and primary_url != url:
+            document_index.add_alias(
+                digest, url, primary_url, record['ticker'], record['document_type'], record['year']
+            )
+            blob_store.mark_converted(url)
+            return False
+        document_index.add_output(digest, url, record['ticker'], record['document_type'], record['year'])
+    jsonline = {**record, 'doc': markdown, 'conversion': conversion_pool.profile}
+    if triage is not None:
+        jsonline['pages'] = triage['stats']
+    writer.write(output_path, jsonline, partial(blob_store.mark_converted, url))
+    return True
+
+
+async def convert_blobs(
+        blob_store: BlobStore,
+        writer: JsonlWriter or None = None,
+        conversion_pool: ConversionPool or None = None,
+        document_index: DocumentIndex or None = None,
+        output_path: str = DOCUMENTS_JSONL_PATH,
+        reconvert: bool = False,
+        dataset: ShardedDatasetWriter or None = None
+) -> dict:
+    """Convert the documents of the blob store pending conversion, in bulk
+
+    Runs as a stage of its own, separately from the crawl and without any network access. Conversions run on the
+    worker processes of the conversion pool, a few documents per worker at once so none of them waits for the next
+    document. Every run only converts the documents stored since the last one, unless reconvert is set, in which case
+    the output file is rewritten with the conversion of every stored document. With a sharded dataset, the documents
+    are written into the dataset's shards instead of the output file.
+
+    :param blob_store: BlobStore store of the downloaded PDFs
+    :param writer: JsonlWriter writer of the output file, writing the dataset if any, one is created and closed once
+        done if None
+    :param conversion_pool: ConversionPool PDF conversion worker pool, one is created and shut down once done if None
+    :param document_index: DocumentIndex content hash index, duplicated documents are converted once if not None
+    :param output_path: str path of the output jsonlines file
+    :param reconvert: bool whether to convert every stored document again, instead of the pending ones only
+    :param dataset: ShardedDatasetWriter or None sharded dataset the documents are written into instead of the output
+        file, its shards are cleared when converting every stored document again
+    :return: dict numbers of converted, aliased, skipped and failed documents and the stage's duration
+    """
+    start = time.perf_counter()
+    if reconvert:
+        logger.info(f'Converting every stored document again, {output_path if dataset is None else dataset.path} is '
+                    f'rewritten.')
+        blob_store.reset()
+        if dataset is not None:
+            dataset.clear()
+        else:
+            Path(output_path).unlink(missing_ok=True)
+        if document_index is not None:
+            document_index.clear_outputs()
+
+    owns_writer, owns_pool = writer is None, conversion_pool is None
+    if writer is None:
+        writer = JsonlWriter(datasets={output_path: dataset} if dataset is not None else None)
+    writer.start()
+    conversion_pool = conversion_pool if conversion_pool is not None else ConversionPool()
+
+    pending = blob_store.pending()
+    logger.info(f'Converting {len(pending)} pending documents on {conversion_pool.size} worker processes.')
+    semaphore = asyncio.Semaphore(conversion_pool.size * BLOB_CONVERSIONS_PER_WORKER)
+
+    async def convert(entry: dict) -> bool:
+        async with semaphore:
+            return await convert_blob(entry, blob_store, writer, conversion_pool, document_index, output_path)
+
+    results = await asyncio.gather(*[convert(_) for _ in pending], return_exceptions=True)
+    for entry, result in zip(pending, results):
+        if isinstance(result, Exception):
+            logger.error(f'Failed to convert {entry["url"]}, it stays pending: {result}')
+
+    try:
+        if owns_writer:
+            await writer.close()    # write the records and mark their documents as converted
+    finally:
+        if owns_pool:
+            conversion_pool.shutdown()
+
+    stats = {
+        'converted': len([_ for _ in results if _ is True]),
+        'aliases': len([_ for _ in results if _ is False]),
+        'skipped': len([_ for _ in results if _ is None]),
+        'failed': len([_ for _ in results if isinstance(_, Exception)]),
+        'time': time.perf_counter() - start,
+    }
+    logger.info(f'Convert stage stats: {stats} | Blob store: {blob_store.stats()}')
+    return stats
@@ -0,0 +1,277 @@
+import asyncio
+import json
+import logging
+import math
+import multiprocessing
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from src.data_crawler.constants import (
+    LOGGER_NAME, NO_CONVERSION_WORKERS, CONVERSION_MP_CONTEXT, PAGE_RANGE_MIN_PAGES, PAGE_RANGE_MIN_SIZE,
+    CONVERSION_PROFILES, CONVERSION_PROFILE, PAGE_TRIAGE
+)
+from src.data_crawler.conversion.converter import (
+    convert_pdf, convert_pdf_pages, get_page_count, get_page_ranges, get_font_sizes, get_header_ids,
+    get_converter_version, get_content_hash
+)
+from src.data_crawler.conversion.page_triage import triage_pdf, get_triage_options, SKIP_REASONS
+from src.data_crawler.metrics import metrics
+from src.data_crawler.storage import ConversionCache
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class ConversionPool:
+    """PDF to markdown conversion stage
+
+    Runs the CPU bound pymupdf4llm conversions on a pool of worker processes so the event loop is kept free for the
+    network bound consumers.
+
+    Documents with at least split_pages pages are split into page ranges of at least PAGE_RANGE_MIN_SIZE pages,
+    converted in parallel by up to all the worker processes and stitched back together in order, so a single large
+    report is converted roughly as many times faster as there are workers.
+
+    Documents are converted with the pool's conversion profile: plain text, text with markdown headings, or the full
+    pymupdf4llm markdown with its tables, orders of magnitude slower per page than the other two. With triage set, the
+    pages of each document are triaged by a fast pre-pass first, and only its useful pages are converted.
+
+    With a conversion cache, documents already converted with the same converter version, profile and pages, by any
+    conversion entry point, are returned from the cache without being converted again.
+
+    :param max_workers: int number of worker processes, defaults to the number of available cores
+    :param split_pages: int or None minimum number of pages of the documents split into page ranges, None to convert
+        every document as a whole
+    :param profile: str conversion profile, one of CONVERSION_PROFILES
+    :param triage: bool whether to skip the blank, image and boilerplate pages of the documents
+    :param cache: ConversionCache or None on-disk cache of the conversions, if any
+    """
+
+    __max_workers: int
+    __split_pages: int or None
+    __profile: str
+    __triage: bool
+    __cache: ConversionCache or None
+    __executor: ProcessPoolExecutor or None
+    __pending: int
+    __converted: int
+    __failed: int
+    __total_time: float
+    __max_time: float
+    __skipped_pages: int
+    __cached: int
+
+    def __init__(
+            self,
+            max_workers: int = NO_CONVERSION_WORKERS,
+            split_pages: int or None = PAGE_RANGE_MIN_PAGES,
+            profile: str = CONVERSION_PROFILE,
+            triage: bool = PAGE_TRIAGE,
+            cache: ConversionCache or None = None
+    ):
+        if profile not in CONVERSION_PROFILES:
+            raise ValueError(f'Unknown conversion profile {profile}, expected one of {CONVERSION_PROFILES}')
+        self.__max_workers = max(1, max_workers)
+        self.__split_pages = split_pages
+        self.__profile = profile
+        self.__triage = triage
+        self.__cache = cache
+        self.__executor = None
+        self.__pending = 0
+        self.__converted = 0
+        self.__failed = 0
+        self.__total_time = 0
+        self.__max_time = 0
+        self.__skipped_pages = 0
+        self.__cached = 0
+
+    @property
+    def size(self) -> int:
+        """size: int number of worker processes"""
+        return self.__max_workers
+
+    @property
+    def profile(self) -> str:
+        """profile: str conversion profile of the documents, recorded in their metadata"""
+        return self.__profile
+
+    @property
+    def triage(self) -> bool:
+        """triage: bool whether the pages of the documents are triaged before their conversion"""
+        return self.__triage
+
+    @property
+    def cache(self) -> ConversionCache or None:
+        return self.__cache
+
+    @property
+    def in_flight(self) -> int:
+        """in_flight: int number of conversion jobs, documents or page ranges, submitted and not yet done"""
+        return self.__pending
+
+    @property
+    def queue_depth(self) -> int:
+        """queue_depth: int number of conversion jobs waiting for a free worker process"""
+        return max(0, self.__pending - self.__max_workers)
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(
+                max_workers=self.__max_workers,
+                mp_context=multiprocessing.get_context(CONVERSION_MP_CONTEXT)
+            )
+        return self.__executor
+
+    async def submit(self, fn, *args):
+        """Run a conversion job on the worker processes
+
+        :param fn: Callable picklable conversion function
+        :param args: picklable arguments of the function
+        :return: the result of the function
+        """
+        self.__pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.__pending -= 1
+
+    def get_page_ranges(self, page_count: int) -> list[tuple[int, int]]:
+        """Get the page ranges a document is split into, a single range if it isn't split
+
+        :param page_count: int number of pages of the document
+        :return: list[tuple[int, int]] start and stop page of each range, in order
+        """
+        if self.__split_pages is None or page_count < self.__split_pages:
+            return [(0, page_count)]
+        parts = min(self.__max_workers, max(1, math.floor(page_count / PAGE_RANGE_MIN_SIZE)))
+        return get_page_ranges(page_count, parts)
+
+    async def triage_pages(self, source: str or bytes, digest: str or None = None) -> dict or None:
+        """Triage the pages of a PDF document on the worker processes, before its conversion, or get it from the cache
+
+        :param source: str or bytes path to the PDF file or the raw PDF content
+        :param digest: str or None SHA-256 digest of the PDF content, computed if None and the pool has a cache
+        :return: dict or None pages to convert and page stats of the document, as returned by triage_pdf, None if the
+            pool doesn't triage the pages
+        """
+        if not self.__triage:
+            return None
+        triage = None
+        if self.__cache is not None:
+            digest = digest if digest is not None else await asyncio.to_thread(get_content_hash, source)
+            cached = self.__cache.get(digest, get_converter_version(), {'triage': get_triage_options()})
+            triage = json.loads(cached) if cached is not None else None
+        if triage is None:
+            triage = await self.submit(triage_pdf, source)
+            if self.__cache is not None:
+                self.__cache.put(digest, get_converter_version(), {'triage': get_triage_options()}, json.dumps(triage))
+        for reason in SKIP_REASONS:
+            metrics.counter('crawler_skipped_pages_total', 'PDF pages skipped by the page triage').inc(
+                triage['stats'][reason], reason=reason
+            )
+        self.__skipped_pages += triage['stats']['pages'] - triage['stats']['converted']
+        return triage
+
+    async def convert_pages(self, source: str or bytes, parts: list[list[int]]) -> tuple[str, int, float]:
+        """Convert a PDF document part by part, in parallel
+
+        Header font sizes are counted on every part first, so all the parts use the headers of the whole document,
+        unless the document is converted into plain text.
+
+        :param source: str or bytes path to the PDF file or the raw PDF content
+        :param parts: list[list[int]] pages of each part, in order
+        :return: tuple[str, int, float] markdown text, number of pages and conversion time in seconds
+        """
+        start = time.perf_counter()
+        font_sizes = {}
+        if self.__profile != 'text':
+            for part_font_sizes in await asyncio.gather(*[self.submit(get_font_sizes, source, _) for _ in parts]):
+                for font_size, count in part_font_sizes.items():
+                    font_sizes[font_size] = font_sizes.get(font_size, 0) + count
+        header_ids = get_header_ids(font_sizes)
+        results = await asyncio.gather(
+            *[self.submit(convert_pdf_pages, source, _, header_ids, self.__profile) for _ in parts]
+        )
+        return ''.join([_[0] for _ in results]), sum([_[1] for _ in results]), time.perf_counter() - start
+
+    async def convert(
+            self,
+            source: str or bytes,
+            label: str = '',
+            pages: list[int] or None = None,
+            digest: str or None = None
+    ) -> str:
+        """Convert a PDF document with the pool's conversion profile on the worker processes, or get it from the cache
+
+        :param source: str or bytes path to the PDF file or the raw PDF content
+        :param label: str name of the document used for logging
+        :param pages: list[int] or None pages to convert, in order, such as the pages kept by triage_pages, every page
+            if None
+        :param digest: str or None SHA-256 digest of the PDF content, computed if None and the pool has a cache
+        :return: str converted text
+        """
+        options = {'profile': self.__profile, 'pages': pages}
+        if self.__cache is not None:
+            digest = digest if digest is not None else await asyncio.to_thread(get_content_hash, source)
+            markdown = self.__cache.get(digest, get_converter_version(), options)
+            if markdown is not None:
+                self.__cached += 1
+                logger.debug(f'Got the conversion of {label} from the conversion cache.')
+                return markdown
+
+        submitted = time.perf_counter()
+        parts = []
+        try:
+            if self.__split_pages is not None:
+                if pages is None:
+                    pages = list(range(await asyncio.to_thread(get_page_count, source)))
+                parts = [pages[start:stop] for start, stop in self.get_page_ranges(len(pages))]
+            if len(parts) > 1:
+                markdown, page_count, conversion_time = await self.convert_pages(source, parts)
+            else:
+                markdown, page_count, conversion_time = await self.submit(convert_pdf, source, self.__profile, pages)
+        except Exception:
+            self.__failed += 1
+            raise
+
+        self.__converted += 1
+        self.__total_time += conversion_time
+        self.__max_time = max(self.__max_time, conversion_time)
+        metrics.histogram('crawler_conversion_seconds_per_page', 'PDF conversion time per page').observe(
+            conversion_time / max(1, page_count), profile=self.__profile
+        )
+        metrics.counter('crawler_converted_pages_total', 'Converted PDF pages').inc(page_count, profile=self.__profile)
+        logger.debug(f'Converted {label} ({page_count} pages, {max(1, len(parts))} parts, {self.__profile}) '
+                     f'in {conversion_time:.2f}s, '
+                     f'waited {time.perf_counter() - submitted - conversion_time:.2f}s for a worker | '
+                     f'Conversion Queue: {self.queue_depth}')
+        if self.__cache is not None:
+            self.__cache.put(digest, get_converter_version(), options, markdown)
+        return markdown
+
+    def stats(self) -> dict:
+        """Get the conversion stage statistics
+
+        :return: dict pool size, queue depth and conversion times
+        """
+        return {
+            'size': self.size,
+            'profile': self.profile,
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth,
+            'converted': self.__converted,
+            'failed': self.__failed,
+            'skipped_pages': self.__skipped_pages,
+            'cached': self.__cached,
+            'total_time': self.__total_time,
+            'mean_time': self.__total_time / self.__converted if self.__converted else 0,
+            'max_time': self.__max_time,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker processes"""
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=wait, cancel_futures=not wait)
+            self.__executor = None
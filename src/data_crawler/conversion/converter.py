@@ -0,0 +1,218 @@
+import hashlib
+import math
+import time
+
+import pymupdf4llm
+from pymupdf import pymupdf
+
+from src.data_crawler.constants import CONVERSION_PROFILE, CONVERSION_PROFILES, CONVERTER_VERSION, DOWNLOAD_CHUNK_SIZE
+
+
+# Font size under which text is always considered body text by pymupdf4llm
+BODY_FONT_SIZE = 12
+
+# Number of font sizes larger than the body text mapped to markdown headers by pymupdf4llm
+NO_HEADER_LEVELS = 6
+
+
+class PageHeaders:
+    """Markdown header prefixes of a document by font size, as computed by pymupdf4llm for the whole document
+
+    Given to the page range conversions so every range uses the headers of the whole document.
+
+    :param header_ids: dict[int, str] markdown header prefix of each font size
+    """
+
+    __header_ids: dict[int, str]
+
+    def __init__(self, header_ids: dict[int, str]):
+        self.__header_ids = header_ids
+
+    def get_header_id(self, span: dict, page=None) -> str:
+        return self.__header_ids.get(round(span['size']), '')
+
+
+def open_pdf(source: str or bytes) -> pymupdf.Document:
+    """Open a PDF document from a file path or from its raw bytes
+
+    :param source: str or bytes path to the PDF file or the raw PDF content
+    :return: pymupdf.Document the opened document
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return pymupdf.Document(stream=source)
+    return pymupdf.Document(source)
+
+
+def get_converter_version() -> str:
+    """Get the version of the converter, made of the versions of the conversion code, pymupdf4llm and PyMuPDF
+
+    :return: str converter version, different for every change of the converted text
+    """
+    return f'{CONVERTER_VERSION}/pymupdf4llm-{pymupdf4llm.__version__}/pymupdf-{pymupdf.VersionBind}'
+
+
+def get_content_hash(source: str or bytes) -> str:
+    """Get the SHA-256 hex digest of a PDF document's content
+
+    :param source: str or bytes path to the PDF file or the raw PDF content
+    :return: str hex digest
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, 'rb') as _:
+        while chunk := _.read(DOWNLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_page_count(source: str or bytes) -> int:
+    """Get the number of pages of a PDF document
+
+    :param source: str or bytes path to the PDF file or the raw PDF content
+    :return: int number of pages
+    """
+    with open_pdf(source) as document:
+        return document.page_count
+
+
+def get_page_ranges(page_count: int, parts: int) -> list[tuple[int, int]]:
+    """Split the pages of a document into contiguous ranges of even size
+
+    :param page_count: int number of pages of the document
+    :param parts: int number of ranges
+    :return: list[tuple[int, int]] start and stop page of each range, in order
+    """
+    parts = max(1, min(parts, page_count))
+    size = math.ceil(page_count / parts)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def get_font_sizes(source: str or bytes, pages: list[int]) -> dict[int, int]:
+    """Count the characters of each font size in pages of a document
+
+    :param source: str or bytes path to the PDF file or the raw PDF content
+    :param pages: list[int] pages to count the characters of
+    :return: dict[int, int] number of non-blank characters of each rounded font size
+    """
+    with open_pdf(source) as document:
+        return get_document_font_sizes(document, pages)
+
+
+def get_document_font_sizes(document: pymupdf.Document, pages: list[int]) -> dict[int, int]:
+    """Count the characters of each font size in pages of an opened document
+
+    :param document: pymupdf.Document the opened document
+    :param pages: list[int] pages to count the characters of
+    :return: dict[int, int] number of non-blank characters of each rounded font size
+    """
+    font_sizes = {}
+    for page_number in pages:
+        blocks = document.load_page(page_number).get_text('dict', flags=pymupdf.TEXTFLAGS_TEXT)['blocks']
+        for span in [s for b in blocks for line in b['lines'] for s in line['spans'] if s['text'].strip()]:
+            font_size = round(span['size'])
+            font_sizes[font_size] = font_sizes.get(font_size, 0) + len(span['text'].strip())
+    return font_sizes
+
+
+def get_header_ids(font_sizes: dict[int, int]) -> dict[int, str]:
+    """Map the font sizes of a document to markdown header prefixes, the way pymupdf4llm does
+
+    The most frequent font size is the body text, up to six larger font sizes are headers.
+
+    :param font_sizes: dict[int, int] number of characters of each font size in the document
+    :return: dict[int, str] markdown header prefix of each header font size
+    """
+    body_limit = max(BODY_FONT_SIZE, max(font_sizes, key=font_sizes.get)) if font_sizes else BODY_FONT_SIZE
+    sizes = sorted([_ for _ in font_sizes if _ > body_limit], reverse=True)[:NO_HEADER_LEVELS]
+    return {size: '#' * (i + 1) + ' ' for i, size in enumerate(sizes)}
+
+
+def get_page_text(page: pymupdf.Page, header_ids: dict[int, str] or None = None) -> str:
+    """Extract the text of a page, without any layout or table analysis
+
+    :param page: pymupdf.Page page to extract the text of
+    :param header_ids: dict[int, str] or None markdown header prefix of each font size, prefixed to the blocks whose
+        largest font size is a header, plain text if None
+    :return: str text of the page, one paragraph per text block
+    """
+    if header_ids is None:
+        return page.get_text('text', flags=pymupdf.TEXTFLAGS_TEXT)
+    paragraphs = []
+    for block in page.get_text('dict', flags=pymupdf.TEXTFLAGS_TEXT)['blocks']:
+        spans = [s for line in block['lines'] for s in line['spans'] if s['text'].strip()]
+        if not spans:
+            continue
+        text = ' '.join([''.join([s['text'] for s in line['spans']]).strip() for line in block['lines']]).strip()
+        paragraphs.append(header_ids.get(max([round(_['size']) for _ in spans]), '') + text)
+    return '\n\n'.join(paragraphs) + '\n\n' if paragraphs else ''
+
+
+def to_text(
+        document: pymupdf.Document,
+        pages: list[int],
+        profile: str,
+        header_ids: dict[int, str] or None = None
+) -> str:
+    """Convert pages of a PDF document with a conversion profile
+
+    :param document: pymupdf.Document the opened document
+    :param pages: list[int] pages to convert, in order
+    :param profile: str conversion profile, one of CONVERSION_PROFILES
+    :param header_ids: dict[int, str] or None markdown header prefix of each font size in the whole document, computed
+        from the given pages if None
+    :return: str text of the pages
+    """
+    if profile not in CONVERSION_PROFILES:
+        raise ValueError(f'Unknown conversion profile {profile}')
+    if profile != 'text' and header_ids is None:
+        # Headers of the converted pages only, as the parts of a split conversion get them
+        header_ids = get_header_ids(get_document_font_sizes(document, pages))
+    if profile == 'markdown':
+        return pymupdf4llm.to_markdown(document, pages=pages, hdr_info=PageHeaders(header_ids))
+    return ''.join([get_page_text(document.load_page(_), header_ids if profile == 'headings' else None) for _ in pages])
+
+
+def convert_pdf(
+        source: str or bytes,
+        profile: str = CONVERSION_PROFILE,
+        pages: list[int] or None = None
+) -> tuple[str, int, float]:
+    """Convert a PDF document into text with a conversion profile, markdown by default
+
+    Meant to be run inside a worker process of the ConversionPool, therefore it only takes and returns picklable
+    objects.
+
+    :param source: str or bytes path to the PDF file or the raw PDF content
+    :param profile: str conversion profile, one of CONVERSION_PROFILES
+    :param pages: list[int] or None pages to convert, in order, every page if None
+    :return: tuple[str, int, float] converted text, number of converted pages and conversion time in seconds
+    """
+    start = time.perf_counter()
+    with open_pdf(source) as document:
+        pages = pages if pages is not None else list(range(document.page_count))
+        markdown = to_text(document, pages, profile)
+    return markdown, len(pages), time.perf_counter() - start
+
+
+def convert_pdf_pages(
+        source: str or bytes,
+        pages: list[int],
+        header_ids: dict[int, str],
+        profile: str = CONVERSION_PROFILE
+) -> tuple[str, int, float]:
+    """Convert a part of the pages of a PDF document with a conversion profile, markdown by default
+
+    Concatenating the text of consecutive parts gives the text of the whole document, as long as every part uses the
+    header prefixes of the whole document.
+
+    :param source: str or bytes path to the PDF file or the raw PDF content
+    :param pages: list[int] pages of the part, in order
+    :param header_ids: dict[int, str] markdown header prefix of each font size in the whole document
+    :param profile: str conversion profile, one of CONVERSION_PROFILES
+    :return: tuple[str, int, float] converted text, number of pages and conversion time in seconds
+    """
+    started = time.perf_counter()
+    with open_pdf(source) as document:
+        markdown = to_text(document, pages, profile, header_ids)
+    return markdown, len(pages), time.perf_counter() - started
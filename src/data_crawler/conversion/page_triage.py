@@ -0,0 +1,100 @@
+import functools
+import re
+
+from pymupdf import pymupdf
+
+from src.data_crawler.constants import (
+    TRIAGE_IMAGE_COVERAGE, TRIAGE_IMAGE_PAGE_MAX_CHARS, TRIAGE_BOILERPLATE_PATTERNS, TRIAGE_BOILERPLATE_MAX_CHARS
+)
+from src.data_crawler.conversion.converter import open_pdf
+
+
+# Number of rows and columns of the grid the image coverage of a page is measured on
+COVERAGE_GRID_SIZE = 16
+
+# Fill color of the page backgrounds, not counted as drawings
+WHITE = (1.0, 1.0, 1.0)
+
+# Reasons pages are skipped for
+SKIP_REASONS = ('blank', 'image', 'boilerplate')
+
+BOILERPLATE = re.compile('|'.join(TRIAGE_BOILERPLATE_PATTERNS), re.IGNORECASE)
+
+
+def get_triage_options() -> dict:
+    """Get the settings of the page triage, the conversion cache options of its results"""
+    return {
+        'image_coverage': TRIAGE_IMAGE_COVERAGE,
+        'image_page_max_chars': TRIAGE_IMAGE_PAGE_MAX_CHARS,
+        'boilerplate_patterns': TRIAGE_BOILERPLATE_PATTERNS,
+        'boilerplate_max_chars': TRIAGE_BOILERPLATE_MAX_CHARS,
+    }
+
+
+def get_coverage(page: pymupdf.Page) -> float:
+    """Measure the share of a page covered by images and drawings
+
+    The drawings, such as the bars, lines and axes of a chart, cover their bounding box as a whole. Overlapping images
+    and drawings are counted once, the page being divided into a grid of cells counted as covered when their center is.
+
+    :param page: pymupdf.Page page to measure
+    :return: float covered share of the page, between 0 and 1
+    """
+    rects = [pymupdf.Rect(_['bbox']) for _ in page.get_image_info()]
+    drawings = [pymupdf.Rect(_['rect']) for _ in page.get_cdrawings() if _.get('fill') != WHITE or 's' in _['type']]
+    if drawings:
+        rects.append(functools.reduce(lambda a, b: a | b, drawings))
+    rects = [_ & page.rect for _ in rects]
+    rects = [_ for _ in rects if not _.is_empty]
+    if not rects:
+        return 0
+    width, height = page.rect.width / COVERAGE_GRID_SIZE, page.rect.height / COVERAGE_GRID_SIZE
+    covered = 0
+    for row in range(COVERAGE_GRID_SIZE):
+        for column in range(COVERAGE_GRID_SIZE):
+            center = pymupdf.Point(page.rect.x0 + (column + .5) * width, page.rect.y0 + (row + .5) * height)
+            covered += any([center in _ for _ in rects])
+    return covered / COVERAGE_GRID_SIZE ** 2
+
+
+def classify_page(page: pymupdf.Page) -> str or None:
+    """Classify a page by its text density, its image coverage and known boilerplate
+
+    :param page: pymupdf.Page page to classify
+    :return: str or None reason the page is skipped for, one of SKIP_REASONS, None if it is converted
+    """
+    text = ' '.join(page.get_text('text', flags=pymupdf.TEXTFLAGS_TEXT).split())
+    chars = len(text.replace(' ', ''))
+    if chars <= TRIAGE_IMAGE_PAGE_MAX_CHARS:
+        coverage = get_coverage(page)
+        if chars == 0 and coverage == 0:
+            return 'blank'
+        if coverage >= TRIAGE_IMAGE_COVERAGE:
+            return 'image'
+    if chars <= TRIAGE_BOILERPLATE_MAX_CHARS and BOILERPLATE.search(text):
+        return 'boilerplate'
+    return None
+
+
+def triage_pdf(source: str or bytes) -> dict:
+    """Triage the pages of a PDF document before its conversion
+
+    A fast pre-pass, only extracting the plain text and the image and drawing boxes of each page, skipping the blank
+    pages, the image pages with little text, such as covers, photo spreads and full-page charts, and the known
+    boilerplate pages. Meant to be run inside a worker process of the ConversionPool.
+
+    :param source: str or bytes path to the PDF file or the raw PDF content
+    :return: dict pages to convert, in order, and stats of the document's pages, with the number of pages skipped
+        for each reason
+    """
+    pages, stats = [], {'pages': 0, 'converted': 0, **{_: 0 for _ in SKIP_REASONS}}
+    with open_pdf(source) as document:
+        stats['pages'] = document.page_count
+        for page_number in range(document.page_count):
+            reason = classify_page(document.load_page(page_number))
+            if reason is None:
+                pages.append(page_number)
+            else:
+                stats[reason] += 1
+    stats['converted'] = len(pages)
+    return {'pages': pages, 'stats': stats}
@@ -0,0 +1,29 @@
+from typing import Protocol
+
+from .sqlite_frontier import SqliteFrontier
+
+
+class Frontier(Protocol):
+    """Interface of the crawler's task and response queues
+
+    The subset of the asyncio.Queue interface used by the producers, consumers and handlers. asyncio.Queue, and the
+    BoundedQueue used by default, are in-memory frontiers of a single crawler process, SqliteFrontier is a task queue
+    shared by several crawler workers.
+    """
+
+    async def put(self, item) -> None: ...
+
+    def put_nowait(self, item) -> None: ...
+
+    async def get(self): ...
+
+    def task_done(self) -> None: ...
+
+    async def join(self) -> None: ...
+
+    def qsize(self) -> int: ...
+
+    def empty(self) -> bool: ...
+
+
+__all__ = ['Frontier', 'SqliteFrontier']
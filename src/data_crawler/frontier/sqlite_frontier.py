@@ -0,0 +1,267 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+
+from pathlib import Path
+
+from httpx import AsyncClient, URL
+
+from src.data_crawler.constants import LOGGER_NAME, FRONTIER_PATH, FRONTIER_LEASE_TIME, FRONTIER_POLL_INTERVAL
+from src.data_crawler.parsers import get_consumer
+from src.data_crawler.scrape_requests import ScrapeRequest
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    host TEXT NOT NULL,
+    request TEXT NOT NULL,
+    status TEXT NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    not_before REAL,
+    updated_at REAL NOT NULL,
+    UNIQUE (run_id, url)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (run_id, status, id);
+"""
+
+MIGRATION = """
+ALTER TABLE tasks ADD COLUMN not_before REAL;
+"""
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+
+
+def get_worker_id() -> str:
+    """Get an id of the crawler worker process, unique across the machines sharing a frontier"""
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class SqliteFrontier:
+    """Crawl frontier shared by several crawler workers through a SQLite database
+
+    Drop-in replacement of the task queue for crawls split across several processes, or machines sharing a
+    filesystem. Every worker puts the requests it produces into the shared database, where requests are deduplicated
+    by url, and claims the next pending request with a lease. A request is done once the worker that claimed it
+    marks it as done, or goes back to pending if the worker puts it again to retry it, in which case it is not claimed
+    again before its retry delay. Workers renew the leases of their requests in progress, such as long downloads,
+    every third of lease_time. Leases of workers that died expire after lease_time seconds and their requests are
+    claimed again by the other workers, the requests only being marked as done by the worker holding their lease.
+
+    The claimed requests are identified by the consumer task that got them, so task_done must be called from the
+    same task as get, as the crawler's consumers do. Joining the frontier waits for the requests of every worker.
+
+    :param client: AsyncClient HTTP Client to rebuild the claimed requests with
+    :param path: str path of the SQLite database file
+    :param run_id: int id of the crawl run shared by the workers, requests are only deduplicated within a run
+    :param worker_id: str id of the worker, a host and pid based id if None
+    :param lease_time: float seconds a claimed request is held before other workers can claim it again
+    :param poll_interval: float seconds between two claim attempts while the frontier is empty
+    """
+
+    __client: AsyncClient
+    __path: str
+    __run_id: int
+    __worker_id: str
+    __lease_time: float
+    __poll_interval: float
+    __connection: sqlite3.Connection or None
+    __leases: dict[asyncio.Task, int]
+    __renewal: asyncio.Task or None
+    __wakeup: asyncio.Event
+
+    def __init__(
+            self,
+            client: AsyncClient,
+            path: str = FRONTIER_PATH,
+            run_id: int = 0,
+            worker_id: str or None = None,
+            lease_time: float = FRONTIER_LEASE_TIME,
+            poll_interval: float = FRONTIER_POLL_INTERVAL
+    ):
+        self.__client = client
+        self.__path = path
+        self.__run_id = run_id
+        self.__worker_id = worker_id if worker_id is not None else get_worker_id()
+        self.__lease_time = lease_time
+        self.__poll_interval = poll_interval
+        self.__connection = None
+        self.__leases = {}
+        self.__renewal = None
+        self.__wakeup = asyncio.Event()
+
+    @property
+    def worker_id(self) -> str:
+        return self.__worker_id
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            Path(self.__path).parent.mkdir(parents=True, exist_ok=True)
+            self.__connection = sqlite3.connect(self.__path, timeout=30)
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+            columns = [_[1] for _ in self.__connection.execute('PRAGMA table_info(tasks)')]
+            if columns and 'not_before' not in columns:
+                self.__connection.executescript(MIGRATION)
+            self.__connection.executescript(SCHEMA)
+        return self.__connection
+
+    def put_nowait(self, scrape_request: ScrapeRequest, delay: float = 0) -> None:
+        """Add a request to the frontier
+
+        The request is skipped if the run already holds its url, unless this worker holds its lease, in which case it
+        goes back to pending to be retried, along with its number of failed attempts. Retried requests are held by
+        the frontier rather than by the worker while their retry delay is due, so they are not leased meanwhile.
+
+        :param scrape_request: ScrapeRequest request to add
+        :param delay: float seconds to wait before the request can be claimed
+        """
+        request = scrape_request.serialize()
+        url = request['metadata']['url']
+        now = time.time()
+        not_before = now + delay if delay > 0 else None
+        with self.connection as _:
+            retried = _.execute(
+                'UPDATE tasks SET request = ?, status = ?, lease_owner = NULL, lease_expires = NULL, not_before = ?, '
+                'updated_at = ? WHERE run_id = ? AND url = ? AND status = ? AND lease_owner = ? RETURNING id',
+                (json.dumps(request, default=str), PENDING, not_before, now, self.__run_id, url, LEASED,
+                 self.__worker_id)
+            ).fetchall()     # RETURNING statements only complete once all their rows are fetched
+            retried = retried[0] if retried else None
+            if retried is None:
+                _.execute(
+                    'INSERT OR IGNORE INTO tasks (run_id, url, host, request, status, not_before, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (self.__run_id, url, URL(url).host, json.dumps(request, default=str), PENDING, not_before, now)
+                )
+        if retried is not None:
+            self.__leases = {k: v for k, v in self.__leases.items() if v != retried[0]}
+        scrape_request.discard()    # rebuilt by the worker claiming it
+        self.__wakeup.set()
+
+    async def put(self, scrape_request: ScrapeRequest, delay: float = 0) -> None:
+        self.put_nowait(scrape_request, delay)
+
+    def claim(self) -> tuple[ScrapeRequest, int] or None:
+        """Lease the oldest pending request whose retry delay is due, or a request whose lease expired
+
+        :return: tuple[ScrapeRequest, int] or None the claimed request and its task id, None if there are none
+        """
+        now = time.time()
+        with self.connection as _:
+            rows = _.execute(
+                'UPDATE tasks SET status = ?, lease_owner = ?, lease_expires = ?, updated_at = ? '
+                'WHERE id = ('
+                '    SELECT id FROM tasks WHERE run_id = ? AND ('
+                '        (status = ? AND (not_before IS NULL OR not_before <= ?)) OR (status = ? AND lease_expires < ?)'
+                '    )'
+                '    ORDER BY id LIMIT 1'
+                ') RETURNING id, request',
+                (LEASED, self.__worker_id, now + self.__lease_time, now, self.__run_id, PENDING, now, LEASED, now)
+            ).fetchall()
+        if not rows:
+            return None
+        task_id, request = rows[0][0], json.loads(rows[0][1])
+        return ScrapeRequest.deserialize(request, self.__client, get_consumer(request['consumer'])), task_id
+
+    async def get(self) -> ScrapeRequest:
+        """Wait for a request to claim"""
+        if self.__renewal is None:
+            self.__renewal = asyncio.create_task(self.keep_leases())
+        while True:
+            claimed = self.claim()
+            if claimed is not None:
+                scrape_request, task_id = claimed
+                self.__leases[asyncio.current_task()] = task_id
+                return scrape_request
+            self.__wakeup.clear()
+            try:
+                await asyncio.wait_for(self.__wakeup.wait(), self.__poll_interval)
+            except TimeoutError:
+                pass
+
+    def renew(self) -> int:
+        """Extend the leases of the requests this worker's tasks are processing by lease_time seconds
+
+        :return: int number of renewed leases, leases which expired and were claimed by other workers are not renewed
+        """
+        task_ids = list(self.__leases.values())
+        if not task_ids:
+            return 0
+        now = time.time()
+        with self.connection as _:
+            renewed = _.execute(
+                f'UPDATE tasks SET lease_expires = ?, updated_at = ? '
+                f'WHERE id IN ({", ".join(["?"] * len(task_ids))}) AND status = ? AND lease_owner = ?',
+                (now + self.__lease_time, now, *task_ids, LEASED, self.__worker_id)
+            ).rowcount
+        if renewed < len(task_ids):
+            logger.warning(f'{len(task_ids) - renewed} leases of worker {self.__worker_id} expired before renewal.')
+        return renewed
+
+    async def keep_leases(self) -> None:
+        """Renew the leases of the requests in progress every third of the lease time, until the frontier is closed"""
+        while True:
+            await asyncio.sleep(self.__lease_time / 3)
+            try:
+                self.renew()
+            except sqlite3.Error as e:
+                logger.error(f'Failed to renew the leases of worker {self.__worker_id}: {e}')
+
+    def task_done(self) -> None:
+        """Mark the request claimed by the calling task as done, if this worker still holds its lease"""
+        task_id = self.__leases.pop(asyncio.current_task(), None)
+        if task_id is None:
+            return
+        with self.connection as _:
+            done = _.execute(
+                'UPDATE tasks SET status = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? '
+                'WHERE id = ? AND status = ? AND lease_owner = ?',
+                (DONE, time.time(), task_id, LEASED, self.__worker_id)
+            ).rowcount
+        if not done:
+            logger.warning(f'The lease of task {task_id} expired, it is left to the worker that claimed it again.')
+
+    def count(self, *statuses: str) -> int:
+        row = self.connection.execute(
+            f'SELECT COUNT(*) FROM tasks WHERE run_id = ? AND status IN ({", ".join(["?"] * len(statuses))})',
+            (self.__run_id, *statuses)
+        ).fetchone()
+        return row[0]
+
+    def qsize(self) -> int:
+        """Number of pending requests, across all the workers"""
+        return self.count(PENDING)
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    async def join(self) -> None:
+        """Wait until every request of the run is done, across all the workers"""
+        while self.count(PENDING, LEASED) > 0:
+            await asyncio.sleep(self.__poll_interval)
+
+    def stats(self) -> dict:
+        rows = self.connection.execute(
+            'SELECT status, COUNT(*) FROM tasks WHERE run_id = ? GROUP BY status', (self.__run_id,)
+        ).fetchall()
+        return {'worker_id': self.__worker_id, **{status: count for status, count in rows}}
+
+    def close(self) -> None:
+        if self.__renewal is not None:
+            self.__renewal.cancel()
+            self.__renewal = None
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
@@ -0,0 +1,9 @@
+from .registry import MetricsRegistry, Counter, Gauge, Histogram
+from .exporter import MetricsExporter
+
+
+# Metrics registry shared by the whole crawler
+metrics = MetricsRegistry()
+
+
+__all__ = ['Counter', 'Gauge', 'Histogram', 'MetricsExporter', 'MetricsRegistry', 'metrics']
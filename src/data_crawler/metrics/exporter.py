@@ -0,0 +1,120 @@
+import asyncio
+import json
+import logging
+
+from pathlib import Path
+from typing import Callable
+
+from src.data_crawler.constants import LOGGER_NAME, METRICS_PATH, METRICS_INTERVAL
+from src.data_crawler.metrics.registry import MetricsRegistry
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class MetricsExporter:
+    """Periodic exporter of the crawler metrics
+
+    Samples the depth of the crawler's queues every interval and appends a JSON snapshot of the registry to the
+    metrics file, one line per snapshot. Optionally serves the metrics in the Prometheus text format on a local port.
+
+    :param registry: MetricsRegistry registry to export
+    :param queues: dict[str, Callable] functions returning the depth of the sampled queues, by queue name
+    :param path: str or None path of the snapshots file, no snapshots are written if None
+    :param interval: float seconds between two snapshots
+    :param port: int or None local port of the Prometheus endpoint, no endpoint is served if None
+    """
+
+    __registry: MetricsRegistry
+    __queues: dict[str, Callable[[], int]]
+    __path: str or None
+    __interval: float
+    __port: int or None
+    __task: asyncio.Task or None
+    __server: asyncio.Server or None
+
+    def __init__(
+            self,
+            registry: MetricsRegistry,
+            queues: dict[str, Callable[[], int]] or None = None,
+            path: str or None = METRICS_PATH,
+            interval: float = METRICS_INTERVAL,
+            port: int or None = None
+    ):
+        self.__registry = registry
+        self.__queues = queues if queues is not None else {}
+        self.__path = path
+        self.__interval = interval
+        self.__port = port
+        self.__task = None
+        self.__server = None
+
+    @property
+    def port(self) -> int or None:
+        """port: int or None port the Prometheus endpoint is listening on"""
+        if self.__server is None:
+            return None
+        return self.__server.sockets[0].getsockname()[1]
+
+    async def start(self) -> None:
+        if self.__port is not None:
+            self.__server = await asyncio.start_server(self.__serve, '127.0.0.1', self.__port)
+            logger.info(f'Serving the crawler metrics on http://127.0.0.1:{self.port}/metrics')
+        self.__task = asyncio.create_task(self())
+
+    async def __call__(self) -> None:
+        while True:
+            await asyncio.sleep(self.__interval)
+            self.export()
+
+    def sample(self) -> None:
+        """Record the current depth of the queues"""
+        depth = self.__registry.gauge('crawler_queue_depth', 'Number of items waiting in a queue')
+        for name, get_depth in self.__queues.items():
+            depth.set(get_depth(), queue=name)
+
+    def export(self) -> dict:
+        """Sample the queues and append a snapshot of the metrics to the metrics file"""
+        self.sample()
+        snapshot = self.__registry.snapshot()
+        if self.__path is not None:
+            try:
+                Path(self.__path).parent.mkdir(parents=True, exist_ok=True)
+                with open(self.__path, 'a') as _:
+                    _.write(json.dumps(snapshot) + '\n')
+            except OSError as e:
+                logger.warning(f'Failed to write the metrics snapshot: {e}')
+        return snapshot
+
+    async def __serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():    # skip the request headers
+                pass
+            if request_line.split(b' ')[1:2] in ([b'/metrics'], [b'/']):
+                self.sample()
+                body, status = self.__registry.prometheus().encode(), b'200 OK'
+            else:
+                body, status = b'Not Found\n', b'404 Not Found'
+            writer.write(
+                b'HTTP/1.1 ' + status + b'\r\n'
+                b'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                b'Content-Length: ' + str(len(body)).encode() + b'\r\n'
+                b'Connection: close\r\n\r\n' + body
+            )
+            await writer.drain()
+        except (ConnectionError, IndexError) as e:
+            logger.debug(f'Failed to serve the metrics: {e}')
+        finally:
+            writer.close()
+
+    async def stop(self) -> None:
+        """Stop exporting, writing a last snapshot"""
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        if self.__server is not None:
+            self.__server.close()
+            await self.__server.wait_closed()
+            self.__server = None
+        self.export()
@@ -0,0 +1,203 @@
+import bisect
+import math
+import threading
+import time
+
+
+# Default histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def format_labels(labels: tuple[tuple[str, str], ...], extra: dict or None = None) -> str:
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ''
+    return '{' + ','.join([f'{k}="{str(v)}"' for k, v in items]) + '}'
+
+
+class Metric:
+    """Base class of the registry's metrics
+
+    :param name: str metric name
+    :param description: str help text of the metric
+    """
+
+    kind: str = 'untyped'
+    name: str
+    description: str
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+        self._values = {}
+
+    @staticmethod
+    def key(labels: dict) -> tuple[tuple[str, str], ...]:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            return [{'labels': dict(k), 'value': v} for k, v in self._values.items()]
+
+    def prometheus(self) -> list[str]:
+        with self._lock:
+            return [f'{self.name}{format_labels(k)} {v}' for k, v in self._values.items()]
+
+
+class Counter(Metric):
+    """Monotonically increasing value"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self.key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self.key(labels)] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values
+
+    :param name: str metric name
+    :param description: str help text of the metric
+    :param buckets: tuple[float] upper bounds of the buckets
+    """
+
+    kind = 'histogram'
+    buckets: tuple[float, ...]
+
+    def __init__(self, name: str, description: str, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self.key(labels)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = {'counts': [0] * (len(self.buckets) + 1), 'count': 0, 'sum': 0, 'max': 0}
+            values = self._values[key]
+            values['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            values['count'] += 1
+            values['sum'] += value
+            values['max'] = max(values['max'], value)
+
+    def time(self, **labels) -> 'Timer':
+        """Context manager observing the time spent in its block"""
+        return Timer(self, labels)
+
+    def quantile(self, values: dict, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in"""
+        rank, seen = q * values['count'], 0
+        for bound, count in zip(self.buckets + (math.inf,), values['counts']):
+            seen += count
+            if seen >= rank:
+                return min(bound, values['max'])
+        return values['max']
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            return [
+                {
+                    'labels': dict(k),
+                    'count': v['count'],
+                    'sum': v['sum'],
+                    'mean': v['sum'] / v['count'] if v['count'] else 0,
+                    'p50': self.quantile(v, 0.5),
+                    'p95': self.quantile(v, 0.95),
+                    'max': v['max'],
+                }
+                for k, v in self._values.items()
+            ]
+
+    def prometheus(self) -> list[str]:
+        lines = []
+        with self._lock:
+            for k, v in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), v['counts']):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else str(bound)
+                    lines.append(f'{self.name}_bucket{format_labels(k, {"le": le})} {cumulative}')
+                lines.append(f'{self.name}_sum{format_labels(k)} {v["sum"]}')
+                lines.append(f'{self.name}_count{format_labels(k)} {v["count"]}')
+        return lines
+
+
+class Timer:
+    """Context manager observing the elapsed time into a histogram"""
+
+    def __init__(self, histogram: Histogram, labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self) -> 'Timer':
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class MetricsRegistry:
+    """Registry of the crawler metrics
+
+    Metrics are created on first use and can be updated from the event loop and from worker threads.
+    """
+
+    __metrics: dict[str, Metric]
+    __lock: threading.Lock
+
+    def __init__(self):
+        self.__metrics = {}
+        self.__lock = threading.Lock()
+
+    def __get(self, cls: type, name: str, description: str, **kwargs) -> Metric:
+        with self.__lock:
+            if name not in self.__metrics:
+                self.__metrics[name] = cls(name, description, **kwargs)
+            return self.__metrics[name]
+
+    def counter(self, name: str, description: str = '') -> Counter:
+        return self.__get(Counter, name, description)
+
+    def gauge(self, name: str, description: str = '') -> Gauge:
+        return self.__get(Gauge, name, description)
+
+    def histogram(self, name: str, description: str = '', buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.__get(Histogram, name, description, buckets=buckets)
+
+    def snapshot(self) -> dict:
+        """Get the current value of every metric
+
+        :return: dict metric values by name, histograms summarized by count, sum, mean, p50, p95 and max
+        """
+        with self.__lock:
+            metrics = list(self.__metrics.values())
+        return {'timestamp': time.time(), 'metrics': {_.name: _.snapshot() for _ in metrics}}
+
+    def prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        with self.__lock:
+            metrics = list(self.__metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.prometheus())
+        return '\n'.join(lines) + '\n'
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__metrics = {}
@@ -0,0 +1,27 @@
+from typing import Callable
+
+from .ar_parse import parse_firms_detail_page
+from .hl_parse import parse_financial_statements_and_reports
+from .pdf_parse import parse_pdf_file
+
+
+# Registry of the consumer functions by name, used to rebuild serialized ScrapeRequests
+CONSUMERS: dict[str, Callable] = {
+    _.__name__: _ for _ in (parse_firms_detail_page, parse_financial_statements_and_reports, parse_pdf_file)
+}
+
+
+def get_consumer(name: str) -> Callable:
+    """Get a consumer function by its name
+
+    :param name: str name of the consumer function
+    :return: Callable the consumer function
+    """
+    if name not in CONSUMERS:
+        raise ValueError(f'Unknown consumer {name}. Available consumers: {list(CONSUMERS.keys())}.')
+    return CONSUMERS[name]
+
+
+__all__ = [
+    'CONSUMERS', 'get_consumer', 'parse_firms_detail_page', 'parse_financial_statements_and_reports', 'parse_pdf_file'
+]
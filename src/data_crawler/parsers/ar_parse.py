@@ -6,10 +6,21 @@ from lxml import etree
 from src.data_crawler.constants import LOGGER_NAME, DATA_SRC_URLS
 from src.data_crawler.scrape_requests import ScrapeRequest, ScrapeResponse
 from src.data_crawler.parsers.pdf_parse import parse_pdf_file
+from src.data_crawler.parsers.html_parse import parse_html
 
 
 logger = getLogger(LOGGER_NAME)
 
+# Compiled XPath expressions, built once at import
+STOCK_LINKS = etree.XPath("//div[@class='apparel_stores_company_list']//span[@class='companyName']/a")
+LINK_TEXT = etree.XPath("./text()")
+LINK_HREF = etree.XPath("./@href")
+VENDOR_NAME = etree.XPath("//div[@class='left_section']/div[@class='vendor_name']/h1/text()")
+TICKER_NAME = etree.XPath("//span[@class='ticker_name']/text()")
+ARCHIVED_REPORTS = etree.XPath("//div[@class='archived_report_content_block']/ul/li/div")
+REPORT_HREF = etree.XPath("./span[@class='btn_archived download']/a/@href")
+REPORT_HEADING = etree.XPath("./span[@class='heading']/text()")
+
 
 def parse_stocks_table(response_text: str) -> dict[str, str]:
     """Function to parse the stocks table content
@@ -19,12 +30,11 @@ def parse_stocks_table(response_text: str) -> dict[str, str]:
     """
     logger.debug('Starting AR\'s stock table parsing process...')
 
-    parser = etree.HTMLParser()
-    selector = etree.fromstring(response_text, parser)
+    selector = parse_html(response_text)
     data = {}
-    for stock in selector.xpath("//div[@class='apparel_stores_company_list']//span[@class='companyName']/a"):
-        name = stock.xpath("./text()")[0]
-        href = stock.xpath("./@href")[0]
+    for stock in STOCK_LINKS(selector):
+        name = LINK_TEXT(stock)[0]
+        href = LINK_HREF(stock)[0]
         data[name] = href
 
     logger.debug('Finished AR\'s stock table parsing process.')
@@ -44,26 +54,26 @@ def parse_firms_detail_page(
     """
     logger.debug(f'Starting AR\'s firms detail parsing for {scrape_response.url}...')
 
-    parser = etree.HTMLParser()
-    selector = etree.fromstring(scrape_response.request.response.text, parser)
+    selector = parse_html(scrape_response.request.response.text)
 
     # Gather share information
+    ticker = TICKER_NAME(selector)[0]
     share = {
-        'title': selector.xpath("//div[@class='left_section']/div[@class='vendor_name']/h1/text()")[0],
-        'ticker': selector.xpath("//span[@class='ticker_name']/text()")[0],
-        'identifier': selector.xpath("//span[@class='ticker_name']/text()")[0],
+        'title': VENDOR_NAME(selector)[0],
+        'ticker': ticker,
+        'identifier': ticker,
     }
 
     logger.debug(f'Gathered stock metadata for {share["ticker"]} from {scrape_response.url}.')
 
     # Gather annual and interim reports download urls & Build new requests
     requests = []
-    for div in selector.xpath("//div[@class='archived_report_content_block']/ul/li/div"):
-        url = DATA_SRC_URLS['ar-base'] + div.xpath("./span[@class='btn_archived download']/a/@href")[0]
+    for div in ARCHIVED_REPORTS(selector):
+        url = DATA_SRC_URLS['ar-base'] + REPORT_HREF(div)[0]
         m = scrape_response.metadata.copy()
         m.update({
             'data_type': 'annual_report',
-            'year': div.xpath("./span[@class='heading']/text()")[0].split(' ')[0],
+            'year': REPORT_HEADING(div)[0].split(' ')[0],
             'url_append': None,
             'share': share,
             'url': url,
@@ -72,7 +82,7 @@ def parse_firms_detail_page(
         requests.append(
             ScrapeRequest(
                 metadata=m,
-                request=client.request(
+                request=client.build_request(
                     method="GET",
                     url=url
                 ),
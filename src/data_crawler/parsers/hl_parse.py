@@ -9,10 +9,30 @@ from markdownify import markdownify as md
 from src.data_crawler.constants import LOGGER_NAME
 from src.data_crawler.scrape_requests import ScrapeRequest, ScrapeResponse
 from src.data_crawler.parsers.pdf_parse import parse_pdf_file
+from src.data_crawler.parsers.html_parse import parse_html
 
 
 logger = logging.getLogger(LOGGER_NAME)
 
+# Compiled XPath expressions, built once at import
+STOCK_ROWS = etree.XPath("//table[@class='stockTable']/tbody/tr[@class='table-odd' or @class='table-alt']")
+STOCK_LINK = etree.XPath("./td[2]//a")
+SHARE_TITLE = etree.XPath("//head/meta[@name='Share_Title']/@content")
+SHARE_TICKER = etree.XPath("//head/meta[@name='Share_EPIC']/@content")
+SHARE_IDENTIFIER = etree.XPath("//head/meta[@name='Share_Identifier']/@content")
+FINANCIALS_TABLE = etree.XPath("//div[@id='financials-table-wrapper']")
+REPORT_LINKS = etree.XPath("//div[@class='margin-top tab-content clearfix']/div[@class='grey-gradient clearfix']//a")
+LINK_HREF = etree.XPath("@href")
+LINK_TEXT = etree.XPath(".//text()")
+
+REPORT_TYPE_NOISE = re.compile(r'(\n|\t|Download|download)')
+
+
+def get_report_type(a: etree._Element) -> str:
+    """Get the report type from the text of a report download link, e.g. annual_report"""
+    text = REPORT_TYPE_NOISE.sub('', ''.join(LINK_TEXT(a)))
+    return text.split('&amp')[0].strip().lower().replace(' ', '_')
+
 
 def parse_stocks_table(response_text: str) -> dict[str, str]:
     """Function to parse the stocks table content
@@ -22,14 +42,11 @@ def parse_stocks_table(response_text: str) -> dict[str, str]:
     """
     logger.debug('Starting HL\'s stock table parsing process...')
 
-    parser = etree.HTMLParser()
-    selector = etree.fromstring(response_text, parser)
+    selector = parse_html(response_text)
     data = {}
-    for stock in selector.xpath("//table[@class='stockTable']/tbody/tr[@class='table-odd' or @class='table-alt']"):
-        e = stock.xpath(".//td")[1]
-        name = e.xpath(".//a/text()")[0]
-        href = e.xpath(".//a/@href")[0]
-        data[name] = href
+    for stock in STOCK_ROWS(selector):
+        a = STOCK_LINK(stock)[0]
+        data[a.text] = a.get('href')
 
     logger.debug('Finished HL\'s stock table parsing process.')
 
@@ -48,14 +65,13 @@ def parse_financial_statements_and_reports(
     """
     logger.debug(f'Starting HL\'s financial statements table parsing for {response.url}...')
 
-    parser = etree.HTMLParser()
-    selector = etree.fromstring(response.request.response.text, parser)
+    selector = parse_html(response.request.response.text)
 
     # Gather share information
     share = {
-        'title': selector.xpath("//head/meta[@name='Share_Title']/@content")[0],
-        'ticker': selector.xpath("//head/meta[@name='Share_EPIC']/@content")[0],
-        'identifier': selector.xpath("//head/meta[@name='Share_Identifier']/@content")[0],
+        'title': SHARE_TITLE(selector)[0],
+        'ticker': SHARE_TICKER(selector)[0],
+        'identifier': SHARE_IDENTIFIER(selector)[0],
     }
 
     logger.debug(f'Gathered stock metadata from {response.url}.')
@@ -63,7 +79,7 @@ def parse_financial_statements_and_reports(
     # Gather financial results tables information
     data = None
     try:
-        financials_table = selector.xpath("//div[@id='financials-table-wrapper']")
+        financials_table = FINANCIALS_TABLE(selector)
         inner_html = etree.tostring(financials_table[0]).decode().replace('&#13;', '')
         markdown = md(inner_html)
         data = markdown.encode()
@@ -73,19 +89,16 @@ def parse_financial_statements_and_reports(
 
     # Gather annual and interim reports download urls & Build new requests
     requests = []
-    links = selector.xpath("//div[@class='margin-top tab-content clearfix']/div[@class='grey-gradient clearfix']//a")
+    links = REPORT_LINKS(selector)
     if len(links) > 0:
+        year = datetime.now().year - 1
         for a in links:
-            url = a.xpath("@href")[0]
+            url = LINK_HREF(a)[0]
             m = response.metadata.copy()
             m.update({
-                'data_type': re.sub(
-                    r'(\n|\t|Download|download)',
-                    '',
-                    ''.join(a.xpath('.//text()'))
-                ).split('&amp')[0].strip().lower().replace(' ', '_'),
+                'data_type': get_report_type(a),
                 'url_append': '',
-                'year': datetime.now().year - 1,
+                'year': year,
                 'share': share,
                 'url': url,
                 'method': 'GET'
@@ -93,7 +106,7 @@ def parse_financial_statements_and_reports(
             requests.append(
                 ScrapeRequest(
                     metadata=m,
-                    request=client.request(method="GET", url=url),
+                    request=client.build_request(method="GET", url=url),
                     consumer=parse_pdf_file
                 )
             )
@@ -0,0 +1,28 @@
+import threading
+
+from lxml import etree
+
+
+# lxml parsers can be reused between documents, but not shared between threads
+_local = threading.local()
+
+
+def get_html_parser() -> etree.HTMLParser:
+    """Get the calling thread's reusable HTML parser
+
+    :return: etree.HTMLParser the thread's parser
+    """
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = _local.parser = etree.HTMLParser()
+    return parser
+
+
+def parse_html(text: str) -> etree._Element:
+    """Parse an HTML document with the calling thread's reusable parser
+
+    :param text: str html text
+    :return: etree._Element root element of the document
+    """
+    return etree.fromstring(text, get_html_parser())
+
@@ -0,0 +1,6 @@
+from .robots_cache import RobotsCache, RobotsRules
+from .host_scheduler import HostScheduler
+from .shared_host_scheduler import SharedHostScheduler
+
+
+__all__ = ['HostScheduler', 'RobotsCache', 'RobotsRules', 'SharedHostScheduler']
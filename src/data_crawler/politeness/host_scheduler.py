@@ -0,0 +1,136 @@
+import asyncio
+import collections
+import logging
+
+from src.data_crawler.constants import LOGGER_NAME, MAX_IN_FLIGHT_PER_HOST
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class HostSlots:
+    """Request permits of a single host
+
+    Works as a token bucket holding a single token refilled every crawl delay: each permit reserves the next free
+    time slot of the host, so waiting consumers sleep until exactly their slot instead of polling. On top of that, at
+    most max_in_flight permits are held at the same time, the rest wait in FIFO order for a release.
+
+    :param delay: float seconds between two consecutive permits
+    :param max_in_flight: int maximum number of permits held at the same time
+    """
+
+    delay: float
+    max_in_flight: int
+    in_flight: int
+    next_permit: float
+    waiters: collections.deque
+
+    def __init__(self, delay: float, max_in_flight: int):
+        self.delay = delay
+        self.max_in_flight = max(1, max_in_flight)
+        self.in_flight = 0
+        self.next_permit = 0
+        self.waiters = collections.deque()
+
+    @property
+    def waiting(self) -> int:
+        return len([_ for _ in self.waiters if not _.done()])
+
+    def is_available(self, now: float) -> bool:
+        """Whether a permit would be granted without waiting"""
+        return self.in_flight < self.max_in_flight and not self.waiting and self.next_permit <= now
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+
+        # Wait for an in-flight slot
+        if self.in_flight >= self.max_in_flight or self.waiting:
+            waiter = loop.create_future()
+            self.waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self.release()  # the slot was already handed over, pass it on
+                raise
+        else:
+            self.in_flight += 1
+
+        # Reserve the next time slot and sleep until it opens
+        now = loop.time()
+        permit = max(now, self.next_permit)
+        self.next_permit = permit + self.delay
+        if permit > now:
+            try:
+                await asyncio.sleep(permit - now)
+            except asyncio.CancelledError:
+                self.release()
+                raise
+
+    def release(self) -> None:
+        # Hand the in-flight slot over to the first waiter, if any
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight = max(0, self.in_flight - 1)
+
+
+class HostScheduler:
+    """Per host request scheduler
+
+    Shared by all the request consumers so each host's crawl delay and maximum number of in-flight requests are
+    enforced across consumers, while different hosts are throttled independently.
+
+    :param max_in_flight: int maximum number of in-flight requests per host
+    :param ignore_delays: bool whether to grant permits without waiting for the crawl delays, used when replaying
+    """
+
+    __max_in_flight: int
+    __ignore_delays: bool
+    __hosts: dict[str, HostSlots]
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT_PER_HOST, ignore_delays: bool = False):
+        self.__max_in_flight = max_in_flight
+        self.__ignore_delays = ignore_delays
+        self.__hosts = {}
+
+    def __slots(self, host: str, delay: float = 0) -> HostSlots:
+        if host not in self.__hosts:
+            self.__hosts[host] = HostSlots(delay, self.__max_in_flight)
+        return self.__hosts[host]
+
+    async def acquire(self, host: str, delay: float) -> None:
+        """Wait for a permit to send a request to the host
+
+        :param host: str host of the request
+        :param delay: float crawl delay of the host in seconds
+        """
+        delay = 0 if self.__ignore_delays else delay
+        slots = self.__slots(host, delay)
+        slots.delay = delay
+        await slots.acquire()
+
+    def release(self, host: str) -> None:
+        """Return a permit once its request has finished
+
+        :param host: str host of the request
+        """
+        self.__slots(host).release()
+
+    @property
+    def waiting(self) -> int:
+        """waiting: int number of requests waiting for an in-flight slot, across all the hosts"""
+        return sum([_.waiting for _ in self.__hosts.values()])
+
+    def available_hosts(self) -> int:
+        """Number of known hosts that would grant a permit right away"""
+        now = asyncio.get_running_loop().time()
+        return len([_ for _ in self.__hosts.values() if _.is_available(now)])
+
+    def stats(self) -> dict:
+        return {
+            host: {'delay': slots.delay, 'in_flight': slots.in_flight, 'waiting': slots.waiting}
+            for host, slots in self.__hosts.items()
+        }
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import os
+import time
+
+from pathlib import Path
+from urllib.robotparser import RobotFileParser
+
+from httpx import AsyncClient, URL
+
+from src.data_crawler.constants import (
+    LOGGER_NAME, ROBOTS_TXT_SUFFIX, ROBOTS_USER_AGENT, ROBOTS_CACHE_PATH, ROBOTS_CACHE_TTL
+)
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+# robots.txt directives kept when persisting the rules
+ROBOTS_DIRECTIVES = ('user-agent', 'allow', 'disallow', 'crawl-delay', 'request-rate')
+
+
+class RobotsRules:
+    """Parsed robots.txt rules of a host
+
+    :param host: str host the rules belong to
+    :param lines: list[str] robots.txt directive lines
+    :param fetched_at: float timestamp of when the robots.txt file was fetched
+    :param allow_all: bool whether every url is allowed, used when the host has no robots.txt
+    :param disallow_all: bool whether every url is disallowed, used when the robots.txt is access restricted
+    """
+
+    __host: str
+    __lines: list[str]
+    __fetched_at: float
+    __parser: RobotFileParser
+
+    def __init__(
+            self,
+            host: str,
+            lines: list[str],
+            fetched_at: float,
+            allow_all: bool = False,
+            disallow_all: bool = False
+    ):
+        self.__host = host
+        self.__lines = [
+            line.strip() for line in lines
+            if line.split(':', 1)[0].strip().lower() in ROBOTS_DIRECTIVES
+        ]
+        self.__fetched_at = fetched_at
+        self.__parser = RobotFileParser()
+        self.__parser.parse(self.__lines)
+        self.__parser.allow_all = allow_all
+        self.__parser.disallow_all = disallow_all
+
+    @property
+    def host(self) -> str:
+        return self.__host
+
+    @property
+    def fetched_at(self) -> float:
+        return self.__fetched_at
+
+    @property
+    def crawl_delay(self) -> float:
+        """crawl_delay: float seconds to wait between requests to the host"""
+        return float(self.__parser.crawl_delay(ROBOTS_USER_AGENT) or 0)
+
+    def can_fetch(self, url: URL or str) -> bool:
+        """Whether the robots.txt rules allow crawling the url"""
+        return self.__parser.can_fetch(ROBOTS_USER_AGENT, str(url))
+
+    def is_expired(self, ttl: float) -> bool:
+        return time.time() - self.__fetched_at > ttl
+
+    def to_dict(self) -> dict:
+        return {
+            'host': self.__host,
+            'lines': self.__lines,
+            'fetched_at': self.__fetched_at,
+            'crawl_delay': self.crawl_delay,
+            'allow_all': self.__parser.allow_all,
+            'disallow_all': self.__parser.disallow_all,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'RobotsRules':
+        return cls(
+            data['host'],
+            data['lines'],
+            data['fetched_at'],
+            allow_all=data['allow_all'],
+            disallow_all=data['disallow_all']
+        )
+
+
+class RobotsCache:
+    """Shared robots.txt rules cache
+
+    Fetches the robots.txt files through the crawler's AsyncClient, coalescing the concurrent lookups for the same host
+    into a single request, and persists the parsed rules to disk so restarts and parallel crawler processes reuse them
+    until they expire.
+
+    :param path: str or None path of the on-disk cache file, rules are only kept in memory if None
+    :param ttl: float time in seconds the rules are valid for
+    """
+
+    __path: str or None
+    __ttl: float
+    __rules: dict[str, RobotsRules]
+    __pending: dict[str, asyncio.Task]
+
+    def __init__(self, path: str or None = ROBOTS_CACHE_PATH, ttl: float = ROBOTS_CACHE_TTL):
+        self.__path = path
+        self.__ttl = ttl
+        self.__rules = {}
+        self.__pending = {}
+
+    async def get(self, url: URL, client: AsyncClient) -> RobotsRules:
+        """Get the robots.txt rules for the url's host
+
+        :param url: URL url to get the rules for
+        :param client: AsyncClient HTTP Client used to fetch the robots.txt file
+        :return: RobotsRules the host's rules
+        """
+        rules = self.__rules.get(url.host)
+        if rules is None or rules.is_expired(self.__ttl):
+            rules = self.__load(url.host)
+        if rules is not None and not rules.is_expired(self.__ttl):
+            self.__rules[url.host] = rules
+            return rules
+
+        if url.host not in self.__pending:
+            task = asyncio.create_task(self.__fetch(url, client))
+            task.add_done_callback(lambda _: self.__pending.pop(url.host, None))
+            self.__pending[url.host] = task
+        return await asyncio.shield(self.__pending[url.host])
+
+    async def __fetch(self, url: URL, client: AsyncClient) -> RobotsRules:
+        scheme = url.scheme + '://' if url.scheme else 'https://'
+        robots_url = scheme + url.host + ROBOTS_TXT_SUFFIX
+        logger.debug(f'Fetching robots.txt rules from {robots_url}')
+        try:
+            response = await client.get(robots_url, follow_redirects=True)
+            if response.status_code in (401, 403):
+                rules = RobotsRules(url.host, [], time.time(), disallow_all=True)
+            elif 400 <= response.status_code < 500:
+                rules = RobotsRules(url.host, [], time.time(), allow_all=True)
+            elif response.is_success:
+                rules = RobotsRules(url.host, response.text.splitlines(), time.time())
+            else:
+                raise Exception(f'Unexpected status code {response.status_code}')
+        except Exception as e:
+            # Do not persist failed lookups, they are retried once the in-memory rules expire
+            logger.warning(f'Failed to retrieve {robots_url} robots.txt file. Got exception: {e}')
+            rules = RobotsRules(url.host, [], time.time() - self.__ttl + 60, allow_all=True)
+            self.__rules[url.host] = rules
+            return rules
+
+        self.__rules[url.host] = rules
+        self.__save(rules)
+        logger.debug(f'Got robots.txt rules for {url.host}, crawl delay of {rules.crawl_delay}s')
+        return rules
+
+    def __read(self) -> dict:
+        if self.__path is None:
+            return {}
+        try:
+            with open(self.__path, 'r') as _:
+                return json.load(_)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def __load(self, host: str) -> RobotsRules or None:
+        data = self.__read().get(host)
+        return RobotsRules.from_dict(data) if data else None
+
+    def __save(self, rules: RobotsRules) -> None:
+        if self.__path is None:
+            return
+        try:
+            data = self.__read()    # merge with the rules stored by other crawler processes
+            data[rules.host] = rules.to_dict()
+            Path(self.__path).parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = f'{self.__path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as _:
+                json.dump(data, _, indent=2)
+            os.replace(tmp_path, self.__path)
+        except OSError as e:
+            logger.warning(f'Failed to persist the robots.txt rules for {rules.host}: {e}')
@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import sqlite3
+import time
+
+from pathlib import Path
+
+from src.data_crawler.constants import LOGGER_NAME, MAX_IN_FLIGHT_PER_HOST, FRONTIER_PATH
+from src.data_crawler.politeness.host_scheduler import HostScheduler
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    next_permit REAL NOT NULL
+);
+"""
+
+
+class SharedHostScheduler(HostScheduler):
+    """Per host request scheduler shared by several crawler workers through a SQLite database
+
+    Each host's crawl delay is enforced across all the workers: permits reserve the next free time slot of the host
+    on the shared database, by wall clock time, so the machines sharing it need synchronized clocks. The maximum
+    number of in-flight requests per host is enforced by each worker on its own.
+
+    :param path: str path of the SQLite database file
+    :param max_in_flight: int maximum number of in-flight requests per host, for each worker
+    """
+
+    __path: str
+    __connection: sqlite3.Connection or None
+
+    def __init__(self, path: str = FRONTIER_PATH, max_in_flight: int = MAX_IN_FLIGHT_PER_HOST):
+        super().__init__(max_in_flight=max_in_flight)
+        self.__path = path
+        self.__connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            Path(self.__path).parent.mkdir(parents=True, exist_ok=True)
+            self.__connection = sqlite3.connect(self.__path, timeout=30)
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+            self.__connection.executescript(SCHEMA)
+        return self.__connection
+
+    def reserve(self, host: str, delay: float) -> float:
+        """Reserve the next free time slot of a host
+
+        :param host: str host of the request
+        :param delay: float crawl delay of the host in seconds
+        :return: float wall clock time of the reserved slot
+        """
+        now = time.time()
+        with self.connection as _:
+            rows = _.execute(
+                'INSERT INTO hosts (host, next_permit) VALUES (?, ?) '
+                'ON CONFLICT (host) DO UPDATE SET next_permit = max(next_permit, ?) + ? '
+                'RETURNING next_permit',
+                (host, now + delay, now, delay)
+            ).fetchall()     # RETURNING statements only complete once all their rows are fetched
+        return rows[0][0] - delay
+
+    async def acquire(self, host: str, delay: float) -> None:
+        """Wait for a permit to send a request to the host
+
+        :param host: str host of the request
+        :param delay: float crawl delay of the host in seconds
+        """
+        await super().acquire(host, 0)  # in-flight slot of this worker, the delay is enforced across workers below
+        try:
+            wait = self.reserve(host, delay) - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            super().release(host)
+            raise
+
+    def close(self) -> None:
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
@@ -1,6 +1,9 @@
+from .bounded_queue import BoundedQueue
+from .retry_queue import RetryQueue
 from .async_task import AsyncTask
 from .success_handler import success_handler
 from .redirect_handler import redirect_handler
+from .not_modified_handler import not_modified_handler
 
 
-__all__ = ['AsyncTask', 'redirect_handler', 'success_handler']
+__all__ = ['AsyncTask', 'BoundedQueue', 'RetryQueue', 'not_modified_handler', 'redirect_handler', 'success_handler']
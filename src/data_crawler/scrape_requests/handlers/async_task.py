@@ -1,10 +1,14 @@
 import logging
 import uuid
 from asyncio import Queue
+from typing import Callable
 
+import jsonlines
 from httpx import AsyncClient
 
 from src.data_crawler.constants import LOGGER_NAME
+from src.data_crawler.storage import JsonlWriter
+from src.data_crawler.scrape_requests.handlers.retry_queue import RetryQueue
 
 
 logger = logging.getLogger(LOGGER_NAME)
@@ -16,12 +20,28 @@ class AsyncTask:
     __client: AsyncClient
     __task_queue: Queue
     __response_queue: Queue
-
-    def __init__(self, client: AsyncClient, task_queue: Queue, response_queue: Queue or None, task_id: any = None):
+    __writer: JsonlWriter or None
+    __retry_queue: RetryQueue or None
+    __idle: bool
+    __retired: bool
+
+    def __init__(
+            self,
+            client: AsyncClient,
+            task_queue: Queue,
+            response_queue: Queue or None,
+            task_id: any = None,
+            writer: JsonlWriter or None = None,
+            retry_queue: RetryQueue or None = None
+    ):
         self.__id = str(uuid.uuid4()) if task_id is None else str(task_id)
         self.__client = client
         self.__task_queue = task_queue
         self.__response_queue = response_queue
+        self.__writer = writer
+        self.__retry_queue = retry_queue
+        self.__idle = False
+        self.__retired = False
 
     @property
     def id(self):
@@ -39,6 +59,55 @@ class AsyncTask:
     def response_queue(self):
         return self.__response_queue
 
+    @property
+    def writer(self) -> JsonlWriter or None:
+        return self.__writer
+
+    @property
+    def retry_queue(self) -> RetryQueue or None:
+        return self.__retry_queue
+
+    @property
+    def idle(self) -> bool:
+        """idle: bool whether the task is waiting for an item from its queue"""
+        return self.__idle
+
+    @property
+    def retired(self) -> bool:
+        """retired: bool whether the task is to stop once it has finished its current item"""
+        return self.__retired
+
+    def retire(self) -> None:
+        """Stop the task once it has finished its current item"""
+        self.__retired = True
+
+    async def get_item(self, queue: Queue) -> any:
+        """Wait for the next item of a queue, the task is idle meanwhile
+
+        :param queue: Queue queue to get the item from
+        :return: any the item
+        """
+        self.__idle = True
+        try:
+            return await queue.get()
+        finally:
+            self.__idle = False
+
+    def write_record(self, path: str, record: dict, callback: Callable[[], None] or None = None) -> None:
+        """Append a record to a jsonlines file through the shared writer, or directly if there is none
+
+        :param path: str path of the jsonlines file
+        :param record: dict record to write
+        :param callback: Callable or None function called once the record is written to the file
+        """
+        if self.writer is not None:
+            self.writer.write(path, record, callback)
+            return
+        with jsonlines.open(path, 'a') as _:
+            _.write(record)
+        if callback is not None:
+            callback()
+
     def info(self, msg: str) -> None:
         logger.info(f'{self.id} | {msg}')
 
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import math
+
+from typing import Callable
+
+from src.data_crawler.constants import LOGGER_NAME, AUTOSCALE_INTERVAL, AUTOSCALE_STEP
+from src.data_crawler.conversion import ConversionPool
+from src.data_crawler.politeness import HostScheduler
+from src.data_crawler.metrics import metrics
+from src.data_crawler.scrape_requests.handlers.async_task import AsyncTask
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class ConsumerPool:
+    """Pool of consumer tasks that can be resized while running
+
+    Growing the pool starts new consumers. Shrinking it cancels idle consumers first, as they are only waiting for an
+    item, and retires busy ones, which stop once they have finished their current item.
+
+    :param name: str pool name
+    :param factory: Callable building a consumer from its id
+    :param size: int initial number of consumers
+    :param min_size: int minimum number of consumers
+    :param max_size: int maximum number of consumers
+    """
+
+    __name: str
+    __factory: Callable[[int], AsyncTask]
+    __min_size: int
+    __max_size: int
+    __consumers: dict[AsyncTask, asyncio.Task]
+    __next_id: int
+    __closed: bool
+
+    def __init__(self, name: str, factory: Callable[[int], AsyncTask], size: int, min_size: int, max_size: int):
+        self.__name = name
+        self.__factory = factory
+        self.__min_size = max(1, min_size)
+        self.__max_size = max(self.__min_size, max_size)
+        self.__consumers = {}
+        self.__next_id = 0
+        self.__closed = False
+        self.resize(size)
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def size(self) -> int:
+        """size: int number of running consumers, retired ones excluded"""
+        return len([_ for _ in self.__consumers if not _.retired])
+
+    @property
+    def idle(self) -> int:
+        """idle: int number of running consumers waiting for an item"""
+        return len([_ for _ in self.__consumers if not _.retired and _.idle])
+
+    def resize(self, size: int) -> int:
+        """Grow or shrink the pool, within its bounds
+
+        :param size: int requested number of consumers
+        :return: int number of consumers once resized
+        """
+        if self.__closed:
+            return 0
+        size = min(self.__max_size, max(self.__min_size, size))
+        while self.size < size:
+            consumer = self.__factory(self.__next_id)
+            self.__next_id += 1
+            task = asyncio.create_task(consumer())
+            task.add_done_callback(lambda _, c=consumer: self.__consumers.pop(c, None))
+            self.__consumers[consumer] = task
+        running = sorted([_ for _ in self.__consumers if not _.retired], key=lambda _: not _.idle)
+        for consumer in running[:max(0, len(running) - size)]:
+            consumer.retire()
+            if consumer.idle:
+                self.__consumers[consumer].cancel()
+        metrics.gauge('crawler_consumers', 'Number of running consumers').set(self.size, pool=self.__name)
+        return self.size
+
+    def retire(self) -> None:
+        """Stop every consumer once it has finished its current item, the pool can't be resized afterwards"""
+        self.__closed = True
+        for consumer, task in self.__consumers.items():
+            consumer.retire()
+            if consumer.idle:
+                task.cancel()
+
+    async def wait(self, timeout: float or None = None) -> int:
+        """Wait for the consumers to stop
+
+        :param timeout: float or None maximum seconds to wait
+        :return: int number of consumers still running once the timeout expired
+        """
+        tasks = list(self.__consumers.values())
+        if not tasks:
+            return 0
+        _, running = await asyncio.wait(tasks, timeout=timeout)
+        return len(running)
+
+    def cancel(self) -> None:
+        """Stop every consumer, the pool can't be resized afterwards"""
+        self.__closed = True
+        [_.cancel() for _ in self.__consumers.values()]
+
+
+class ConsumerAutoscaler:
+    """Controller resizing the request and response consumer pools
+
+    Every interval, each pool is grown while its queue has a backlog that its consumers don't keep up with, and shrunk
+    while it has idle consumers, at most step consumers at a time:
+
+    - request consumers are only added while no request waits for a host permit, and removed while requests wait for
+      the in-flight slots of saturated hosts and no host has a free permit, as extra consumers would only wait too;
+    - response consumers are only added while the conversion workers have room, and removed while the conversion
+      backlog is larger than the number of workers, as extra consumers would only queue more conversions.
+
+    :param request_pool: ConsumerPool ScrapeRequest consumers
+    :param response_pool: ConsumerPool ScrapeResponse consumers
+    :param task_queue: asyncio.Queue Scrape Request queue
+    :param response_queue: asyncio.Queue Scrape Response queue
+    :param scheduler: HostScheduler per host request scheduler of the request consumers
+    :param conversion_pool: ConversionPool PDF conversion worker pool of the response consumers
+    :param interval: float seconds between two decisions
+    :param step: int maximum number of consumers added or removed from a pool in a single decision
+    """
+
+    __request_pool: ConsumerPool
+    __response_pool: ConsumerPool
+    __task_queue: asyncio.Queue
+    __response_queue: asyncio.Queue
+    __scheduler: HostScheduler
+    __conversion_pool: ConversionPool
+    __interval: float
+    __step: int
+    __task: asyncio.Task or None
+
+    def __init__(
+            self,
+            request_pool: ConsumerPool,
+            response_pool: ConsumerPool,
+            task_queue: asyncio.Queue,
+            response_queue: asyncio.Queue,
+            scheduler: HostScheduler,
+            conversion_pool: ConversionPool,
+            interval: float = AUTOSCALE_INTERVAL,
+            step: int = AUTOSCALE_STEP
+    ):
+        self.__request_pool = request_pool
+        self.__response_pool = response_pool
+        self.__task_queue = task_queue
+        self.__response_queue = response_queue
+        self.__scheduler = scheduler
+        self.__conversion_pool = conversion_pool
+        self.__interval = interval
+        self.__step = step
+        self.__task = None
+
+    def get_request_pool_size(self) -> int:
+        pool, backlog, waiting = self.__request_pool, self.__task_queue.qsize(), self.__scheduler.waiting
+        if backlog > 0 and pool.idle == 0 and waiting == 0:
+            return pool.size + min(backlog, self.__step)
+        if waiting > 0 and self.__scheduler.available_hosts() == 0:
+            return pool.size - min(waiting, self.__step)
+        if backlog == 0 and pool.idle > 0:
+            return pool.size - min(math.ceil(pool.idle / 2), self.__step)
+        return pool.size
+
+    def get_response_pool_size(self) -> int:
+        pool, backlog = self.__response_pool, self.__response_queue.qsize()
+        conversion_backlog = self.__conversion_pool.queue_depth
+        if backlog > 0 and pool.idle == 0 and conversion_backlog == 0:
+            return pool.size + min(backlog, self.__step)
+        if conversion_backlog > self.__conversion_pool.size:
+            return pool.size - min(conversion_backlog - self.__conversion_pool.size, self.__step)
+        if backlog == 0 and pool.idle > 0:
+            return pool.size - min(math.ceil(pool.idle / 2), self.__step)
+        return pool.size
+
+    def scale(self) -> None:
+        """Resize both consumer pools once"""
+        for pool, size in (
+                (self.__request_pool, self.get_request_pool_size()),
+                (self.__response_pool, self.get_response_pool_size()),
+        ):
+            if size != pool.size:
+                logger.debug(f'Resizing the {pool.name} consumer pool from {pool.size} to {pool.resize(size)}.')
+
+    def start(self) -> None:
+        self.__task = asyncio.create_task(self())
+
+    async def __call__(self) -> None:
+        while True:
+            await asyncio.sleep(self.__interval)
+            self.scale()
+
+    def stop(self) -> None:
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
@@ -0,0 +1,75 @@
+import asyncio
+import collections
+
+
+class BoundedQueue(asyncio.Queue):
+    """Queue bounded by its number of items and by the total size of the items it holds
+
+    Putting an item waits while the queue is full, either because it holds maxsize items or because their total size
+    reached max_bytes. An item's size is read from its size attribute when it is put, items without one count as 0.
+    A single item larger than max_bytes is still admitted into an empty queue.
+
+    Items produced by the queue's own consumers, such as follow-up requests and retries, are put with put_unbounded
+    instead: a consumer waiting on the queue it drains could otherwise deadlock the crawl.
+
+    :param maxsize: int maximum number of items, unbounded if 0
+    :param max_bytes: int maximum total size in bytes of the items, unbounded if 0
+    """
+
+    __max_bytes: int
+    __bytes: int
+    __sizes: collections.deque
+    __unbounded: bool
+
+    def __init__(self, maxsize: int = 0, max_bytes: int = 0):
+        super().__init__(maxsize)
+        self.__max_bytes = max_bytes
+        self.__bytes = 0
+        self.__sizes = collections.deque()
+        self.__unbounded = False
+
+    @property
+    def max_bytes(self) -> int:
+        return self.__max_bytes
+
+    @property
+    def bytes(self) -> int:
+        """bytes: int total size in bytes of the items in the queue"""
+        return self.__bytes
+
+    def _put(self, item) -> None:
+        size = getattr(item, 'size', 0) or 0
+        self.__sizes.append(size)
+        self.__bytes += size
+        super()._put(item)
+
+    def _get(self):
+        self.__bytes -= self.__sizes.popleft()
+        return super()._get()
+
+    def full(self) -> bool:
+        if self.__unbounded:
+            return False
+        if self.__max_bytes > 0 and self.__bytes >= self.__max_bytes:
+            return True
+        return super().full()
+
+    def put_unbounded(self, item) -> None:
+        """Put an item without waiting, regardless of the queue bounds"""
+        self.__unbounded = True
+        try:
+            self.put_nowait(item)
+        finally:
+            self.__unbounded = False
+
+
+def put_unbounded(queue: asyncio.Queue, item) -> None:
+    """Put an item produced by one of the queue's consumers, without waiting for room in the queue
+
+    :param queue: asyncio.Queue the queue, bounds are ignored if it is a BoundedQueue
+    :param item: any item to put
+    """
+    if isinstance(queue, BoundedQueue):
+        queue.put_unbounded(item)
+    else:
+        queue.put_nowait(item)
@@ -1,16 +1,16 @@
 import logging
-import asyncio
-
-import jsonlines
 
 from src.data_crawler.scrape_requests import ScrapeRequest, ScrapeResponse
-from src.data_crawler.constants import LOGGER_NAME, MAX_RETRIES
+from src.data_crawler.constants import LOGGER_NAME, RETRY_POLICIES, ERROR_JSONL_PATH
+from src.data_crawler.frontier import SqliteFrontier
 from src.data_crawler.scrape_requests.handlers import AsyncTask
+from src.data_crawler.scrape_requests.handlers.retry_queue import get_error_class, get_retry_delay
+from src.data_crawler.scrape_requests.handlers.bounded_queue import put_unbounded
+from src.data_crawler.metrics import metrics
+from src.data_crawler.tracing import tracer
 
 logger = logging.getLogger(LOGGER_NAME)
 
-writer_lock = asyncio.Lock()
-
 
 async def handle_consumer_exception(
         exception: Exception,
@@ -19,6 +19,12 @@ async def handle_consumer_exception(
 ) -> None:
     """Scrape request consumer exception handler
 
+    Failed items are retried following the retry policy of their error class. With a retry queue, they re-enter their
+    queue once their backoff delay is due, otherwise they are put back right away. Requests of a shared SqliteFrontier
+    go back to the frontier with their backoff delay instead, so they are not held by the worker past their lease.
+    Items that exhaust their retries are dropped. Every failure is logged to the error file, with its error class,
+    its attempt and whether the item is retried or abandoned.
+
     :param exception: Exception to be handled
     :param scrape_object: ScrapeRequest item
     :param async_task: AsyncTask object where the exception was raised
@@ -26,24 +32,55 @@ async def handle_consumer_exception(
     if scrape_object is not None:
         async_task.warning(f'Error consuming {type(scrape_object).__name__} {scrape_object.url}')
 
-        # Log error to file
-        async with writer_lock:
-            try:
-                with jsonlines.open('./out/data-crawler/error.jsonl', 'a') as _:
-                    _.write(scrape_object.get_postmortem_log(exception))
-            except Exception as e:
-                async_task.exception(e)
+        if type(scrape_object) is ScrapeRequest:
+            queue, response = async_task.task_queue, scrape_object.response
+        else:
+            queue, response = async_task.response_queue, None
+        error_class = get_error_class(exception, response)
+        postmortem_log = scrape_object.get_postmortem_log(exception)
 
         # Reset
-        if scrape_object.reset(async_task.client) < MAX_RETRIES:
-            if type(scrape_object) is ScrapeRequest:
-                await async_task.task_queue.put(scrape_object)
-            elif type(scrape_object) is ScrapeResponse:
-                await async_task.response_queue.put(scrape_object)
-        if type(scrape_object) is ScrapeRequest:
-            async_task.task_queue.task_done()
-        elif type(scrape_object) is ScrapeResponse:
-            async_task.response_queue.task_done()
+        attempt = scrape_object.reset(async_task.client)
+        retried = attempt < RETRY_POLICIES[error_class]['max_retries']
+
+        # Log error to file
+        try:
+            async_task.write_record(ERROR_JSONL_PATH, {
+                **postmortem_log, 'error_class': error_class, 'attempt': attempt,
+                'outcome': 'retried' if retried else 'abandoned'
+            })
+        except Exception as e:
+            async_task.exception(e)
+
+        if retried:
+            metrics.counter('crawler_retries_total', 'Retried requests and responses').inc(
+                type=type(scrape_object).__name__, error_class=error_class
+            )
+            if async_task.retry_queue is not None:
+                delay = get_retry_delay(error_class, attempt, response)
+                metrics.histogram('crawler_retry_delay_seconds', 'Backoff delay of the retries').observe(
+                    delay, error_class=error_class
+                )
+                async_task.debug(f'Retrying {scrape_object.url} ({error_class}) in {delay:.2f}s')
+                if isinstance(queue, SqliteFrontier):
+                    queue.put_nowait(scrape_object, delay)  # released to be claimed once due
+                    queue.task_done()
+                else:
+                    async_task.retry_queue.schedule(scrape_object, queue, delay)   # marked as done once due
+            else:
+                delay = 0
+                put_unbounded(queue, scrape_object)
+                queue.task_done()
+            # The backoff delay is part of the item's next queue wait
+            tracer.instant(scrape_object.trace, 'retry', error_class=error_class, attempt=attempt, delay=delay)
+            tracer.mark(scrape_object.trace)
+        else:
+            tracer.instant(scrape_object.trace, 'abandoned', error_class=error_class, attempt=attempt)
+            metrics.counter('crawler_abandoned_total', 'Requests and responses abandoned after MAX_RETRIES').inc(
+                type=type(scrape_object).__name__, error_class=error_class
+            )
+            scrape_object.release()     # Drop any spooled download of the abandoned object
+            queue.task_done()
 
     else:
         async_task.warning(f'Error attempting to get {type(scrape_object).__name__} from queue.')
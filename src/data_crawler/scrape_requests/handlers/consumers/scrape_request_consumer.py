@@ -1,25 +1,23 @@
-import contextvars
 import logging
 import asyncio
 import time
 
 from httpx import AsyncClient, URL
-from urllib.robotparser import RobotFileParser
 
 from src.data_crawler.scrape_requests import ScrapeRequest, ScrapeResponse
-from src.data_crawler.scrape_requests.handlers import redirect_handler, success_handler, AsyncTask
+from src.data_crawler.scrape_requests.handlers import (
+    redirect_handler, success_handler, not_modified_handler, AsyncTask, RetryQueue
+)
+from src.data_crawler.politeness import RobotsCache, HostScheduler
+from src.data_crawler.metrics import metrics
+from src.data_crawler.tracing import tracer
+from src.data_crawler.storage import CrawlState, ValidatorStore, JsonlWriter, RedirectMap
 from . import handle_consumer_exception
-from src.data_crawler.constants import LOGGER_NAME, CONSUMER_SLEEP_TIME, ROBOTS_TXT_SUFFIX
+from src.data_crawler.constants import LOGGER_NAME, CONSUMER_SLEEP_TIME
 
 
 logger = logging.getLogger(LOGGER_NAME)
 
-request_times = contextvars.ContextVar('request_times')
-request_times.set({})
-
-robots_context = contextvars.ContextVar('robots_context')
-robots_context.set({})
-
 
 class ScrapeRequestConsumer(AsyncTask):
     """Scraping Request consumer
@@ -29,61 +27,116 @@ class ScrapeRequestConsumer(AsyncTask):
     :param client: AsyncClient  HTTP Client for managing HTTP requests
     :param task_queue: asyncio.Queue Scrape Request queue
     :param response_queue: asyncio.Queue    Scrape Response queue
+    :param robots_cache: RobotsCache    robots.txt rules cache shared by the consumers
+    :param scheduler: HostScheduler     per host request scheduler shared by the consumers
+    :param crawl_state: CrawlState  persistent crawl state, if any
+    :param validator_store: ValidatorStore  HTTP validators store for conditional requests, if any
+    :param writer: JsonlWriter  shared writer of the error log, the file is written directly if None
+    :param retry_queue: RetryQueue  delayed retry queue of the failed items, they are retried right away if None
+    :param redirect_map: RedirectMap    persistent map the permanent redirects are recorded into, if any
     """
 
+    __robots_cache: RobotsCache
+    __scheduler: HostScheduler
+    __crawl_state: CrawlState or None
+    __validator_store: ValidatorStore or None
+    __redirect_map: RedirectMap or None
+
     def __init__(
             self,
             client: AsyncClient,
             task_queue: asyncio.Queue,
             response_queue: asyncio.Queue,
-            task_id: any = None
+            task_id: any = None,
+            robots_cache: RobotsCache or None = None,
+            scheduler: HostScheduler or None = None,
+            crawl_state: CrawlState or None = None,
+            validator_store: ValidatorStore or None = None,
+            writer: JsonlWriter or None = None,
+            retry_queue: RetryQueue or None = None,
+            redirect_map: RedirectMap or None = None
     ) -> None:
-        super().__init__(client, task_queue, response_queue, task_id)
+        super().__init__(client, task_queue, response_queue, task_id, writer, retry_queue)
+        self.__robots_cache = robots_cache if robots_cache is not None else RobotsCache()
+        self.__scheduler = scheduler if scheduler is not None else HostScheduler()
+        self.__crawl_state = crawl_state
+        self.__validator_store = validator_store
+        self.__redirect_map = redirect_map
 
     @AsyncTask.id.getter
     def id(self) -> str:
         return f'SRQC-{super().id}'
 
-    def get_request_delay(self, url: URL):
-        _robots_context = robots_context.get()
-        try:
-            if url.host not in _robots_context.keys():
-                self.debug(f'Getting request delay for {url}')
-                scheme = url.scheme + '://' if url.scheme else 'https://'
-                robots_parser = RobotFileParser(url=scheme + url.host + ROBOTS_TXT_SUFFIX)
-                robots_parser.read()
-                if robots_parser.crawl_delay("*"):
-                    _robots_context[url.host] = robots_parser.crawl_delay("*")
-                else:
-                    _robots_context[url.host] = 0
-        except Exception as e:
-            self.warning(f'Failed to retrieve {url} robots.txt file. Got exception:')
-            self.exception(exception=e)
-            _robots_context[url.host] = 0
-        robots_context.set(_robots_context)
-        return _robots_context[url.host]
-
-    async def delay_request(self, url: URL):
-        self.debug(f'Delaying request {url}')
-        _request_times = request_times.get()
-        if url.host in _request_times.keys():
-            delay = self.get_request_delay(url)
-            self.debug(f'Request delay for {url} is of {delay}s')
-            while abs(time.time() - _request_times[url.host]) < delay:
-                await asyncio.sleep(0)
-        _request_times[url.host] = time.time()
-        request_times.set(_request_times)
+    @property
+    def robots_cache(self) -> RobotsCache:
+        return self.__robots_cache
+
+    @property
+    def scheduler(self) -> HostScheduler:
+        return self.__scheduler
+
+    @property
+    def crawl_state(self) -> CrawlState or None:
+        return self.__crawl_state
+
+    @property
+    def validator_store(self) -> ValidatorStore or None:
+        return self.__validator_store
+
+    @property
+    def redirect_map(self) -> RedirectMap or None:
+        return self.__redirect_map
+
+    async def get_request_delay(self, url: URL) -> float:
+        rules = await self.robots_cache.get(url, self.client)
+        return rules.crawl_delay
+
+    async def is_allowed(self, url: URL) -> bool:
+        rules = await self.robots_cache.get(url, self.client)
+        return rules.can_fetch(url)
+
+    async def delay_request(self, url: URL) -> bool:
+        """Respect the host's robots.txt rules before sending a request
+
+        Waits for a permit from the shared host scheduler, which has to be returned with release_request once the
+        request has finished.
+
+        :param url: URL url of the request
+        :return: bool False if the robots.txt rules disallow the url, True once the request is allowed to be sent
+        """
+        if not await self.is_allowed(url):
+            return False
+        delay = await self.get_request_delay(url)
+        self.debug(f'Delaying request {url}, request delay for {url.host} is of {delay}s')
+        await self.scheduler.acquire(url.host, delay)
         self.debug(f'Delayed request {url}')
+        return True
+
+    def release_request(self, url: URL) -> None:
+        self.scheduler.release(url.host)
+
+    @staticmethod
+    def record_response(url: URL, scrape_request: ScrapeRequest, latency: float) -> None:
+        """Record the latency, size and status code of a request's response"""
+        metrics.histogram('crawler_request_seconds', 'Request latency, body download included').observe(
+            latency, host=url.host
+        )
+        metrics.counter('crawler_downloaded_bytes_total', 'Bytes downloaded').inc(
+            scrape_request.response.num_bytes_downloaded, host=url.host
+        )
+        metrics.counter('crawler_responses_total', 'Responses by status code').inc(
+            status=scrape_request.response.status_code
+        )
 
     async def __call__(self) -> None:
         self.debug(f'Starting Request Consumer {self.id}')
-        while True:
+        while not self.retired:
             scrape_request: ScrapeRequest or None = None
             try:
-                self.info(f'START | '
-                          f'Task Queue: {self.task_queue.qsize()} | Response Queue: {self.response_queue.qsize()}')
+                self.debug(f'START | '
+                           f'Task Queue: {self.task_queue.qsize()} | Response Queue: {self.response_queue.qsize()}')
                 # Get scrape request from queue
-                scrape_request = await self.task_queue.get()
+                scrape_request = await self.get_item(self.task_queue)
                 self.debug(f'Got request from task queue[{self.task_queue.qsize()}]: {scrape_request}')
 
                 # Verify task queue item is a compatible Request, remove if not
@@ -93,19 +146,51 @@ class ScrapeRequestConsumer(AsyncTask):
                     self.task_queue.task_done()
                     continue
 
-                # Verify time between requests to respect politeness while crawling
-                await self.delay_request(URL(scrape_request.url))
+                tracer.wait(scrape_request.trace, 'task_queue')
+
+                # Verify robots.txt rules and time between requests to respect politeness while crawling
+                url = URL(scrape_request.url)
+                with metrics.histogram(
+                        'crawler_politeness_wait_seconds', 'Time requests waited for robots.txt rules and host permits'
+                ).time(host=url.host), tracer.span(scrape_request.trace, 'delay_request', host=url.host):
+                    allowed = await self.delay_request(url)
+                if not allowed:
+                    self.warning(f'Skipping {scrape_request.url}, disallowed by robots.txt.')
+                    if self.crawl_state is not None:
+                        self.crawl_state.complete(scrape_request.metadata['url'])
+                    scrape_request.discard()
+                    self.task_queue.task_done()
+                    continue
 
                 # Execute http request
-                await scrape_request.send()
+                start = time.perf_counter()
+                try:
+                    with tracer.span(scrape_request.trace, 'network', url=str(url)) as span:
+                        await scrape_request.send(self.client)
+                        span.end(status=scrape_request.response.status_code)
+                finally:
+                    self.release_request(url)
+                self.record_response(url, scrape_request, time.perf_counter() - start)
 
                 response = ScrapeResponse(scrape_request)
                 # Process response
-                self.info(f'Processing Scrape Response {response.url}')
-                if response.is_redirect:     # Process redirected responses
-                    await redirect_handler(response, self.task_queue, self.client)
+                self.debug(f'Processing Scrape Response {response.url}')
+                if response.is_not_modified:     # Process unchanged responses from conditional requests
+                    await not_modified_handler(
+                        response, self.task_queue, self.response_queue, self.client,
+                        self.crawl_state, self.validator_store
+                    )
+                elif response.is_redirect:     # Process redirected responses
+                    await redirect_handler(
+                        response, self.task_queue, self.client, self.crawl_state, self.redirect_map
+                    )
+                    if self.crawl_state is not None:
+                        self.crawl_state.complete(scrape_request.metadata['url'])
                 elif response.is_success:    # Process successful requests
-                    await success_handler(response, self.task_queue, self.response_queue, self.client)
+                    await success_handler(
+                        response, self.task_queue, self.response_queue, self.client,
+                        self.crawl_state, self.validator_store
+                    )
                 else:
                     raise Exception(f'Unknown status code {response.status}')
 
@@ -120,9 +205,10 @@ class ScrapeRequestConsumer(AsyncTask):
 
             finally:
                 if scrape_request is not None:
-                    self.info(f'END')
+                    self.debug(f'END')
                 self.debug(f'Request Consumer Released, sleeping...')
 
                 # Sleep consumer for configured amount of time
                 await asyncio.sleep(CONSUMER_SLEEP_TIME)
                 self.debug('Resuming Request Consumer.')
+        self.debug('Retired Request Consumer.')
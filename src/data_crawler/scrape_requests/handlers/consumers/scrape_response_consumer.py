@@ -1,28 +1,135 @@
 import asyncio
 
-import jsonlines
-
 from asyncio import Queue
+from functools import partial
 from httpx import AsyncClient
 
 from src.data_crawler.scrape_requests import ScrapeResponse
-from src.data_crawler.scrape_requests.handlers import AsyncTask
-from src.data_crawler.constants import CONSUMER_SLEEP_TIME
+from src.data_crawler.scrape_requests.handlers import AsyncTask, RetryQueue
+from src.data_crawler.constants import CONSUMER_SLEEP_TIME, DATA_JSONL_PATH, ERROR_JSONL_PATH
+from src.data_crawler.conversion import ConversionPool
+from src.data_crawler.storage import CrawlState, DocumentIndex, JsonlWriter, BlobStore
+from src.data_crawler.tracing import tracer, Span
 from . import handle_consumer_exception
 
 
-writer_lock = asyncio.Lock()
-
 
 class ScrapeResponseConsumer(AsyncTask):
+    """Scraping Response consumer
+
+    Converts the scraped documents and writes them to the output file, or stores the PDFs into the blob store to be
+    converted later by the convert stage.
+
+    :param client: AsyncClient  HTTP Client for managing HTTP requests
+    :param task_queue: asyncio.Queue Scrape Request queue
+    :param response_queue: asyncio.Queue    Scrape Response queue
+    :param conversion_pool: ConversionPool  PDF conversion worker pool, if None conversions run on a worker thread
+    :param crawl_state: CrawlState  persistent crawl state, documents already written are skipped
+    :param document_index: DocumentIndex    content hash index, duplicated documents are recorded as aliases
+    :param writer: JsonlWriter  shared writer of the output files, the files are written directly if None
+    :param retry_queue: RetryQueue  delayed retry queue of the failed items, they are retried right away if None
+    :param blob_store: BlobStore    store of the PDFs to convert later, PDFs are converted right away if None
+    """
+
+    __conversion_pool: ConversionPool or None
+    __crawl_state: CrawlState or None
+    __document_index: DocumentIndex or None
+    __blob_store: BlobStore or None
+
+    def __init__(
+            self,
+            client: AsyncClient,
+            task_queue: Queue,
+            response_queue: Queue,
+            task_id: any = None,
+            conversion_pool: ConversionPool or None = None,
+            crawl_state: CrawlState or None = None,
+            document_index: DocumentIndex or None = None,
+            writer: JsonlWriter or None = None,
+            retry_queue: RetryQueue or None = None,
+            blob_store: BlobStore or None = None
+    ):
+        super().__init__(client, task_queue, response_queue, task_id, writer, retry_queue)
+        self.__conversion_pool = conversion_pool
+        self.__crawl_state = crawl_state
+        self.__document_index = document_index
+        self.__blob_store = blob_store
+
+    @property
+    def conversion_pool(self) -> ConversionPool or None:
+        return self.__conversion_pool
+
+    @property
+    def crawl_state(self) -> CrawlState or None:
+        return self.__crawl_state
+
+    @property
+    def document_index(self) -> DocumentIndex or None:
+        return self.__document_index
+
+    @property
+    def blob_store(self) -> BlobStore or None:
+        return self.__blob_store
 
-    def __init__(self, client: AsyncClient, task_queue: Queue, response_queue: Queue, task_id: any = None):
-        super().__init__(client, task_queue, response_queue, task_id)
+    def is_alias(self, scrape_response: ScrapeResponse, jsonline: dict) -> bool:
+        """Record the response's document as an alias if the same content was already written under another url
+
+        :return: bool whether the document is an alias and is not to be written
+        """
+        digest = scrape_response.content_hash
+        if self.document_index is None or not scrape_response.is_pdf or digest is None:
+            return False
+        url = scrape_response.request.metadata['url']
+        primary_url = self.document_index.get_primary_url(digest)
+        if primary_url is None or primary_url == url:
+            return False
+        self.document_index.add_alias(
+            digest, url, primary_url, jsonline['ticker'], jsonline['document_type'], jsonline['year']
+        )
+        return True
+
+    def is_document_done(self, scrape_response: ScrapeResponse) -> bool:
+        """Whether the crawl state already holds the response's document"""
+        if self.crawl_state is None or 'share' not in scrape_response.metadata:
+            return False
+        return self.crawl_state.has_document(
+            scrape_response.metadata['share']['ticker'],
+            scrape_response.metadata['data_type'],
+            scrape_response.metadata.get('year'),
+            scrape_response.request.metadata['url']
+        )
 
     @AsyncTask.id.getter
     def id(self) -> str:
         return f'SRPC-{super().id}'
 
+    async def store_blob(self, scrape_response: ScrapeResponse) -> dict:
+        """Store the response's PDF into the blob store, pending conversion
+
+        :return: dict output record of the document, with the digest of the stored blob
+        """
+        digest, size = await asyncio.to_thread(
+            self.blob_store.put, scrape_response.source, scrape_response.content_hash
+        )
+        self.blob_store.add(scrape_response.request.metadata['url'], digest, size, scrape_response.record)
+        self.debug(f'Stored {scrape_response.url} as blob {digest[:12]}, pending conversion.')
+        return {**scrape_response.record, 'doc': None, 'blob': digest}
+
+    def complete(self, scrape_response: ScrapeResponse, jsonline: dict, span: Span or None = None) -> None:
+        """Record a processed response, once its document, if any, is written to the output file or stored
+
+        :param span: Span  trace span of the write, ended once the document is written, if any
+        """
+        if span is not None:
+            span.end()
+        url = scrape_response.request.metadata['url']
+        if self.crawl_state is not None:
+            if jsonline['doc'] is not None or jsonline.get('blob') is not None:
+                self.crawl_state.complete_document(
+                    jsonline['ticker'], jsonline['document_type'], jsonline['year'], url
+                )
+            self.crawl_state.complete(url)
+
     async def __call__(self) -> None:
         """Scraping Response consumer
 
@@ -30,10 +137,10 @@ class ScrapeResponseConsumer(AsyncTask):
         """
         self.debug(f'Starting Response Consumer')
         scrape_response: ScrapeResponse or None = None
-        while True:
+        while not self.retired:
             try:
-                self.info(f'Task Queue: {self.task_queue.qsize()} | Response Queue: {self.response_queue.qsize()}')
-                scrape_response = await self.response_queue.get()
+                self.debug(f'Task Queue: {self.task_queue.qsize()} | Response Queue: {self.response_queue.qsize()}')
+                scrape_response = await self.get_item(self.response_queue)
                 self.debug(f'Got response from queue: {scrape_response}')
                 # Verify task queue item is a compatible Request, remove if not
                 if type(scrape_response) is not ScrapeResponse:
@@ -42,16 +149,36 @@ class ScrapeResponseConsumer(AsyncTask):
                     self.task_queue.task_done()
                     continue
 
-                tasks = await asyncio.gather(scrape_response.jsonl())
-                jsonline = tasks[0]
-                if jsonline["doc"] is not None:
-                    async with writer_lock:
-                        try:
-                            with jsonlines.open('./out/data-crawler/data.jsonl', 'a') as _:
-                                _.write(jsonline)
-                        except Exception as e:
-                            raise e
+                tracer.wait(scrape_response.trace, 'response_queue')
+
+                if self.is_document_done(scrape_response):
+                    self.debug(f'Skipping {scrape_response.url}, document already written.')
+                    jsonline = {'doc': None}
+                elif self.blob_store is not None and scrape_response.is_pdf:
+                    with tracer.span(scrape_response.trace, 'store_blob'):
+                        jsonline = await self.store_blob(scrape_response)   # converted later by the convert stage
+                else:
+                    jsonline = await scrape_response.jsonl(self.conversion_pool, self.document_index)
+                if scrape_response.is_triaged_away:
+                    self.warning(f'Skipping {scrape_response.url}, every page was skipped by the page triage.')
+                    self.write_record(ERROR_JSONL_PATH, {
+                        **scrape_response.get_postmortem_log(Exception('Every page skipped by the page triage')),
+                        'url': scrape_response.url, 'outcome': 'skipped', 'pages': scrape_response.page_triage['stats']
+                    }, partial(self.complete, scrape_response, jsonline))
+                elif jsonline["doc"] is not None and not self.is_alias(scrape_response, jsonline):
+                    span = tracer.span(scrape_response.trace, 'writer').start()     # until the writer wrote it
+                    self.write_record(
+                        DATA_JSONL_PATH, jsonline, partial(self.complete, scrape_response, jsonline, span)
+                    )
+                    if self.document_index is not None and scrape_response.is_pdf:
+                        self.document_index.add_output(
+                            scrape_response.content_hash, scrape_response.request.metadata['url'],
+                            jsonline['ticker'], jsonline['document_type'], jsonline['year']
+                        )
+                else:
+                    self.complete(scrape_response, jsonline)
 
+                scrape_response.release()
                 self.response_queue.task_done()
                 self.debug('Task removed from queue.')
 
@@ -61,3 +188,4 @@ class ScrapeResponseConsumer(AsyncTask):
 
             finally:
                 await asyncio.sleep(CONSUMER_SLEEP_TIME)
+        self.debug('Retired Response Consumer.')
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import signal
+
+from httpx import AsyncClient
+
+from src.data_crawler.constants import LOGGER_NAME, SHUTDOWN_TIMEOUT
+from src.data_crawler.parsers import get_consumer
+from src.data_crawler.scrape_requests import ScrapeRequest, ScrapeResponse
+from src.data_crawler.storage import Checkpoint, CrawlState
+from src.data_crawler.scrape_requests.handlers.bounded_queue import put_unbounded
+from src.data_crawler.scrape_requests.handlers.retry_queue import RetryQueue
+from src.data_crawler.scrape_requests.handlers.autoscaler import ConsumerPool, ConsumerAutoscaler
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class ShutdownSignal:
+    """Event set when the crawler process receives SIGTERM or SIGINT
+
+    Replaces the default handlers of the signals while installed, so stopping the crawler lets it checkpoint its queues
+    instead of being killed, or interrupted by a KeyboardInterrupt.
+
+    :param signals: tuple signals stopping the crawl
+    """
+
+    __signals: tuple
+    __event: asyncio.Event
+    __installed: list
+
+    def __init__(self, signals: tuple = (signal.SIGTERM, signal.SIGINT)):
+        self.__signals = signals
+        self.__event = asyncio.Event()
+        self.__installed = []
+
+    @property
+    def is_set(self) -> bool:
+        return self.__event.is_set()
+
+    def set(self) -> None:
+        if not self.__event.is_set():
+            logger.warning('Stopping the crawl, in-flight work is finished and the queues are checkpointed.')
+        self.__event.set()
+
+    async def wait(self) -> None:
+        await self.__event.wait()
+
+    def install(self) -> None:
+        loop = asyncio.get_running_loop()
+        for _ in self.__signals:
+            try:
+                loop.add_signal_handler(_, self.set)
+                self.__installed.append(_)
+            except (NotImplementedError, RuntimeError):     # platforms and threads without loop signal handlers
+                logger.warning(f'Could not install the {signal.Signals(_).name} handler, the crawl is not '
+                               f'checkpointed when stopped.')
+
+    def remove(self) -> None:
+        loop = asyncio.get_running_loop()
+        for _ in self.__installed:
+            loop.remove_signal_handler(_)
+        self.__installed = []
+
+
+def restore_checkpoint(
+        checkpoint: Checkpoint,
+        client: AsyncClient,
+        requests: list[dict[str, any]],
+        response_queue: asyncio.Queue,
+        crawl_state: CrawlState or None = None
+) -> None:
+    """Load the checkpoint of a stopped crawl into the queues of this crawl
+
+    The checkpointed requests are added to the requests of the producers and the checkpointed responses are queued to
+    the response consumers, their documents being processed without downloading them again. The checkpoint file is
+    removed once loaded.
+
+    :param checkpoint: Checkpoint checkpoint of the stopped crawl
+    :param client: AsyncClient HTTP Client the requests are rebuilt with
+    :param requests: list[dict[str, any]] requests of the producers
+    :param response_queue: asyncio.Queue Scrape Response queue
+    :param crawl_state: CrawlState persistent crawl state, the requests of the responses are not queued again
+    """
+    checkpoint_requests, checkpoint_responses = checkpoint.load()
+    if not checkpoint_requests and not checkpoint_responses:
+        return
+    requests.extend(checkpoint_requests)
+    for _ in checkpoint_responses:
+        if crawl_state is not None:
+            crawl_state.claim(_['request'])     # already downloaded, skipped if pending in the crawl state
+        put_unbounded(response_queue, ScrapeResponse.deserialize(_, client, get_consumer(_['request']['consumer'])))
+    checkpoint.clear()
+    logger.info(f'Restored {len(checkpoint_requests)} requests and {len(checkpoint_responses)} responses from the '
+                f'checkpoint.')
+
+
+def serialize_item(item: any, checkpoint: Checkpoint, requests: list[dict], responses: list[dict]) -> None:
+    """Serialize a queued item into the checkpoint's requests or responses, and drop it"""
+    try:
+        if type(item) is ScrapeRequest:
+            requests.append(item.serialize())
+            item.discard()
+        elif type(item) is ScrapeResponse:
+            responses.append(item.serialize(checkpoint.payload_dir))
+            item.release()
+    except Exception as e:
+        logger.warning(f'Could not checkpoint {type(item).__name__} {getattr(item, "url", None)}: {e}')
+
+
+async def checkpoint_crawl(
+        checkpoint: Checkpoint,
+        requests: list[dict[str, any]],
+        task_queue: asyncio.Queue,
+        response_queue: asyncio.Queue,
+        retry_queue: RetryQueue,
+        request_pool: ConsumerPool,
+        response_pool: ConsumerPool,
+        autoscaler: ConsumerAutoscaler,
+        timeout: float = SHUTDOWN_TIMEOUT
+) -> None:
+    """Stop a crawl whose producers were stopped, and checkpoint the work left
+
+    The consumers finish their current item within the timeout, after which the ones still running are cancelled,
+    and the requests not produced yet, the queued and retried items are written to the checkpoint. Retried requests of
+    other frontiers are released back to their frontier instead, which still holds them.
+
+    :param checkpoint: Checkpoint checkpoint to write
+    :param requests: list[dict[str, any]] requests not produced yet
+    :param task_queue: asyncio.Queue Scrape Request queue, only checkpointed if it is an asyncio.Queue as other
+        frontiers persist their requests themselves
+    :param response_queue: asyncio.Queue Scrape Response queue
+    :param retry_queue: RetryQueue delayed retry queue of the failed items
+    :param request_pool: ConsumerPool ScrapeRequest consumers
+    :param response_pool: ConsumerPool ScrapeResponse consumers
+    :param autoscaler: ConsumerAutoscaler autoscaler of the consumer pools
+    :param timeout: float maximum seconds to wait for the in-flight items
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    autoscaler.stop()
+    request_pool.retire()
+    response_pool.retire()
+    running = await request_pool.wait(timeout) + await response_pool.wait(max(0.0, deadline - loop.time()))
+    if running:
+        logger.warning(f'Cancelling {running} consumers still running after {timeout}s, their items are not '
+                       f'checkpointed.')
+    request_pool.cancel()
+    response_pool.cancel()
+
+    checkpoint_requests = [
+        {**_, 'consumer': _['consumer'] if type(_['consumer']) is str else _['consumer'].__name__} for _ in requests
+    ]
+    checkpoint_responses = []
+    items = retry_queue.drain()
+    for queue in (task_queue, response_queue):
+        while isinstance(queue, asyncio.Queue) and not queue.empty():
+            items.append(queue.get_nowait())
+            queue.task_done()
+    for item in items:
+        if type(item) is ScrapeRequest and not isinstance(task_queue, asyncio.Queue):
+            task_queue.put_nowait(item)     # leased by this worker, pending again for the next one
+        else:
+            serialize_item(item, checkpoint, checkpoint_requests, checkpoint_responses)
+    checkpoint.save(checkpoint_requests, checkpoint_responses)
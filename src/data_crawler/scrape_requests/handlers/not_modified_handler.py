@@ -0,0 +1,58 @@
+import logging
+import asyncio
+
+import httpx
+
+from src.data_crawler.scrape_requests import ScrapeRequest, ScrapeResponse
+from src.data_crawler.scrape_requests.handlers.success_handler import enqueue_response
+from src.data_crawler.scrape_requests.handlers.bounded_queue import put_unbounded
+from src.data_crawler.parsers import get_consumer
+from src.data_crawler.storage import CrawlState, ValidatorStore
+from src.data_crawler.constants import LOGGER_NAME
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+async def not_modified_handler(
+        response: ScrapeResponse,
+        queue: asyncio.Queue,
+        response_queue: asyncio.Queue,
+        client: httpx.AsyncClient,
+        crawl_state: CrawlState or None = None,
+        validator_store: ValidatorStore or None = None
+) -> None:
+    """Scrape http not modified (304) response handler
+
+    Reuses the consumer result stored with the validators of the request instead of consuming the response. Downloads
+    are sent unconditionally, their completed documents being skipped by the crawl state instead. Only the validators a
+    download stored in earlier versions can get it a 304, leaving no document to reuse: they are removed and the
+    download is requested again unconditionally, once.
+
+    :param response: ScrapeRequest item
+    :param queue: asyncio.Queue Scrape Request queue
+    :param response_queue: asyncio.Queue Scrape Response queue
+    :param client: AsyncClient HTTP Client for managing HTTP requests
+    :param crawl_state: CrawlState persistent crawl state, further requests already done are skipped
+    :param validator_store: ValidatorStore HTTP validators store holding the stored results
+    """
+    result = validator_store.get_result(response.request.metadata['url']) if validator_store is not None else None
+    if result is None:
+        raise Exception(f'No stored result for not modified response {response.url}')
+    if response.request.is_streamed and not result['data']:
+        logger.debug(f'Not modified download from queue: {response.url}. Forgetting its validators and requesting it '
+                     f'again unconditionally.')
+        validator_store.remove(response.request.metadata['url'])
+        scrape_request = response.request
+        put_unbounded(queue, ScrapeRequest.deserialize(scrape_request.serialize(), client, scrape_request.consumer))
+        return
+    logger.debug(f'Not modified response from queue: {response.url}. Reusing stored result.')
+
+    further_requests = None
+    if result['further_requests']:
+        further_requests = [
+            ScrapeRequest.deserialize(_, client, get_consumer(_['consumer'])) for _ in result['further_requests']
+        ]
+    response.restore(result, further_requests)
+
+    await enqueue_response(response, queue, response_queue, crawl_state)
@@ -5,6 +5,8 @@ from httpx import AsyncClient
 
 from src.data_crawler.scrape_requests.handlers import AsyncTask
 from src.data_crawler.scrape_requests import ScrapeRequest
+from src.data_crawler.parsers import get_consumer
+from src.data_crawler.storage import CrawlState, RedirectMap
 from src.data_crawler.constants import LOGGER_NAME
 
 
@@ -16,23 +18,35 @@ class ScrapeRequestsProducer(AsyncTask):
 
     Generates ScrapeRequest instances foreach HTTP request in the 'requests' list.
 
+    Requests may name their consumer function instead of referencing it and may be flagged as streamed downloads, which
+    is the format ScrapeRequest.serialize produces. Requests whose work the crawl state reports as done are skipped.
+    Urls permanently redirected by earlier requests are requested at their final location.
+
     :param client: AsyncClient  HTTP Client for managing HTTP requests
     :param queue: asyncio.Queue Scrape Request queue
     :param requests: list[dict[str, any]]   List of requests to generate
+    :param crawl_state: CrawlState  persistent crawl state, if any
+    :param redirect_map: RedirectMap    persistent map of the permanent redirects, if any
     :return: None
     """
 
     __request: list[dict[str, any]]
+    __crawl_state: CrawlState or None
+    __redirect_map: RedirectMap or None
 
     def __init__(
             self,
             client: AsyncClient,
             queue: asyncio.Queue,
             requests: list[dict[str, any]],
-            task_id: any = None
+            task_id: any = None,
+            crawl_state: CrawlState or None = None,
+            redirect_map: RedirectMap or None = None
     ):
         super().__init__(client, queue, None, task_id)
         self.__requests = requests
+        self.__crawl_state = crawl_state
+        self.__redirect_map = redirect_map
 
     @AsyncTask.id.getter
     def id(self):
@@ -42,16 +56,31 @@ class ScrapeRequestsProducer(AsyncTask):
     def requests(self):
         return self.__requests
 
+    @property
+    def crawl_state(self) -> CrawlState or None:
+        return self.__crawl_state
+
+    @property
+    def redirect_map(self) -> RedirectMap or None:
+        return self.__redirect_map
+
     async def __call__(self) -> None:
         while len(self.requests) > 0:
             r = self.requests.pop()
-            url = r['url'] + r['metadata']['url_append'] if 'url_append' in r['metadata'].keys() else r['url']
-            self.debug(f"Producing {r['method']} request: {r['url']}")
+            url_append = r['metadata'].get('url_append') or ''
+            url = r['url'] if r['url'].endswith(url_append) else r['url'] + url_append
+            if self.redirect_map is not None:
+                url, redirected = self.redirect_map.resolve(url)
+                if redirected:
+                    self.debug(f"Requesting {redirected[0]} at its permanent location {url}")
+                    r['metadata'].update({'redirected_from': redirected[-1], 'redirect_chain': redirected})
             r['metadata']['url'] = url
-            await self.task_queue.put(
-                ScrapeRequest(
-                    metadata=r['metadata'],
-                    request=self.client.request(method=r['method'], url=url),
-                    consumer=r['consumer']
-                )
-            )
+            consumer = get_consumer(r['consumer']) if type(r['consumer']) is str else r['consumer']
+
+            if self.crawl_state is not None and not self.crawl_state.claim({**r, 'consumer': consumer.__name__}):
+                self.debug(f"Skipping {r['method']} request: {url}, already done.")
+                continue
+
+            self.debug(f"Producing {r['method']} request: {r['url']}")
+            # Checkpointed requests keep their failed attempts
+            await self.task_queue.put(ScrapeRequest.deserialize({**r, 'url': url}, self.client, consumer))
@@ -4,22 +4,33 @@ import asyncio
 import httpx
 
 from src.data_crawler.scrape_requests import ScrapeRequest, ScrapeResponse
-from src.data_crawler.constants import LOGGER_NAME
+from src.data_crawler.storage import CrawlState, RedirectMap
+from src.data_crawler.constants import LOGGER_NAME, MAX_REDIRECT_HOPS
+from src.data_crawler.tracing import tracer
+from src.data_crawler.scrape_requests.handlers.bounded_queue import put_unbounded
 
 
 logger = logging.getLogger(LOGGER_NAME)
 
+PERMANENT_REDIRECT_STATUS_CODES = (301, 308)
+
 
 async def redirect_handler(
         response: ScrapeResponse,
         queue: asyncio.Queue,
-        client: httpx.AsyncClient
+        client: httpx.AsyncClient,
+        crawl_state: CrawlState or None = None,
+        redirect_map: RedirectMap or None = None
 ) -> None:
     """Handle http redirects
 
+    Redirects looping back to a url of their chain, or following more than MAX_REDIRECT_HOPS redirects, are dropped.
+
     :param response: ScrapeRequest item
     :param queue: asyncio.Queue Scrape Request queue
     :param client: AsyncClient HTTP Client for managing HTTP requests
+    :param crawl_state: CrawlState persistent crawl state, redirects to requests already done are skipped
+    :param redirect_map: RedirectMap persistent map the permanent redirects are recorded into, if any
     """
     logger.info(f'Redirecting request {response.url} to {response.headers["Location"]}')
 
@@ -32,20 +43,42 @@ async def redirect_handler(
             scheme=response.scheme
         )
     url = str(url)
-    if 'url_append' in response.metadata.keys():
-        url += response.metadata['url_append']
+    url += response.metadata.get('url_append') or ''     # None for the AR reports
+
+    # Drop redirect loops and overly long redirect chains
+    chain = response.metadata.get('redirect_chain', []) + [response.url]
+    if url in chain:
+        logger.warning(f'Dropping the redirect of {response.url} to {url}, the redirects loop: {chain}')
+        return
+    if len(chain) > MAX_REDIRECT_HOPS:
+        logger.warning(f'Dropping the redirect of {response.url} to {url}, more than {MAX_REDIRECT_HOPS} redirects: '
+                       f'{chain}')
+        return
+    if redirect_map is not None and response.status in PERMANENT_REDIRECT_STATUS_CODES:
+        redirect_map.add(response.url, url)     # later requests to the url are sent to its location right away
 
     # Update metadata with redirect tracking information
     response.metadata.update({
         'redirected_from': response.url,
+        'redirect_chain': chain,
         'url': url
     })
 
-    # Add new request to queue
-    await queue.put(
-        ScrapeRequest(
-            metadata=response.metadata.copy(),
-            request=client.request(method=response.method, url=url),
-            consumer=response.consumer
-        )
+    # Add new request to queue, keeping streamed downloads streamed
+    if response.request.is_streamed:
+        request = client.build_request(method=response.method, url=url)
+    else:
+        request = client.request(method=response.method, url=url)
+    scrape_request = ScrapeRequest(
+        metadata=response.metadata.copy(),
+        request=request,
+        consumer=response.consumer
     )
+    scrape_request.trace = response.trace   # the redirected request is followed by the same trace
+    tracer.instant(scrape_request.trace, 'redirect', location=url)
+    tracer.mark(scrape_request.trace)
+    if crawl_state is not None and not crawl_state.claim(scrape_request.serialize()):
+        logger.debug(f'Skipping redirect to {url}, already done.')
+        scrape_request.discard()
+        return
+    put_unbounded(queue, scrape_request)     # no waiting on the consumers' own queue
@@ -0,0 +1,148 @@
+import asyncio
+import email.utils
+import heapq
+import itertools
+import logging
+import random
+import time
+
+import httpx
+
+from src.data_crawler.constants import LOGGER_NAME, RETRY_POLICIES, MAX_RETRY_AFTER
+from src.data_crawler.scrape_requests.handlers.bounded_queue import put_unbounded
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+THROTTLING_STATUS_CODES = (429, 503)
+
+
+def get_error_class(exception: Exception, response: httpx.Response or None) -> str:
+    """Classify a failure into one of the RETRY_POLICIES error classes
+
+    :param exception: Exception raised while processing the item
+    :param response: httpx.Response or None the item's HTTP response, if any
+    :return: str error class
+    """
+    if response is not None and response.extensions.get('replay_miss'):
+        return 'permanent'  # not recorded, replaying it again can't get another response
+    if isinstance(exception, httpx.TransportError):
+        return 'network'
+    if response is not None and response.status_code in THROTTLING_STATUS_CODES:
+        return 'throttled'
+    if response is not None and response.status_code >= 500:
+        return 'server'
+    return 'default'
+
+
+def get_retry_after(response: httpx.Response or None) -> float or None:
+    """Get the seconds to wait given by a response's Retry-After header, either as seconds or as an HTTP date"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def get_retry_delay(error_class: str, attempt: int, response: httpx.Response or None = None) -> float:
+    """Get the time to wait before retrying an item
+
+    Exponential backoff with full jitter: a random delay up to the base delay doubled on every attempt, capped by the
+    policy's maximum delay. Throttled responses wait at least the time given by their Retry-After header.
+
+    :param error_class: str error class of the failure
+    :param attempt: int number of failed attempts so far
+    :param response: httpx.Response or None the failed response, if any
+    :return: float seconds to wait
+    """
+    policy = RETRY_POLICIES[error_class]
+    delay = random.uniform(0, min(policy['max_delay'], policy['base_delay'] * 2 ** max(0, attempt - 1)))
+    retry_after = get_retry_after(response)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, MAX_RETRY_AFTER))
+    return delay
+
+
+class RetryQueue:
+    """Delayed retry queue
+
+    Holds the failed items on a timer heap keyed by the time they are due, and puts each of them back on its queue
+    once due. The failed attempt is only marked as done on its queue at that point, so joining the queue also waits
+    for the pending retries.
+    """
+
+    __heap: list[tuple[float, int, any, asyncio.Queue]]
+    __counter: itertools.count
+    __wakeup: asyncio.Event
+    __task: asyncio.Task or None
+
+    def __init__(self):
+        self.__heap = []
+        self.__counter = itertools.count()
+        self.__wakeup = asyncio.Event()
+        self.__task = None
+
+    @property
+    def size(self) -> int:
+        """size: int number of items waiting to be retried"""
+        return len(self.__heap)
+
+    def start(self) -> asyncio.Task:
+        if self.__task is None:
+            self.__task = asyncio.create_task(self())
+        return self.__task
+
+    def schedule(self, item: any, queue: asyncio.Queue, delay: float) -> None:
+        """Put an item back on its queue after a delay
+
+        The item's failed attempt is marked as done on the queue once the item is put back.
+
+        :param item: any item to retry
+        :param queue: asyncio.Queue queue the item was taken from
+        :param delay: float seconds to wait before retrying
+        """
+        due = asyncio.get_running_loop().time() + delay
+        heapq.heappush(self.__heap, (due, next(self.__counter), item, queue))
+        self.__wakeup.set()
+
+    async def __call__(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            while self.__heap and self.__heap[0][0] <= now:
+                _, _, item, queue = heapq.heappop(self.__heap)
+                put_unbounded(queue, item)
+                queue.task_done()
+            timeout = self.__heap[0][0] - now if self.__heap else None
+            self.__wakeup.clear()
+            try:
+                await asyncio.wait_for(self.__wakeup.wait(), timeout)
+            except TimeoutError:
+                pass
+
+    def drain(self) -> list:
+        """Stop the retry task and take the items still waiting, their failed attempts are marked as done
+
+        :return: list items still waiting to be retried, in retry order
+        """
+        if self.__task is not None:
+            self.__task.cancel()
+            self.__task = None
+        items = []
+        while self.__heap:
+            _, _, item, queue = heapq.heappop(self.__heap)
+            items.append(item)
+            queue.task_done()
+        return items
+
+    async def stop(self) -> None:
+        """Stop the retry task, dropping the items still waiting"""
+        for item in self.drain():
+            logger.warning(f'Dropping pending retry of {type(item).__name__} {item.url}')
+            item.discard() if hasattr(item, 'discard') else item.release()
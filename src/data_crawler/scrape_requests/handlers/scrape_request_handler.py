@@ -5,7 +5,22 @@ from pathlib import Path
 
 from httpx import AsyncClient
 
-from src.data_crawler.constants import LOGGER_NAME, HTTP_CLIENT_CONFIG, NO_REQUEST_CONSUMERS, NO_RESPONSE_CONSUMERS
+from src.data_crawler.constants import (
+    LOGGER_NAME, HTTP_CLIENT_CONFIG, NO_REQUEST_CONSUMERS, NO_RESPONSE_CONSUMERS,
+    MIN_REQUEST_CONSUMERS, MAX_REQUEST_CONSUMERS, MIN_RESPONSE_CONSUMERS, MAX_RESPONSE_CONSUMERS,
+    TASK_QUEUE_SIZE, RESPONSE_QUEUE_SIZE, RESPONSE_QUEUE_MAX_BYTES, SHUTDOWN_TIMEOUT
+)
+from src.data_crawler.conversion import ConversionPool
+from src.data_crawler.politeness import RobotsCache, HostScheduler
+from src.data_crawler.metrics import metrics, MetricsExporter
+from src.data_crawler.storage import (
+    CrawlState, ValidatorStore, DocumentIndex, JsonlWriter, BlobStore, Checkpoint, RedirectMap
+)
+from src.data_crawler.scrape_requests.handlers import RetryQueue, BoundedQueue
+from src.data_crawler.scrape_requests.handlers.autoscaler import ConsumerPool, ConsumerAutoscaler
+from src.data_crawler.scrape_requests.handlers.graceful_shutdown import (
+    ShutdownSignal, restore_checkpoint, checkpoint_crawl
+)
 from src.data_crawler.scrape_requests.handlers.producers import ScrapeRequestsProducer
 from src.data_crawler.scrape_requests.handlers.consumers import ScrapeRequestConsumer, ScrapeResponseConsumer
 
@@ -16,48 +31,169 @@ logger = logging.getLogger(LOGGER_NAME)
 async def scrape_request_handler(
         requests: list[dict[str, any]],
         client: AsyncClient = AsyncClient(**HTTP_CLIENT_CONFIG),     # Async HTTP Client
-        task_queue: asyncio.Queue = asyncio.Queue(),     # Queue for ScrapeRequest objects
-        response_queue: asyncio.Queue = asyncio.Queue(),  # Queue for ScrapeResponse objects
-) -> None:
+        task_queue: asyncio.Queue or None = None,     # Queue for ScrapeRequest objects
+        response_queue: asyncio.Queue or None = None,  # Queue for ScrapeResponse objects
+        conversion_pool: ConversionPool or None = None,   # Process pool for PDF conversions
+        crawl_state: CrawlState or None = None,     # Persistent crawl state to skip completed work
+        validator_store: ValidatorStore or None = None,     # HTTP validators for conditional requests
+        scheduler: HostScheduler or None = None,    # Per host politeness shared by the request consumers
+        document_index: DocumentIndex or None = None,   # Content hash index to convert duplicated PDFs once
+        writer: JsonlWriter or None = None,     # Buffered writer of the output files
+        metrics_port: int or None = None,   # Local port of the Prometheus metrics endpoint
+        autoscale: bool = True,     # Resize the consumer pools to the crawl's workload
+        blob_store: BlobStore or None = None,   # Store of the PDFs to convert later with the convert stage
+        checkpoint: Checkpoint or None = None,  # Checkpoint of the queues when the crawl is stopped
+        shutdown: ShutdownSignal or None = None,    # Stops the crawl, set by SIGTERM and SIGINT if None
+        shutdown_timeout: float = SHUTDOWN_TIMEOUT,     # Seconds in-flight work is waited for once stopped
+        redirect_map: RedirectMap or None = None,   # Permanent redirects, requested at their location right away
+) -> bool:
     """Asynchronous ScrapeRequest Handler
 
     :param requests: list[dict[str, any]]   List of requests to generate
     :param client: AsyncClient      HTTP Client for managing HTTP requests
-    :param task_queue: asyncio.Queue     Scrape Request queue
-    :param response_queue: asyncio.Queue    Scrape Response queue
-    :return: None
+    :param task_queue: asyncio.Queue     Scrape Request queue, bounded to TASK_QUEUE_SIZE requests if None, or any
+        other Frontier such as a SqliteFrontier shared with other crawler workers
+    :param response_queue: asyncio.Queue    Scrape Response queue, bounded to RESPONSE_QUEUE_SIZE responses and
+        RESPONSE_QUEUE_MAX_BYTES of response bodies if None
+    :param conversion_pool: ConversionPool  PDF conversion worker pool, one is created if None
+    :param crawl_state: CrawlState  persistent crawl state, every request is processed if None
+    :param validator_store: ValidatorStore  HTTP validators store, installed on the client for conditional requests
+    :param scheduler: HostScheduler     per host request scheduler, one is created if None
+    :param document_index: DocumentIndex    content hash index of the PDFs, every download is converted if None
+    :param writer: JsonlWriter  writer of the output files, one is created and closed once the crawl finishes if None
+    :param metrics_port: int    local port to serve the metrics in the Prometheus text format on, not served if None
+    :param autoscale: bool  whether to resize the consumer pools within their bounds, fixed sizes are used if False
+    :param blob_store: BlobStore    store the downloaded PDFs are written to instead of being converted, if not None
+    :param checkpoint: Checkpoint   checkpoint loaded into the queues, and written when the crawl is stopped, the crawl
+        isn't stopped gracefully if None
+    :param shutdown: ShutdownSignal     signal stopping a crawl with a checkpoint, one set by SIGTERM and SIGINT is
+        installed if None
+    :param shutdown_timeout: float  seconds the consumers get to finish their current item once the crawl is stopped
+    :param redirect_map: RedirectMap    persistent map the permanent redirects are recorded into, and the producers'
+        urls resolved with, if not None
+    :return: bool   whether the crawl finished, False if it was stopped and checkpointed
     """
     logger.debug('Start scrape request handler.')
 
     Path('./out/data-crawler').mkdir(parents=True, exist_ok=True)
 
+    # Bounded queues, producers and request consumers wait for room so the crawl memory doesn't grow with the index
+    task_queue = task_queue if task_queue is not None else BoundedQueue(TASK_QUEUE_SIZE)
+    response_queue = response_queue if response_queue is not None else BoundedQueue(
+        RESPONSE_QUEUE_SIZE, RESPONSE_QUEUE_MAX_BYTES
+    )
+
+    owns_shutdown = checkpoint is not None and shutdown is None
+    if checkpoint is not None:  # resume the work left by a stopped crawl
+        restore_checkpoint(checkpoint, client, requests, response_queue, crawl_state)
+        if owns_shutdown:
+            shutdown = ShutdownSignal()
+            shutdown.install()
+
+    conversion_pool = conversion_pool if conversion_pool is not None else ConversionPool()
+    logger.debug(f'Using a conversion pool of {conversion_pool.size} worker processes.')
+
+    owns_writer = writer is None
+    writer = writer if writer is not None else JsonlWriter()
+    writer.start()
+
+    retry_queue = RetryQueue()  # failed items wait here for their backoff delay before going back to their queue
+    retry_queue.start()
+
+    exporter = MetricsExporter(  # periodic metrics snapshots, with the depth of every stage's queue
+        metrics,
+        {
+            'task_queue': task_queue.qsize,
+            'response_queue': response_queue.qsize,
+            'conversion_queue': lambda: conversion_pool.queue_depth,
+            'writer_queue': lambda: writer.pending,
+            'retry_queue': lambda: retry_queue.size,
+        },
+        port=metrics_port
+    )
+    await exporter.start()
+
+    if validator_store is not None:
+        validator_store.install(client)     # send conditional requests for already crawled urls
+
     # Producer and Consumer generation
     producers = [  # Build and publish in queue the ScrapeRequest for each stock through producers
-        asyncio.create_task(ScrapeRequestsProducer(client, task_queue, requests, _)())
+        asyncio.create_task(ScrapeRequestsProducer(client, task_queue, requests, _, crawl_state, redirect_map)())
         for _ in range(3)
     ]
     logger.debug('Generated producers for ScrapeRequest object generation.')
 
-    request_consumers = [  # Generate consumers to process the ScrapeRequest objects
-        asyncio.create_task(ScrapeRequestConsumer(client, task_queue, response_queue, _)())
-        for _ in range(NO_REQUEST_CONSUMERS)
-    ]
+    robots_cache = RobotsCache()    # robots.txt rules shared by all the request consumers
+    scheduler = scheduler if scheduler is not None else HostScheduler()     # shared per host politeness
+    request_pool = ConsumerPool(  # Generate consumers to process the ScrapeRequest objects
+        'request',
+        lambda _: ScrapeRequestConsumer(
+            client, task_queue, response_queue, _,
+            robots_cache, scheduler, crawl_state, validator_store, writer, retry_queue, redirect_map
+        ),
+        NO_REQUEST_CONSUMERS, MIN_REQUEST_CONSUMERS, MAX_REQUEST_CONSUMERS
+    )
     logger.debug('Generated consumers for ScrapeRequest object processing.')
 
-    response_consumers = [  # Generate consumers to process the ScrapeRequest objects
-        asyncio.create_task(ScrapeResponseConsumer(client, task_queue, response_queue, _)())
-        for _ in range(NO_RESPONSE_CONSUMERS)
-    ]
+    response_pool = ConsumerPool(  # Generate consumers to process the ScrapeResponse objects
+        'response',
+        lambda _: ScrapeResponseConsumer(
+            client, task_queue, response_queue, _,
+            conversion_pool, crawl_state, document_index, writer, retry_queue, blob_store
+        ),
+        NO_RESPONSE_CONSUMERS, MIN_RESPONSE_CONSUMERS, MAX_RESPONSE_CONSUMERS
+    )
     logger.debug('Generated consumers for ScrapeResponse object processing.')
 
-    # Wait for producers and consumers to finish their processes
-    await asyncio.gather(*producers)  # wait for producers to finish
-
-    await task_queue.join()  # Wait for consumers to finish and stop them
-    [_.cancel() for _ in request_consumers]
-
-    await response_queue.join()  # Wait for consumers to finish and stop them
-    [_.cancel() for _ in response_consumers]
+    autoscaler = ConsumerAutoscaler(  # resize the consumer pools to the queue backlogs, host permits and conversions
+        request_pool, response_pool, task_queue, response_queue, scheduler, conversion_pool
+    )
+    if autoscale:
+        autoscaler.start()
+
+    async def join() -> None:
+        # Wait for producers and consumers to finish their processes
+        await asyncio.gather(*producers)  # wait for producers to finish
+
+        await task_queue.join()  # Wait for consumers to finish and stop them
+        request_pool.cancel()
+
+        await response_queue.join()  # Wait for consumers to finish
+
+    finished = True
+    crawl = asyncio.create_task(join())
+    if checkpoint is None:
+        await crawl
+    else:
+        stop = asyncio.create_task(shutdown.wait())
+        await asyncio.wait([crawl, stop], return_when=asyncio.FIRST_COMPLETED)
+        stop.cancel()
+        if crawl.done():
+            crawl.result()
+        else:   # stopped, the producers are cancelled with the crawl and the work left is checkpointed
+            finished = False
+            crawl.cancel()
+            await asyncio.wait([crawl])
+            await checkpoint_crawl(
+                checkpoint, requests, task_queue, response_queue, retry_queue, request_pool, response_pool, autoscaler,
+                shutdown_timeout
+            )
+
+    autoscaler.stop()
+    response_pool.cancel()
+    await retry_queue.stop()
+
+    if owns_writer:
+        await writer.close()    # write the buffered records and fsync the output files
+
+    conversion_pool.shutdown()
+    await exporter.stop()
+    logger.info(f'Conversion stats: {conversion_pool.stats()}')
+    if document_index is not None:
+        logger.info(f'Document index stats: {document_index.stats()}')
+
+    if owns_shutdown:
+        shutdown.remove()
 
     logger.debug('Finished scrape request handler.')
-    return None
+    return finished
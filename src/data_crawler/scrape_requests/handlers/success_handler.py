@@ -4,17 +4,54 @@ import asyncio
 import httpx
 
 from src.data_crawler.scrape_requests import ScrapeResponse
+from src.data_crawler.storage import CrawlState, ValidatorStore
 from src.data_crawler.constants import LOGGER_NAME
+from src.data_crawler.tracing import tracer
+from src.data_crawler.scrape_requests.handlers.bounded_queue import put_unbounded
 
 
 logger = logging.getLogger(LOGGER_NAME)
 
 
+async def enqueue_response(
+        response: ScrapeResponse,
+        queue: asyncio.Queue,
+        response_queue: asyncio.Queue,
+        crawl_state: CrawlState or None = None
+) -> None:
+    """Queue a consumed response and its further requests
+
+    :param response: ScrapeResponse consumed response
+    :param queue: asyncio.Queue Scrape Request queue
+    :param response_queue: asyncio.Queue Scrape Response queue
+    :param crawl_state: CrawlState persistent crawl state, further requests already done are skipped
+    """
+    tracer.mark(response.trace)     # waiting for room in the queue included
+    await response_queue.put(response)
+    further_requests = response.further_requests
+    if further_requests and crawl_state is not None:
+        further_requests = []
+        for request in response.further_requests:
+            if crawl_state.claim(request.serialize()):
+                further_requests.append(request)
+            else:
+                request.discard()
+        logger.debug(f'Skipping {len(response.further_requests) - len(further_requests)} requests already done.')
+    if further_requests:
+        logger.debug(f'Adding {len(further_requests)} requests to request queue with '
+                     f'actual qsize {queue.qsize()}.')
+        [put_unbounded(queue, request) for request in further_requests]   # no waiting on the consumers' own queue
+        logger.debug(f'Added {len(further_requests)} requests to request queue with '
+                     f'updated qsize {queue.qsize()}.')
+
+
 async def success_handler(
         response: ScrapeResponse,
         queue: asyncio.Queue,
         response_queue: asyncio.Queue,
-        client: httpx.AsyncClient
+        client: httpx.AsyncClient,
+        crawl_state: CrawlState or None = None,
+        validator_store: ValidatorStore or None = None
 ) -> None:
     """Scrape http successful request response handler
 
@@ -22,6 +59,8 @@ async def success_handler(
     :param queue: asyncio.Queue Scrape Request queue
     :param response_queue: asyncio.Queue Scrape Response queue
     :param client: AsyncClient HTTP Client for managing HTTP requests
+    :param crawl_state: CrawlState persistent crawl state, further requests already done are skipped
+    :param validator_store: ValidatorStore HTTP validators store, page results are stored for conditional requests
     """
     logger.debug(f'Successful request from queue: {response.url}. '
                  f'Sending request to consumer function {response.consumer.__name__}.')
@@ -29,11 +68,8 @@ async def success_handler(
     response.consume(client=client)
     logger.debug(f'Got response from consumer function.')
 
-    await response_queue.put(response)
-    if response.further_requests:
-        logger.debug(f'Adding {len(response.further_requests)} requests to request queue with '
-                     f'actual qsize {queue.qsize()}.')
-        [await queue.put(request) for request in response.further_requests]
-        logger.debug(f'Added {len(response.further_requests)} requests to request queue with '
-                     f'updated qsize {queue.qsize()}.')
+    # Downloads are sent unconditionally, the crawl state skips their completed documents instead
+    if validator_store is not None and not response.request.is_streamed:
+        validator_store.save(response.request.metadata['url'], response.headers, response.serialize_result())
 
+    await enqueue_response(response, queue, response_queue, crawl_state)
@@ -1,22 +1,38 @@
+import hashlib
+import inspect
+import os
+import tempfile
+
 import httpx
 
+from pathlib import Path
 from typing import Coroutine, Callable, Awaitable, Any
 
+from src.data_crawler.constants import PDF_SPOOL_DIR, DOWNLOAD_CHUNK_SIZE
+from src.data_crawler.tracing import tracer, Trace
+
 
 class ScrapeRequest:
     """ScrapeRequests class
     Abstracts the information of each of the scraping requests.
+
+    Requests given as a coroutine are awaited as they are. Requests given as an httpx.Request are sent through the
+    client's streaming API and their successful response body is spooled into a file on disk instead of being held in
+    memory, which is how the PDF downloads are handled. Spooled bodies are hashed as they stream in.
     """
     __metadata: dict
     __request: httpx.Request or Coroutine[Callable[..., Awaitable[None]]]
     __consumer: Callable
     __response: httpx.Response = None
+    __spool_path: str or None = None
+    __content_hash: str or None = None
     __reset_count = 0
+    __trace: Trace or None = None
 
     def __init__(
             self,
             metadata: dict,
-            request: Coroutine[httpx.request, Any, httpx.Response],
+            request: Coroutine[httpx.request, Any, httpx.Response] or httpx.Request,
             consumer: Callable
     ) -> None:
         self.__metadata = metadata.copy()
@@ -24,6 +40,7 @@ class ScrapeRequest:
         self.__consumer = consumer
         if "url" not in self.__metadata.keys():
             self.__metadata["url"] = ''
+        self.__trace = tracer.trace(self.__metadata["url"])
 
     @property
     def metadata(self) -> dict:
@@ -45,6 +62,35 @@ class ScrapeRequest:
         """consumer: Callable"""
         return self.__consumer
 
+    @property
+    def trace(self) -> Trace or None:
+        """trace: Trace or None lifecycle trace of the request, None if it isn't sampled"""
+        return self.__trace
+
+    @trace.setter
+    def trace(self, trace: Trace or None) -> None:
+        self.__trace = trace
+
+    @property
+    def is_streamed(self) -> bool:
+        """is_streamed: bool whether the response body is spooled to disk"""
+        return isinstance(self.__request, httpx.Request)
+
+    @property
+    def spool_path(self) -> str or None:
+        """spool_path: str or None path of the file holding the streamed response body"""
+        return self.__spool_path
+
+    @property
+    def content_hash(self) -> str or None:
+        """content_hash: str or None SHA-256 hex digest of the streamed response body"""
+        return self.__content_hash
+
+    @property
+    def reset_count(self) -> int:
+        """reset_count: int number of failed attempts the request was reset after"""
+        return self.__reset_count
+
     @property
     def url(self) -> str:
         try:
@@ -52,19 +98,117 @@ class ScrapeRequest:
         except AttributeError or Exception:
             return self.metadata["url"]
 
-    async def send(self) -> httpx.Response:
-        """To be used to await for the http request."""
-        self.__response = await self.__request
+    async def send(self, client: httpx.AsyncClient or None = None) -> httpx.Response:
+        """To be used to await for the http request.
+
+        :param client: AsyncClient HTTP Client used to send streamed requests
+        """
+        if self.is_streamed:
+            self.__response = await self.__stream(client)
+        else:
+            self.__response = await self.__request
         return self.__response
 
+    async def __stream(self, client: httpx.AsyncClient) -> httpx.Response:
+        """Send the request and spool the successful response body into a file"""
+        response = await client.send(self.__request, stream=True)
+        try:
+            if not response.is_success:
+                await response.aread()
+                return response
+
+            Path(PDF_SPOOL_DIR).mkdir(parents=True, exist_ok=True)
+            digest = hashlib.sha256()
+            with tempfile.NamedTemporaryFile(dir=PDF_SPOOL_DIR, suffix='.pdf', delete=False) as spool:
+                self.__spool_path = spool.name
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    spool.write(chunk)
+                    digest.update(chunk)
+            self.__content_hash = digest.hexdigest()
+        except BaseException:
+            self.release()
+            raise
+        finally:
+            await response.aclose()
+        return response
+
+    def release(self) -> None:
+        """Remove the spooled response body, if any"""
+        if self.__spool_path is not None:
+            try:
+                os.remove(self.__spool_path)
+            except FileNotFoundError:
+                pass
+            self.__spool_path = None
+        self.__content_hash = None
+
+    def discard(self) -> None:
+        """Drop a request that is not going to be sent"""
+        if inspect.iscoroutine(self.__request):
+            self.__request.close()
+        self.release()
+
     def reset(self, client: httpx.AsyncClient) -> int:
+        self.release()
         try:
-            self.__request = client.request(method=self.request.method, url=self.request.url)
+            method, url = self.request.method, self.request.url
         except AttributeError or Exception:
-            self.__request = client.request(method=self.metadata['method'], url=self.metadata['url'])
+            method, url = self.metadata['method'], self.metadata['url']
+        if self.is_streamed:
+            self.__request = client.build_request(method=method, url=url)
+        else:
+            self.__request = client.request(method=method, url=url)
         self.__reset_count += 1
         return self.__reset_count
 
+    def serialize(self) -> dict:
+        """Serialize the request into the ScrapeRequestsProducer requests format
+
+        :return: dict with the request's metadata, method, url, consumer name, whether it is streamed and the number of
+            failed attempts, if any
+        """
+        method = self.__request.method if self.is_streamed else self.metadata.get('method', 'GET')
+        data = {
+            'metadata': self.metadata.copy(),
+            'method': method,
+            'url': self.metadata['url'],
+            'consumer': self.consumer.__name__,
+            'stream': self.is_streamed,
+        }
+        if self.__reset_count:
+            data['resets'] = self.__reset_count     # keeps counting towards the retry policy once rebuilt
+        return data
+
+    @classmethod
+    def deserialize(cls, data: dict, client: httpx.AsyncClient, consumer: Callable) -> 'ScrapeRequest':
+        """Rebuild a request serialized by ScrapeRequest.serialize
+
+        :param data: dict serialized request
+        :param client: AsyncClient HTTP Client for managing HTTP requests
+        :param consumer: Callable consumer function named by the serialized request
+        :return: ScrapeRequest the request
+        """
+        if data.get('stream'):
+            request = client.build_request(method=data['method'], url=data['url'])
+        else:
+            request = client.request(method=data['method'], url=data['url'])
+        scrape_request = cls(metadata=data['metadata'], request=request, consumer=consumer)
+        scrape_request.__reset_count = data.get('resets', 0)
+        return scrape_request
+
+    def restore(self, response: httpx.Response, spool_path: str or None, content_hash: str or None) -> None:
+        """Set a response received by an earlier crawl instead of sending the request
+
+        :param response: httpx.Response response, its body being the spooled file if any
+        :param spool_path: str or None path of the file holding the response body
+        :param content_hash: str or None SHA-256 hex digest of the response body
+        """
+        if inspect.iscoroutine(self.__request):
+            self.__request.close()  # rebuilt by reset if the request is to be sent again
+        self.__response = response
+        self.__spool_path = spool_path
+        self.__content_hash = content_hash
+
     def get_postmortem_log(self, exception: Exception) -> dict:
         try:
             return {
@@ -1,13 +1,19 @@
 import asyncio
+import hashlib
 import logging
-from io import BytesIO
+import os
 
-import pymupdf4llm
-from httpx import AsyncClient
-from pymupdf import pymupdf
+from pathlib import Path
+from typing import Callable
+
+from httpx import AsyncClient, Response
 
 from .scrape_request import ScrapeRequest
-from src.data_crawler.constants import LOGGER_NAME
+from src.data_crawler.constants import LOGGER_NAME, CONVERSION_PROFILE
+from src.data_crawler.conversion import ConversionPool, convert_pdf
+from src.data_crawler.storage import DocumentIndex
+from src.data_crawler.metrics import metrics
+from src.data_crawler.tracing import tracer, Trace
 
 logger = logging.getLogger(LOGGER_NAME)
 
@@ -22,6 +28,7 @@ class ScrapeResponse:
     __data: str or bytes
     __further_requests: list[ScrapeRequest] or None
     __reset_count: int
+    __page_triage: dict or None
 
     def __init__(
             self,
@@ -31,16 +38,23 @@ class ScrapeResponse:
     ):
         if scrape_request:
             self.__request = scrape_request
-            self.__content = scrape_request.response.content
+            # Streamed responses are spooled to disk by the request, only in-memory bodies are kept here
+            self.__content = None if scrape_request.spool_path else scrape_request.response.content
             self.__metadata = scrape_request.metadata.copy()
             if 'method' not in self.__metadata:
                 self.__metadata['method'] = 'GET'
             self.__data = None
             self.__further_requests = None
             self.__reset_count = 0
+            self.__page_triage = None
         else:
+            self.__request = None
+            self.__content = None
             self.__metadata = metadata
             self.__data = data
+            self.__further_requests = None
+            self.__reset_count = 0
+            self.__page_triage = None
 
     @property
     def request(self):
@@ -50,6 +64,38 @@ class ScrapeResponse:
     def content(self):
         return self.__content
 
+    @property
+    def spool_path(self) -> str or None:
+        """spool_path: str or None path of the file holding the streamed response body"""
+        return self.request.spool_path if self.request else None
+
+    @property
+    def size(self) -> int:
+        """size: int size in bytes of the response body, held in memory or spooled to disk"""
+        if self.spool_path:
+            try:
+                return os.path.getsize(self.spool_path)
+            except OSError:
+                return 0
+        return len(self.content) if self.content else 0
+
+    @property
+    def source(self) -> str or bytes or None:
+        """source: str or bytes or None path of the spooled response body, or the response content"""
+        return self.spool_path or self.content
+
+    @property
+    def is_pdf(self) -> bool:
+        """is_pdf: bool whether the response holds a PDF document to be converted"""
+        return bool(self.source) and self.consumer.__name__ == 'parse_pdf_file'
+
+    @property
+    def content_hash(self) -> str or None:
+        """content_hash: str or None SHA-256 hex digest of the response body"""
+        if self.spool_path:
+            return self.request.content_hash
+        return hashlib.sha256(self.content).hexdigest() if self.content else None
+
     @property
     def metadata(self) -> dict:
         """metadata: dict"""
@@ -85,6 +131,10 @@ class ScrapeResponse:
     def status(self):
         return self.request.response.status_code
 
+    @property
+    def is_not_modified(self):
+        return self.request.response.status_code == 304
+
     @property
     def headers(self):
         return self.request.response.headers
@@ -105,21 +155,88 @@ class ScrapeResponse:
     def consumer(self):
         return self.request.consumer
 
+    @property
+    def trace(self) -> Trace or None:
+        """trace: Trace or None lifecycle trace of the response's request, None if it isn't sampled"""
+        return self.request.trace if self.request else None
+
+    @property
+    def reset_count(self) -> int:
+        """reset_count: int number of failed attempts the response was reset after"""
+        return self.__reset_count
+
+    @property
+    def page_triage(self) -> dict or None:
+        """page_triage: dict or None pages to convert and page stats of the PDF, None until its pages are triaged"""
+        return self.__page_triage
+
+    @property
+    def is_triaged_away(self) -> bool:
+        """is_triaged_away: bool whether the page triage skipped every page of the PDF, leaving nothing to convert"""
+        return self.__page_triage is not None and not self.__page_triage['pages']
+
     @property
     async def document(self):
+        return await self.get_document()
+
+    async def get_document(
+            self,
+            conversion_pool: ConversionPool or None = None,
+            document_index: DocumentIndex or None = None
+    ) -> str or None:
+        """Get the scraped document, converting PDF contents with the pool's conversion profile, markdown by default
+
+        :param conversion_pool: ConversionPool worker pool to convert the PDF on, if None a worker thread is used
+        :param document_index: DocumentIndex content hash index, PDFs whose content is being converted reuse it
+        :return: str or None the document contents
+        """
         await asyncio.sleep(0)
-        if not self.data and self.content and self.consumer.__name__ == 'parse_pdf_file':
-            logger.debug(f'Parsing MD for '
-                         f'{self.metadata["share"]["title"]} : {self.metadata["data_type"]} {self.metadata["year"]}')
-            byte_stream: BytesIO = BytesIO(self.content)
-            document: pymupdf.Document = pymupdf.Document(stream=byte_stream)
-            return pymupdf4llm.to_markdown(document)
+        if not self.data and self.is_pdf:
+            if conversion_pool is not None and conversion_pool.triage:
+                # Triaged on every get, its stats being recorded with the reused conversions too
+                self.__page_triage = await conversion_pool.triage_pages(self.source, self.content_hash)
+                if self.is_triaged_away:
+                    return None     # not a document, logged to the error file by the response consumer
+            if document_index is not None and self.content_hash:
+                return await document_index.get_document(
+                    self.content_hash, lambda: self.convert(conversion_pool), self.get_profile(conversion_pool),
+                    self.page_triage['pages'] if self.page_triage is not None else None
+                )
+            return await self.convert(conversion_pool)
         if type(self.data) is str:
             return self.data
         elif type(self.data) is bytes:
             return self.data.decode('utf-8')
         return None
 
+    @staticmethod
+    def get_profile(conversion_pool: ConversionPool or None = None) -> str:
+        """Get the conversion profile the PDF content is converted with
+
+        :param conversion_pool: ConversionPool worker pool to convert the PDF on, if any
+        :return: str the pool's conversion profile, CONVERSION_PROFILE if None
+        """
+        return conversion_pool.profile if conversion_pool is not None else CONVERSION_PROFILE
+
+    async def convert(self, conversion_pool: ConversionPool or None = None) -> str:
+        """Convert the PDF content with the pool's conversion profile, into markdown if None
+
+        :param conversion_pool: ConversionPool worker pool to convert the PDF on, its page ranges in parallel for PDFs
+            of at least PAGE_RANGE_MIN_PAGES pages, if None the whole PDF is converted on a worker thread
+        :return: str markdown text
+        """
+        label = f'{self.metadata["share"]["title"]} : {self.metadata["data_type"]} {self.metadata["year"]}'
+        logger.debug(f'Parsing MD for {label}')
+        with tracer.span(self.trace, 'conversion'):   # waiting for a free worker included
+            if conversion_pool is not None:
+                pages = self.page_triage['pages'] if self.page_triage is not None else None
+                return await conversion_pool.convert(self.source, label, pages, self.content_hash)
+            markdown, page_count, conversion_time = await asyncio.to_thread(convert_pdf, self.source)
+        metrics.histogram('crawler_conversion_seconds_per_page', 'PDF conversion time per page').observe(
+            conversion_time / max(1, page_count), profile=CONVERSION_PROFILE
+        )
+        return markdown
+
     def get_postmortem_log(self, exception: Exception) -> dict:
         try:
             return {
@@ -136,18 +253,110 @@ class ScrapeResponse:
         self.__reset_count += 1
         return self.__reset_count
 
+    def release(self) -> None:
+        """Remove the spooled response body, to be called once the response is no longer needed"""
+        if self.request:
+            self.request.release()
+
     def consume(self, client: AsyncClient):
-        metadata, data, further_requests = self.consumer(self, client)
+        with metrics.histogram('crawler_parse_seconds', 'Time spent in the consumer functions').time(
+                consumer=self.consumer.__name__
+        ), tracer.span(self.trace, self.consumer.__name__):
+            metadata, data, further_requests = self.consumer(self, client)
         self.__metadata = metadata
         self.__data = data
         self.__further_requests = further_requests
 
-    async def jsonl(self) -> dict:
-        await asyncio.sleep(0)
+    def serialize_result(self) -> dict:
+        """Serialize the result of the consumer function, to be reused by a later not modified response
+
+        :return: dict with the consumer's metadata, data and serialized further requests
+        """
+        return {
+            'metadata': self.metadata,
+            'data': self.data.decode('utf-8') if type(self.data) is bytes else self.data,
+            'data_is_bytes': type(self.data) is bytes,
+            'further_requests': [_.serialize() for _ in self.further_requests] if self.further_requests else None,
+        }
+
+    def restore(self, result: dict, further_requests: list[ScrapeRequest] or None) -> None:
+        """Set a serialized consumer result instead of consuming the response
+
+        :param result: dict consumer result serialized by ScrapeResponse.serialize_result
+        :param further_requests: list[ScrapeRequest] or None requests rebuilt from the result's further requests
+        """
+        self.__metadata = result['metadata']
+        self.__data = result['data'].encode('utf-8') if result['data_is_bytes'] else result['data']
+        self.__further_requests = further_requests
+
+    def serialize(self, payload_dir: str) -> dict:
+        """Serialize a consumed response, moving its downloaded PDF, if any, into the payload directory
+
+        :param payload_dir: str directory to move the response body into
+        :return: dict with the serialized request, the response status and headers, the consumer result, the path of
+            the response body and the number of failed attempts, if any
+        """
+        payload, content_hash = None, self.content_hash
+        if self.is_pdf:
+            Path(payload_dir).mkdir(parents=True, exist_ok=True)
+            if self.spool_path:
+                payload = os.path.join(payload_dir, os.path.basename(self.spool_path))
+                os.replace(self.spool_path, payload)
+            else:
+                payload = os.path.join(payload_dir, f'{content_hash}.pdf')
+                with open(payload, 'wb') as _:
+                    _.write(self.content)
+        data = {
+            'request': self.request.serialize(),
+            'status': self.request.response.status_code,
+            'headers': self.headers.multi_items(),
+            'result': self.serialize_result(),
+            'payload': payload,
+            'content_hash': content_hash,
+        }
+        if self.__reset_count:
+            data['resets'] = self.__reset_count     # keeps counting towards the retry policy once restored
+        return data
+
+    @classmethod
+    def deserialize(cls, data: dict, client: AsyncClient, consumer: Callable) -> 'ScrapeResponse':
+        """Rebuild a response serialized by ScrapeResponse.serialize, without sending its request
+
+        :param data: dict serialized response
+        :param client: AsyncClient HTTP Client the request is rebuilt with
+        :param consumer: Callable consumer function named by the serialized request
+        :return: ScrapeResponse the consumed response
+        """
+        scrape_request = ScrapeRequest.deserialize(data['request'], client, consumer)
+        request = client.build_request(data['request']['method'], data['request']['url'])
+        scrape_request.restore(
+            Response(data['status'], headers=data['headers'], content=b'', request=request),
+            data['payload'], data['content_hash'] if data['payload'] else None
+        )
+        response = cls(scrape_request)
+        response.restore(data['result'], None)     # further requests were queued by the earlier crawl
+        response.__reset_count = data.get('resets', 0)
+        return response
+
+    @property
+    def record(self) -> dict:
+        """record: dict output record of the response's document, without the document itself"""
         return {
             'title': self.metadata['share']['title'],
             'ticker': self.metadata['share']['ticker'],
             'year': self.metadata['year'] if 'year' in self.metadata.keys() else None,
             'document_type': self.metadata['data_type'],
-            'doc': await self.document,
         }
+
+    async def jsonl(
+            self,
+            conversion_pool: ConversionPool or None = None,
+            document_index: DocumentIndex or None = None
+    ) -> dict:
+        await asyncio.sleep(0)
+        jsonline = {**self.record, 'doc': await self.get_document(conversion_pool, document_index)}
+        if not self.data and self.is_pdf:
+            jsonline['conversion'] = self.get_profile(conversion_pool)     # cheaper profiles may be upgraded later
+            if self.page_triage is not None:
+                jsonline['pages'] = self.page_triage['stats']
+        return jsonline
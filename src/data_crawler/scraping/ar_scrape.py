@@ -8,15 +8,16 @@ from src.data_crawler.parsers.ar_parse import parse_stocks_table, parse_firms_de
 logger = getLogger(LOGGER_NAME)
 
 
-def scrape_ar_stocks_table(url: str) -> list[dict[str, any]]:
+def scrape_ar_stocks_table(url: str, client: Client or None = None) -> list[dict[str, any]]:
     """Function to scrape stocks table from AnnualReports Stocks Table page
 
     :param url: AnnualReports FTSE ALL-SHARE Stocks Table URL
+    :param client: HTTP Client used to get the page, one is created from HTTP_CLIENT_CONFIG if None
     """
     logger.debug(f'Scraping AR stocks table from {url}')
     __stocks: dict = {}
     try:
-        client = Client(**HTTP_CLIENT_CONFIG)
+        client = client if client is not None else Client(**HTTP_CLIENT_CONFIG)
         response = client.get(url)
         if response.is_success:
             __stocks = parse_stocks_table(response.text)
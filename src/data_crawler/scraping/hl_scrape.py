@@ -10,16 +10,21 @@ from src.data_crawler.constants import DATA_SRC_URLS, HTTP_CLIENT_CONFIG, LOGGER
 logger = getLogger(LOGGER_NAME)
 
 
-async def scrape_hl_index_stocks_table(url: str, n_pages: int = 6) -> list[dict[str, any]]:
+async def scrape_hl_index_stocks_table(
+        url: str,
+        n_pages: int = 6,
+        client: AsyncClient or None = None
+) -> list[dict[str, any]]:
     """Function to scrape stocks table from HL Stocks Table page
 
     :param url: HL Stocks Table URL
     :param n_pages: Number of pages to scrape from HL Stocks Table page
+    :param client: HTTP Client used to get the pages, one is created from HTTP_CLIENT_CONFIG if None
     """
     logger.debug(f'Scraping HL stocks table from {url}')
     __stocks = {}
     try:
-        client = AsyncClient(**HTTP_CLIENT_CONFIG)
+        client = client if client is not None else AsyncClient(**HTTP_CLIENT_CONFIG)
         pages = [client.get(url + f"?page={page_number}") for page_number in range(1, n_pages + 1)]
         for response in asyncio.as_completed(pages):
             response = await response
@@ -0,0 +1,17 @@
+from .crawl_state import CrawlState
+from .validator_store import ValidatorStore
+from .redirect_map import RedirectMap
+from .response_cache import ResponseCache, CachingTransport, AsyncCachingTransport
+from .document_index import DocumentIndex
+from .conversion_cache import ConversionCache
+from .blob_store import BlobStore
+from .checkpoint import Checkpoint
+from .sharded_dataset import ShardedDatasetWriter, ShardedDatasetReader
+from .jsonl_writer import JsonlWriter
+
+
+__all__ = [
+    'CrawlState', 'ValidatorStore', 'RedirectMap', 'ResponseCache', 'CachingTransport', 'AsyncCachingTransport',
+    'DocumentIndex', 'ConversionCache', 'BlobStore', 'Checkpoint', 'JsonlWriter', 'ShardedDatasetWriter',
+    'ShardedDatasetReader'
+]
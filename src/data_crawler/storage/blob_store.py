@@ -0,0 +1,138 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from pathlib import Path
+
+from src.data_crawler.constants import LOGGER_NAME, BLOB_STORE_DIR, DOWNLOAD_CHUNK_SIZE
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS manifest (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    converted_at REAL
+);
+CREATE INDEX IF NOT EXISTS manifest_pending ON manifest (converted_at, stored_at);
+"""
+
+
+class BlobStore:
+    """Content addressed store of the downloaded PDFs, to be converted later
+
+    Lets the crawler download documents without converting them: each PDF is stored once per SHA-256 digest under the
+    blobs directory, and a SQLite manifest maps each url to its blob and to the record of its document, without the
+    markdown. Documents stay pending until the convert stage writes their conversion, and go back to pending when a
+    url is stored again with a different content.
+
+    put runs on a worker thread, the manifest methods on the event loop's thread.
+
+    :param path: str path of the blob store directory
+    """
+
+    __path: Path
+    __connection: sqlite3.Connection or None
+
+    def __init__(self, path: str = BLOB_STORE_DIR):
+        self.__path = Path(path)
+        self.__connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            self.__path.mkdir(parents=True, exist_ok=True)
+            self.__connection = sqlite3.connect(self.__path / 'manifest.sqlite', timeout=30)
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+            self.__connection.executescript(SCHEMA)
+        return self.__connection
+
+    def blob_path(self, digest: str) -> Path:
+        return self.__path / digest[:2] / digest
+
+    def put(self, source: str or bytes, digest: str or None = None) -> tuple[str, int]:
+        """Store a document's content, once per digest
+
+        :param source: str or bytes path to the file holding the content, which is left in place, or the raw content
+        :param digest: str or None SHA-256 hex digest of the content, computed if None
+        :return: tuple[str, int] digest and size of the content
+        """
+        if digest is None:
+            digest = hashlib.sha256()
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                digest.update(source)
+            else:
+                with open(source, 'rb') as _:
+                    while chunk := _.read(DOWNLOAD_CHUNK_SIZE):
+                        digest.update(chunk)
+            digest = digest.hexdigest()
+
+        blob_path = self.blob_path(digest)
+        if not blob_path.exists():
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=blob_path.parent, delete=False) as _:
+                if isinstance(source, (bytes, bytearray, memoryview)):
+                    _.write(source)
+                else:
+                    with open(source, 'rb') as src:
+                        shutil.copyfileobj(src, _, DOWNLOAD_CHUNK_SIZE)
+            os.replace(_.name, blob_path)   # readers never see a partial blob
+        return digest, blob_path.stat().st_size
+
+    def add(self, url: str, digest: str, size: int, record: dict) -> None:
+        """Add a stored document to the manifest, pending conversion unless the url already holds this content
+
+        :param url: str url of the document
+        :param digest: str SHA-256 hex digest of the document content
+        :param size: int size in bytes of the document content
+        :param record: dict output record of the document, without its markdown
+        """
+        with self.connection as _:
+            _.execute(
+                'INSERT INTO manifest (url, digest, size, record, stored_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (url) DO UPDATE SET '
+                '    converted_at = CASE WHEN digest = excluded.digest THEN converted_at END, '
+                '    digest = excluded.digest, size = excluded.size, record = excluded.record, '
+                '    stored_at = excluded.stored_at',
+                (url, digest, size, json.dumps(record, ensure_ascii=False), time.time())
+            )
+
+    def pending(self) -> list[dict]:
+        """Get the documents pending conversion, in storage order
+
+        :return: list[dict] url, digest, size and record of each pending document
+        """
+        rows = self.connection.execute(
+            'SELECT url, digest, size, record FROM manifest WHERE converted_at IS NULL ORDER BY stored_at'
+        ).fetchall()
+        return [{'url': url, 'digest': digest, 'size': size, 'record': json.loads(record)}
+                for url, digest, size, record in rows]
+
+    def mark_converted(self, url: str) -> None:
+        with self.connection as _:
+            _.execute('UPDATE manifest SET converted_at = ? WHERE url = ?', (time.time(), url))
+
+    def reset(self) -> None:
+        """Mark every document as pending, to convert the whole store again"""
+        with self.connection as _:
+            _.execute('UPDATE manifest SET converted_at = NULL')
+
+    def stats(self) -> dict:
+        row = self.connection.execute(
+            'SELECT COUNT(*), COUNT(DISTINCT digest), COUNT(converted_at), COALESCE(SUM(size), 0) FROM manifest'
+        ).fetchone()
+        return {'documents': row[0], 'blobs': row[1], 'converted': row[2], 'pending': row[0] - row[2], 'size': row[3]}
+
+    def close(self) -> None:
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
@@ -0,0 +1,77 @@
+import json
+import logging
+import os
+import shutil
+import time
+
+from pathlib import Path
+
+from src.data_crawler.constants import LOGGER_NAME, CHECKPOINT_DIR
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class Checkpoint:
+    """On-disk checkpoint of the queues of a stopped crawl
+
+    Holds the serialized requests that were still queued when the crawl stopped and the consumed responses that were
+    not processed yet, whose downloaded documents are moved into the payloads directory so they are not downloaded
+    again. The checkpoint file is replaced atomically, and loaded by the next crawl.
+
+    :param path: str path of the checkpoint directory
+    """
+
+    __path: Path
+
+    def __init__(self, path: str = CHECKPOINT_DIR):
+        self.__path = Path(path)
+
+    @property
+    def file_path(self) -> Path:
+        return self.__path / 'checkpoint.json'
+
+    @property
+    def payload_dir(self) -> str:
+        """payload_dir: str directory holding the downloaded documents of the checkpointed responses"""
+        return str(self.__path / 'payloads')
+
+    @property
+    def exists(self) -> bool:
+        return self.file_path.exists()
+
+    def save(self, requests: list[dict], responses: list[dict]) -> None:
+        """Write the checkpoint, replacing the previous one
+
+        :param requests: list[dict] serialized requests in the ScrapeRequestsProducer format
+        :param responses: list[dict] responses serialized by ScrapeResponse.serialize
+        """
+        self.__path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.file_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as _:
+            json.dump({'saved_at': time.time(), 'requests': requests, 'responses': responses}, _, default=str)
+            _.flush()
+            os.fsync(_.fileno())
+        os.replace(tmp_path, self.file_path)
+        logger.info(f'Checkpointed {len(requests)} requests and {len(responses)} responses into {self.file_path}.')
+
+    def load(self) -> tuple[list[dict], list[dict]]:
+        """Read the checkpoint
+
+        :return: tuple[list[dict], list[dict]] serialized requests and responses, empty if there is no checkpoint
+        """
+        if not self.exists:
+            return [], []
+        with open(self.file_path) as _:
+            checkpoint = json.load(_)
+        return checkpoint['requests'], checkpoint['responses']
+
+    def clear(self, payloads: bool = False) -> None:
+        """Remove the checkpoint file
+
+        :param payloads: bool whether to remove the checkpointed documents as well, which are otherwise removed by the
+            consumers once processed
+        """
+        self.file_path.unlink(missing_ok=True)
+        if payloads:
+            shutil.rmtree(self.payload_dir, ignore_errors=True)
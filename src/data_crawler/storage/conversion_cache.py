@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+
+from pathlib import Path
+
+from src.data_crawler.constants import LOGGER_NAME, CONVERSION_CACHE_PATH, CONVERSION_CACHE_MAX_BYTES
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversions (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    version TEXT NOT NULL,
+    options TEXT NOT NULL,
+    markdown TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversions_accessed_at ON conversions (accessed_at);
+"""
+
+
+class ConversionCache:
+    """On-disk cache of the PDF conversions, shared by every conversion entry point
+
+    Keyed by the SHA-256 digest of the PDF content, the converter version and the conversion options, so a PDF
+    converted before by the crawler, its convert stage or the pdf_converter, with the same converter and options, isn't
+    converted again. An upgraded converter or different options miss the cache. The least recently used conversions
+    are evicted once the cached text exceeds max_bytes.
+
+    :param path: str path of the SQLite database file
+    :param max_bytes: int maximum total size in bytes of the cached conversions
+    """
+
+    __path: str
+    __max_bytes: int
+    __connection: sqlite3.Connection or None
+    __stats: dict[str, int]
+
+    def __init__(self, path: str = CONVERSION_CACHE_PATH, max_bytes: int = CONVERSION_CACHE_MAX_BYTES):
+        self.__path = path
+        self.__max_bytes = max_bytes
+        self.__connection = None
+        self.__stats = {'hits': 0, 'misses': 0, 'evicted': 0}
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            Path(self.__path).parent.mkdir(parents=True, exist_ok=True)
+            self.__connection = sqlite3.connect(self.__path, timeout=30)
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+            self.__connection.executescript(SCHEMA)
+        return self.__connection
+
+    @staticmethod
+    def key(digest: str, version: str, options: dict) -> str:
+        """Cache key of a conversion
+
+        :param digest: str SHA-256 digest of the PDF content
+        :param version: str version of the converter
+        :param options: dict conversion options, such as the profile and the converted pages
+        :return: str SHA-256 hex digest of the conversion's digest, version and options
+        """
+        return hashlib.sha256(
+            json.dumps([digest, version, options], sort_keys=True).encode('utf-8')
+        ).hexdigest()
+
+    def get(self, digest: str, version: str, options: dict) -> str or None:
+        """Get a cached conversion, marking it as recently used
+
+        :return: str or None converted text, None if the PDF wasn't converted with this converter and options
+        """
+        key = self.key(digest, version, options)
+        row = self.connection.execute('SELECT markdown FROM conversions WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.__stats['misses'] += 1
+            return None
+        with self.connection as _:
+            _.execute('UPDATE conversions SET accessed_at = ? WHERE key = ?', (time.time(), key))
+        self.__stats['hits'] += 1
+        return row[0]
+
+    def put(self, digest: str, version: str, options: dict, markdown: str) -> None:
+        """Cache a conversion, evicting the least recently used ones if the cache is full"""
+        now, size = time.time(), len(markdown.encode('utf-8'))
+        with self.connection as _:
+            _.execute(
+                'INSERT OR REPLACE INTO conversions (key, digest, version, options, markdown, size, created_at, '
+                'accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (self.key(digest, version, options), digest, version, json.dumps(options, sort_keys=True), markdown,
+                 size, now, now)
+            )
+        self.evict()
+
+    def evict(self) -> int:
+        """Evict the least recently used conversions until the cached text fits in max_bytes
+
+        :return: int number of evicted conversions
+        """
+        total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM conversions').fetchone()[0]
+        if total <= self.__max_bytes:
+            return 0
+        keys = []
+        for key, size in self.connection.execute('SELECT key, size FROM conversions ORDER BY accessed_at'):
+            if total <= self.__max_bytes:
+                break
+            keys.append((key,))
+            total -= size
+        with self.connection as _:
+            _.executemany('DELETE FROM conversions WHERE key = ?', keys)
+        self.__stats['evicted'] += len(keys)
+        logger.debug(f'Evicted {len(keys)} conversions from the conversion cache.')
+        return len(keys)
+
+    def stats(self) -> dict:
+        row = self.connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM conversions').fetchone()
+        return {**self.__stats, 'conversions': row[0], 'size': row[1]}
+
+    def close(self) -> None:
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
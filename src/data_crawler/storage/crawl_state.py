@@ -0,0 +1,173 @@
+import json
+import logging
+import sqlite3
+import time
+
+from pathlib import Path
+
+from src.data_crawler.constants import LOGGER_NAME, CRAWL_STATE_PATH
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS frontier (
+    run_id INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    request TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, url)
+);
+CREATE TABLE IF NOT EXISTS documents (
+    ticker TEXT NOT NULL,
+    document_type TEXT NOT NULL,
+    year TEXT NOT NULL,
+    url TEXT NOT NULL,
+    completed_at REAL NOT NULL,
+    PRIMARY KEY (ticker, document_type, year, url)
+);
+CREATE INDEX IF NOT EXISTS documents_url ON documents (url);
+"""
+
+PENDING = 'pending'
+DONE = 'done'
+
+
+class CrawlState:
+    """Persistent crawl state
+
+    Records the frontier of every crawl run and the completed documents on a SQLite database. An interrupted run is
+    resumed by the next crawl, skipping the requests it already completed, while a new run only downloads documents
+    that were not completed by any previous run.
+
+    :param path: str path of the SQLite database file
+    """
+
+    __path: str
+    __connection: sqlite3.Connection or None
+    __run_id: int or None
+    __resumed: bool
+    __enqueued: set[str]
+
+    def __init__(self, path: str = CRAWL_STATE_PATH):
+        self.__path = path
+        self.__connection = None
+        self.__run_id = None
+        self.__resumed = False
+        self.__enqueued = set()
+
+    @property
+    def run_id(self) -> int or None:
+        return self.__run_id
+
+    @property
+    def is_resumed(self) -> bool:
+        """is_resumed: bool whether the current run resumes an interrupted one"""
+        return self.__resumed
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            Path(self.__path).parent.mkdir(parents=True, exist_ok=True)
+            self.__connection = sqlite3.connect(self.__path, timeout=30)
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+            self.__connection.executescript(SCHEMA)
+        return self.__connection
+
+    def start(self, fresh: bool = False) -> int:
+        """Start a crawl run, resuming the last unfinished one unless a fresh run is requested
+
+        :param fresh: bool whether to start a new run even if the last one did not finish
+        :return: int id of the run
+        """
+        with self.connection as _:
+            row = _.execute('SELECT id FROM runs WHERE finished_at IS NULL ORDER BY id DESC LIMIT 1').fetchone()
+            if row is not None and not fresh:
+                self.__run_id, self.__resumed = row[0], True
+            else:
+                self.__run_id = _.execute('INSERT INTO runs (started_at) VALUES (?)', (time.time(),)).lastrowid
+                self.__resumed = False
+        logger.info(f'{"Resuming" if self.__resumed else "Starting"} crawl run {self.__run_id}.')
+        return self.__run_id
+
+    def finish(self) -> None:
+        """Mark the current run as finished"""
+        with self.connection as _:
+            _.execute('UPDATE runs SET finished_at = ? WHERE id = ?', (time.time(), self.__run_id))
+
+    def pending_requests(self) -> list[dict]:
+        """Get the serialized requests the current run has not completed yet
+
+        :return: list[dict] requests in the ScrapeRequestsProducer format
+        """
+        rows = self.connection.execute(
+            'SELECT request FROM frontier WHERE run_id = ? AND status = ?', (self.__run_id, PENDING)
+        ).fetchall()
+        return [json.loads(_[0]) for _ in rows]
+
+    def claim(self, request: dict) -> bool:
+        """Add a request to the frontier unless its work is already done
+
+        Requests are skipped if they were already queued by this process, completed by the current run, or if they
+        are downloads of a document completed by any run.
+
+        :param request: dict serialized request in the ScrapeRequestsProducer format
+        :return: bool whether the request should be queued
+        """
+        url = request['metadata']['url']
+        if url in self.__enqueued:
+            return False
+        row = self.connection.execute(
+            'SELECT status FROM frontier WHERE run_id = ? AND url = ?', (self.__run_id, url)
+        ).fetchone()
+        if row is not None and row[0] == DONE:
+            return False
+        if request.get('stream') and self.has_document_url(url):
+            self.complete(url)
+            return False
+        with self.connection as _:
+            _.execute(
+                'INSERT OR REPLACE INTO frontier (run_id, url, request, status, updated_at) VALUES (?, ?, ?, ?, ?)',
+                (self.__run_id, url, json.dumps(request, default=str), PENDING, time.time())
+            )
+        self.__enqueued.add(url)
+        return True
+
+    def complete(self, url: str) -> None:
+        """Mark a request of the current run as done"""
+        with self.connection as _:
+            _.execute(
+                'UPDATE frontier SET status = ?, updated_at = ? WHERE run_id = ? AND url = ?',
+                (DONE, time.time(), self.__run_id, url)
+            )
+
+    def has_document_url(self, url: str) -> bool:
+        row = self.connection.execute('SELECT 1 FROM documents WHERE url = ? LIMIT 1', (url,)).fetchone()
+        return row is not None
+
+    def has_document(self, ticker: str, document_type: str, year: any, url: str) -> bool:
+        row = self.connection.execute(
+            'SELECT 1 FROM documents WHERE ticker = ? AND document_type = ? AND year = ? AND url = ?',
+            (ticker, document_type, str(year), url)
+        ).fetchone()
+        return row is not None
+
+    def complete_document(self, ticker: str, document_type: str, year: any, url: str) -> None:
+        """Record a document as written to the dataset"""
+        with self.connection as _:
+            _.execute(
+                'INSERT OR IGNORE INTO documents (ticker, document_type, year, url, completed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (ticker, document_type, str(year), url, time.time())
+            )
+
+    def close(self) -> None:
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import sqlite3
+import time
+
+from pathlib import Path
+from typing import Callable, Awaitable
+
+from src.data_crawler.constants import LOGGER_NAME, DOCUMENT_INDEX_PATH, CONVERSION_PROFILE
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outputs (
+    digest TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    ticker TEXT,
+    document_type TEXT,
+    year TEXT,
+    written_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    digest TEXT NOT NULL,
+    url TEXT NOT NULL,
+    primary_url TEXT NOT NULL,
+    ticker TEXT,
+    document_type TEXT,
+    year TEXT,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (digest, url)
+);
+"""
+
+# Conversions stored by the indexes written before the conversion cache, not keyed by the converter version
+MIGRATION = """
+DROP TABLE IF EXISTS conversions;
+"""
+
+
+class DocumentIndex:
+    """Content hash index of the downloaded documents
+
+    Shares the in-flight conversions of the downloaded PDFs by the SHA-256 digest of their content, so the same report
+    linked under different urls and downloaded at once is converted only once. Conversions are stored by the
+    ConversionCache of the conversion pool instead, keyed by the converter version and the conversion options. It also
+    records which url's document was written to the dataset for each digest, later copies being recorded as alias rows
+    instead.
+
+    :param path: str path of the SQLite database file
+    """
+
+    __path: str
+    __connection: sqlite3.Connection or None
+    __pending: dict[tuple[str, str, tuple or None], asyncio.Task]
+    __stats: dict[str, int]
+
+    def __init__(self, path: str = DOCUMENT_INDEX_PATH):
+        self.__path = path
+        self.__connection = None
+        self.__pending = {}
+        self.__stats = {'converted': 0, 'reused': 0, 'aliases': 0}
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            Path(self.__path).parent.mkdir(parents=True, exist_ok=True)
+            self.__connection = sqlite3.connect(self.__path, timeout=30)
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+            self.__connection.executescript(MIGRATION)
+            self.__connection.executescript(SCHEMA)
+        return self.__connection
+
+    async def get_document(
+            self,
+            digest: str,
+            convert: Callable[[], Awaitable[str]],
+            profile: str = CONVERSION_PROFILE,
+            pages: list[int] or None = None
+    ) -> str:
+        """Get the conversion of a document, sharing the conversion in flight of the same content, profile and pages
+
+        :param digest: str SHA-256 digest of the document content
+        :param convert: Callable coroutine function converting the document
+        :param profile: str conversion profile of the document
+        :param pages: list[int] or None pages converted, such as the pages kept by the page triage, every page if None
+        :return: str converted text
+        """
+        key = (digest, profile, tuple(pages) if pages is not None else None)
+        if key in self.__pending:
+            self.__stats['reused'] += 1
+            logger.debug(f'Reusing the {profile} conversion of document {digest[:12]} in flight')
+        else:
+            task = asyncio.create_task(self.__convert(convert))
+            task.add_done_callback(lambda _: self.__pending.pop(key, None))
+            self.__pending[key] = task
+        return await asyncio.shield(self.__pending[key])
+
+    async def __convert(self, convert: Callable[[], Awaitable[str]]) -> str:
+        markdown = await convert()
+        if markdown is not None:
+            self.__stats['converted'] += 1
+        return markdown
+
+    def get_primary_url(self, digest: str) -> str or None:
+        """Get the url whose document with the given digest was written to the dataset, if any"""
+        row = self.connection.execute('SELECT url FROM outputs WHERE digest = ?', (digest,)).fetchone()
+        return row[0] if row is not None else None
+
+    def add_output(self, digest: str, url: str, ticker: str, document_type: str, year: any) -> None:
+        """Record the document written to the dataset for a digest"""
+        with self.connection as _:
+            _.execute(
+                'INSERT OR IGNORE INTO outputs (digest, url, ticker, document_type, year, written_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (digest, url, ticker, document_type, None if year is None else str(year), time.time())
+            )
+
+    def add_alias(self, digest: str, url: str, primary_url: str, ticker: str, document_type: str, year: any) -> None:
+        """Record a duplicate of a document already written to the dataset"""
+        with self.connection as _:
+            _.execute(
+                'INSERT OR REPLACE INTO aliases (digest, url, primary_url, ticker, document_type, year, recorded_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (digest, url, primary_url, ticker, document_type, None if year is None else str(year), time.time())
+            )
+        self.__stats['aliases'] += 1
+        logger.debug(f'Recorded {url} as an alias of {primary_url}')
+
+    def clear_outputs(self) -> None:
+        """Forget the written documents and their aliases, to be called when the dataset is rebuilt"""
+        with self.connection as _:
+            _.execute('DELETE FROM outputs')
+            _.execute('DELETE FROM aliases')
+
+    def stats(self) -> dict:
+        return self.__stats.copy()
+
+    def close(self) -> None:
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
@@ -0,0 +1,231 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import time
+
+from pathlib import Path
+from typing import Callable, BinaryIO
+
+from src.data_crawler.constants import LOGGER_NAME, WRITER_FLUSH_SIZE, WRITER_FLUSH_INTERVAL
+from src.data_crawler.storage.sharded_dataset import ShardedDatasetWriter
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+encoder = json.JSONEncoder(ensure_ascii=False)  # same output as jsonlines.Writer
+
+
+class JsonlWriter:
+    """Buffered jsonlines writer task
+
+    Single writer for the crawler's output files. Records are queued by the consumers without waiting, and the writer
+    task keeps the files open and appends the queued records in batches, flushing them once the buffered size or the
+    time since the last flush reaches its threshold. The files are fsynced when the writer is closed.
+
+    Records that fail to be written stay buffered, and their callbacks pending, until a later flush writes them. Closing
+    the writer while some records still can't be written raises an OSError, their callbacks never being called, so
+    their work isn't recorded as done.
+
+    Records of the paths mapped to a sharded dataset are written into its compressed shards instead, the compression
+    running on the writer's thread as well.
+
+    :param flush_size: int buffered bytes that trigger a flush
+    :param flush_interval: float maximum seconds a record stays buffered
+    :param datasets: dict[str, ShardedDatasetWriter] or None datasets replacing the jsonlines files of some paths
+    """
+
+    __flush_size: int
+    __flush_interval: float
+    __queue: asyncio.Queue
+    __files: dict[str, BinaryIO]
+    __datasets: dict[str, ShardedDatasetWriter]
+    __buffers: dict[str, list[tuple[bytes, dict]]]
+    __callbacks: list[Callable[[], None]]
+    __buffered: int
+    __records: int
+    __bytes: int
+    __write_time: float
+    __started_at: float or None
+    __task: asyncio.Task or None
+
+    def __init__(
+            self,
+            flush_size: int = WRITER_FLUSH_SIZE,
+            flush_interval: float = WRITER_FLUSH_INTERVAL,
+            datasets: dict[str, ShardedDatasetWriter] or None = None
+    ):
+        self.__flush_size = flush_size
+        self.__flush_interval = flush_interval
+        self.__queue = asyncio.Queue()
+        self.__files = {}
+        self.__datasets = datasets if datasets is not None else {}
+        self.__buffers = {}
+        self.__callbacks = []
+        self.__buffered = 0
+        self.__records = 0
+        self.__bytes = 0
+        self.__write_time = 0
+        self.__started_at = None
+        self.__task = None
+
+    @property
+    def pending(self) -> int:
+        """pending: int number of records queued or buffered and not yet written"""
+        return self.__queue.qsize() + sum([len(_) for _ in self.__buffers.values()])
+
+    def start(self) -> asyncio.Task:
+        """Start the writer task"""
+        if self.__task is None:
+            self.__started_at = time.perf_counter()
+            self.__task = asyncio.create_task(self())
+        return self.__task
+
+    def write(self, path: str, record: dict, callback: Callable[[], None] or None = None) -> None:
+        """Queue a record to be appended to a jsonlines file
+
+        :param path: str path of the jsonlines file
+        :param record: dict record to write
+        :param callback: Callable or None function called once the record is written to the file
+        """
+        line = (encoder.encode(record) + '\n').encode('utf-8')
+        self.__queue.put_nowait((path, line, record, callback))
+
+    async def __call__(self) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = None
+        while True:
+            try:
+                timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                item = await asyncio.wait_for(self.__queue.get(), timeout)
+            except TimeoutError:
+                await self.flush()  # records left by a failed write are retried on the next deadline
+                deadline = loop.time() + self.__flush_interval if self.__callbacks or self.__buffers else None
+                continue
+
+            self.__queue.task_done()
+            if item is None:    # stop signal sent by close
+                return
+            self.__buffer(*item)
+            if deadline is None:
+                deadline = loop.time() + self.__flush_interval
+            if self.__buffered >= self.__flush_size:
+                await self.flush()
+                deadline = loop.time() + self.__flush_interval if self.__callbacks or self.__buffers else None
+
+    def __buffer(self, path: str, line: bytes, record: dict, callback: Callable[[], None] or None) -> None:
+        self.__buffers.setdefault(path, []).append((line, record))
+        self.__buffered += len(line)
+        if callback is not None:
+            self.__callbacks.append(callback)
+
+    async def flush(self, sync: bool = False) -> None:
+        """Write the buffered records to their files
+
+        Records that fail to be written are buffered again, along with every callback of the flush, to be retried by
+        the next flush.
+
+        :param sync: bool whether to fsync the files once written
+        """
+        buffers, callbacks = self.__buffers, self.__callbacks
+        self.__buffers, self.__callbacks, self.__buffered = {}, [], 0
+        if buffers or sync:
+            start = time.perf_counter()
+            records = sum([len(_) for _ in buffers.values()])
+            try:
+                written = await asyncio.to_thread(self.__write, buffers, sync)
+            except Exception as e:     # disk and compression errors alike, the records are never dropped
+                failed = sum([len(_) for _ in buffers.values()])    # written paths are removed from the buffers
+                logger.error(f'Failed to write {failed} records, retrying on the next flush: {e!r}')
+                self.__records += records - failed
+                for path, lines in self.__buffers.items():     # buffered meanwhile, after the failed ones
+                    buffers.setdefault(path, []).extend(lines)
+                self.__buffers, self.__callbacks = buffers, callbacks + self.__callbacks
+                self.__buffered = sum([len(line) for lines in buffers.values() for line, _ in lines])
+                return
+            self.__write_time += time.perf_counter() - start
+            self.__records += records
+            self.__bytes += written
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.exception(f'Error in a jsonlines writer callback: {e}')
+
+    def __write(self, buffers: dict[str, list[tuple[bytes, dict]]], sync: bool) -> int:
+        """Write the buffered records, removing them from the buffers once written
+
+        :return: int number of bytes written
+        """
+        written = 0
+        for path in list(buffers):
+            lines = buffers[path]
+            if path in self.__datasets:
+                done = 0
+                try:
+                    for line, record in lines:
+                        written += self.__datasets[path].write_line(line, record)['length']
+                        done += 1
+                finally:
+                    del lines[:done]
+                self.__datasets[path].flush()
+                del buffers[path]
+                continue
+            if path not in self.__files:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                self.__files[path] = open(path, 'ab')
+            file, data = self.__files[path], b''.join([line for line, _ in lines])
+            position = file.tell()
+            try:
+                file.write(data)
+                file.flush()
+            except Exception:
+                with contextlib.suppress(OSError):
+                    self.__files.pop(path).close()  # reopened by the retry, appending after the last complete record
+                os.truncate(path, position)
+                raise
+            written += len(data)
+            del buffers[path]
+        if sync:
+            for _ in self.__files.values():
+                os.fsync(_.fileno())
+            for _ in self.__datasets.values():
+                _.flush(sync=True)
+        return written
+
+    async def close(self) -> None:
+        """Write every queued record, fsync and close the files and stop the writer task"""
+        if self.__task is not None:
+            self.__queue.put_nowait(None)   # the task stops once it has buffered the records queued before
+            await self.__task
+            self.__task = None
+        while not self.__queue.empty():     # records queued without a running task
+            item = self.__queue.get_nowait()
+            self.__queue.task_done()
+            if item is not None:
+                self.__buffer(*item)
+        await self.flush(sync=True)
+        for _ in self.__files.values():
+            _.close()
+        self.__files = {}
+        for _ in self.__datasets.values():
+            _.close()
+        logger.info(f'Jsonlines writer stats: {self.stats()}')
+        if self.__buffers or self.__callbacks:
+            raise OSError(f'Failed to write {self.pending} records, their work is left undone')
+
+    def stats(self) -> dict:
+        """Get the write path statistics
+
+        :return: dict records and bytes written, overall and per second
+        """
+        elapsed = time.perf_counter() - self.__started_at if self.__started_at is not None else 0
+        return {
+            'records': self.__records,
+            'bytes': self.__bytes,
+            'pending': self.pending,
+            'write_time': self.__write_time,
+            'records_per_second': self.__records / elapsed if elapsed else 0,
+            'bytes_per_second': self.__bytes / elapsed if elapsed else 0,
+        }
@@ -0,0 +1,103 @@
+import logging
+import sqlite3
+import time
+
+from pathlib import Path
+
+import httpx
+
+from src.data_crawler.constants import LOGGER_NAME, REDIRECT_MAP_PATH, MAX_REDIRECT_HOPS
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS redirects (
+    url TEXT PRIMARY KEY,
+    location TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class RedirectMap:
+    """Persistent map of the permanent redirects
+
+    Records the location of the urls answering with a permanent redirect, so later requests, of this run or of the
+    next ones, are sent to the final location right away instead of costing a round trip and a crawl delay for every
+    hop. Redirects recorded by the crawls are followed hop by hop, up to max_hops, and chains looping back on
+    themselves are not followed.
+
+    :param path: str path of the SQLite database file
+    :param max_hops: int maximum number of recorded redirects followed from a url
+    """
+
+    __path: str
+    __max_hops: int
+    __connection: sqlite3.Connection or None
+
+    def __init__(self, path: str = REDIRECT_MAP_PATH, max_hops: int = MAX_REDIRECT_HOPS):
+        self.__path = path
+        self.__max_hops = max_hops
+        self.__connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            Path(self.__path).parent.mkdir(parents=True, exist_ok=True)
+            self.__connection = sqlite3.connect(self.__path, timeout=30)
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+            self.__connection.executescript(SCHEMA)
+        return self.__connection
+
+    @staticmethod
+    def key(url: str or httpx.URL) -> str:
+        return str(httpx.URL(str(url)))
+
+    def add(self, url: str, location: str) -> None:
+        """Record a permanent redirect
+
+        :param url: str redirected url
+        :param location: str url the request was redirected to
+        """
+        with self.connection as _:
+            _.execute(
+                'INSERT OR REPLACE INTO redirects (url, location, updated_at) VALUES (?, ?, ?)',
+                (self.key(url), self.key(location), time.time())
+            )
+
+    def remove(self, url: str) -> None:
+        with self.connection as _:
+            _.execute('DELETE FROM redirects WHERE url = ?', (self.key(url),))
+
+    def get(self, url: str) -> str or None:
+        """Get the recorded location of a url, None if it isn't redirected"""
+        row = self.connection.execute('SELECT location FROM redirects WHERE url = ?', (self.key(url),)).fetchone()
+        return row[0] if row is not None else None
+
+    def resolve(self, url: str) -> tuple[str, list[str]]:
+        """Follow the recorded redirects of a url to its final location
+
+        Chains longer than max_hops or looping back on themselves are not followed, the url being requested as it is.
+
+        :param url: str url to resolve
+        :return: tuple[str, list[str]] final location of the url, and the urls redirected to it, in order
+        """
+        chain, location = [], self.key(url)
+        while (next_location := self.get(location)) is not None:
+            chain.append(location)
+            if next_location in chain or len(chain) > self.__max_hops:
+                logger.warning(f'Not following the recorded redirects of {url}, '
+                               f'{"they loop" if next_location in chain else "too many hops"}: {chain}')
+                return url, []
+            location = next_location
+        return (location, chain) if chain else (url, [])
+
+    def stats(self) -> dict:
+        row = self.connection.execute('SELECT COUNT(*) FROM redirects').fetchone()
+        return {'redirects': row[0]}
+
+    def close(self) -> None:
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
@@ -0,0 +1,320 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Iterator, AsyncIterator
+
+import httpx
+
+from src.data_crawler.constants import LOGGER_NAME, RESPONSE_CACHE_DIR, DOWNLOAD_CHUNK_SIZE
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    method TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (method, url)
+);
+"""
+
+
+class ResponseCache:
+    """Content addressed on-disk HTTP response cache
+
+    Response bodies are stored once per SHA-256 digest under the blobs directory, and an SQLite index maps each
+    request's method and url to the status, headers and body digest of its last response. The cache is plugged into
+    the crawler's clients through CachingTransport and AsyncCachingTransport: when recording, every GET response is
+    stored as it is read from the network; when replaying, responses are served from disk only and requests missing
+    from the cache get a 504 response without touching the network.
+
+    :param path: str path of the cache directory
+    :param replay: bool whether to serve responses from the cache only
+    """
+
+    __path: Path
+    __replay: bool
+    __connection: sqlite3.Connection or None
+    __stats: dict[str, int]
+
+    def __init__(self, path: str = RESPONSE_CACHE_DIR, replay: bool = False):
+        self.__path = Path(path)
+        self.__replay = replay
+        self.__connection = None
+        self.__stats = {'hits': 0, 'misses': 0, 'recorded': 0}
+
+    @property
+    def is_replay(self) -> bool:
+        """is_replay: bool whether responses are served from the cache only"""
+        return self.__replay
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            self.__path.mkdir(parents=True, exist_ok=True)
+            self.__connection = sqlite3.connect(self.__path / 'index.sqlite', timeout=30)
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+            self.__connection.executescript(SCHEMA)
+        return self.__connection
+
+    @property
+    def spool_dir(self) -> Path:
+        """spool_dir: Path directory holding the response bodies being recorded"""
+        return self.__path / 'tmp'
+
+    def blob_path(self, digest: str) -> Path:
+        return self.__path / 'blobs' / digest[:2] / digest
+
+    def transport(self, transport: httpx.BaseTransport or None = None) -> 'CachingTransport':
+        """Get a transport for httpx.Client recording to or replaying from the cache
+
+        :param transport: httpx.BaseTransport network transport used when recording, an HTTPTransport if None
+        """
+        if not self.__replay and transport is None:
+            transport = httpx.HTTPTransport()
+        return CachingTransport(self, transport)
+
+    def async_transport(self, transport: httpx.AsyncBaseTransport or None = None) -> 'AsyncCachingTransport':
+        """Get a transport for httpx.AsyncClient recording to or replaying from the cache
+
+        :param transport: httpx.AsyncBaseTransport network transport used when recording, an AsyncHTTPTransport if None
+        """
+        if not self.__replay and transport is None:
+            transport = httpx.AsyncHTTPTransport()
+        return AsyncCachingTransport(self, transport)
+
+    def get(self, request: httpx.Request) -> httpx.Response:
+        """Get the cached response of a request, a 504 response if it is not cached
+
+        Misses are marked with the replay_miss response extension, so they are not retried.
+
+        :param request: httpx.Request the request
+        :return: httpx.Response the cached response
+        """
+        row = self.connection.execute(
+            'SELECT status, headers, digest FROM responses WHERE method = ? AND url = ?',
+            (request.method, str(request.url))
+        ).fetchone()
+        if row is None or not self.blob_path(row[2]).exists():
+            self.__stats['misses'] += 1
+            logger.debug(f'Response cache miss for {request.method} {request.url}')
+            return httpx.Response(504, headers={'X-Cache': 'MISS'}, request=request, extensions={'replay_miss': True})
+        self.__stats['hits'] += 1
+        status, headers, digest = row
+        return httpx.Response(
+            status, headers=json.loads(headers), stream=BlobStream(self.blob_path(digest)), request=request
+        )
+
+    def is_recorded(self, request: httpx.Request, response: httpx.Response) -> bool:
+        """Whether the response of a request is to be stored
+
+        Conditional requests answered with a 304 response are not stored, so the full response recorded earlier is
+        kept for replays.
+        """
+        return request.method == 'GET' and response.status_code != 304
+
+    def record(self, request: httpx.Request, response: httpx.Response) -> 'Recording':
+        return Recording(self, request, response)
+
+    def store(self, request: httpx.Request, response: httpx.Response, spool_path: str, digest: str, size: int) -> None:
+        """Move a recorded response body into the blobs directory and index it"""
+        blob_path = self.blob_path(digest)
+        if blob_path.exists():
+            os.remove(spool_path)
+        else:
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(spool_path, blob_path)
+        with self.connection as _:
+            _.execute(
+                'INSERT OR REPLACE INTO responses (method, url, status, headers, digest, size, stored_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    request.method, str(request.url), response.status_code,
+                    json.dumps(response.headers.multi_items()), digest, size, time.time()
+                )
+            )
+        self.__stats['recorded'] += 1
+
+    def stats(self) -> dict:
+        return self.__stats.copy()
+
+    def close(self) -> None:
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
+
+
+class Recording:
+    """Response body being recorded into the cache
+
+    The body is hashed and written into a spool file as the client reads it, and stored once fully read.
+    """
+
+    __cache: ResponseCache
+    __request: httpx.Request
+    __response: httpx.Response
+    __spool: tempfile.NamedTemporaryFile or None
+    __digest: any
+    __size: int
+
+    def __init__(self, cache: ResponseCache, request: httpx.Request, response: httpx.Response):
+        self.__cache = cache
+        self.__request = request
+        self.__response = response
+        self.__spool = None
+        self.__digest = hashlib.sha256()
+        self.__size = 0
+
+    def write(self, chunk: bytes) -> None:
+        if self.__spool is None:
+            self.__cache.spool_dir.mkdir(parents=True, exist_ok=True)
+            self.__spool = tempfile.NamedTemporaryFile(dir=self.__cache.spool_dir, delete=False)
+        self.__spool.write(chunk)
+        self.__digest.update(chunk)
+        self.__size += len(chunk)
+
+    def commit(self) -> None:
+        self.write(b'')     # make sure empty bodies get a spool file
+        self.__spool.close()
+        try:
+            self.__cache.store(
+                self.__request, self.__response, self.__spool.name, self.__digest.hexdigest(), self.__size
+            )
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f'Failed to record the response of {self.__request.url}: {e}')
+            self.abort()
+        self.__spool = None
+
+    def abort(self) -> None:
+        """Drop a partially read body"""
+        if self.__spool is not None:
+            self.__spool.close()
+            try:
+                os.remove(self.__spool.name)
+            except FileNotFoundError:
+                pass
+            self.__spool = None
+
+
+class RecordingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Network response stream recording the body into the cache as it is read"""
+
+    __stream: httpx.SyncByteStream or httpx.AsyncByteStream
+    __recording: Recording
+    __done: bool
+
+    def __init__(self, stream: httpx.SyncByteStream or httpx.AsyncByteStream, recording: Recording):
+        self.__stream = stream
+        self.__recording = recording
+        self.__done = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self.__stream:
+            self.__recording.write(chunk)
+            yield chunk
+        self.__recording.commit()
+        self.__done = True
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.__stream:
+            self.__recording.write(chunk)
+            yield chunk
+        self.__recording.commit()
+        self.__done = True
+
+    def close(self) -> None:
+        if not self.__done:
+            self.__recording.abort()
+        self.__stream.close()
+
+    async def aclose(self) -> None:
+        if not self.__done:
+            self.__recording.abort()
+        await self.__stream.aclose()
+
+
+class BlobStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Cached response body stream read from its blob file"""
+
+    __path: Path
+
+    def __init__(self, path: Path):
+        self.__path = path
+
+    def __iter__(self) -> Iterator[bytes]:
+        with open(self.__path, 'rb') as _:
+            while chunk := _.read(DOWNLOAD_CHUNK_SIZE):
+                yield chunk
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for chunk in self:
+            yield chunk
+
+
+class CachingTransport(httpx.BaseTransport):
+    """httpx.Client transport recording responses to, or replaying them from, a ResponseCache
+
+    :param cache: ResponseCache the response cache
+    :param transport: httpx.BaseTransport or None network transport, None when replaying
+    """
+
+    def __init__(self, cache: ResponseCache, transport: httpx.BaseTransport or None):
+        self.cache = cache
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.cache.is_replay:
+            return self.cache.get(request)
+        response = self.transport.handle_request(request)
+        if not self.cache.is_recorded(request, response):
+            return response
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=RecordingStream(response.stream, self.cache.record(request, response)),
+            extensions=response.extensions
+        )
+
+    def close(self) -> None:
+        if self.transport is not None:
+            self.transport.close()
+
+
+class AsyncCachingTransport(httpx.AsyncBaseTransport):
+    """httpx.AsyncClient transport recording responses to, or replaying them from, a ResponseCache
+
+    :param cache: ResponseCache the response cache
+    :param transport: httpx.AsyncBaseTransport or None network transport, None when replaying
+    """
+
+    def __init__(self, cache: ResponseCache, transport: httpx.AsyncBaseTransport or None):
+        self.cache = cache
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.cache.is_replay:
+            return self.cache.get(request)
+        response = await self.transport.handle_async_request(request)
+        if not self.cache.is_recorded(request, response):
+            return response
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=RecordingStream(response.stream, self.cache.record(request, response)),
+            extensions=response.extensions
+        )
+
+    async def aclose(self) -> None:
+        if self.transport is not None:
+            await self.transport.aclose()
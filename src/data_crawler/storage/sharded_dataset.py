@@ -0,0 +1,216 @@
+import gzip
+import json
+import logging
+import os
+import re
+
+from pathlib import Path
+from typing import Iterator, BinaryIO, TextIO
+
+try:
+    import zstandard
+except ImportError:     # zstd shards are optional
+    zstandard = None
+
+from src.data_crawler.constants import LOGGER_NAME, DATASET_SHARD_SIZE, DATASET_COMPRESSION
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+INDEX_FILE = 'index.jsonl'
+
+SHARD_SUFFIXES = {'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst'}
+
+# Document fields copied into the index
+INDEX_FIELDS = ('title', 'ticker', 'document_type', 'year')
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    if compression == 'gzip':
+        return gzip.compress(data, compresslevel=6)
+    return zstandard.ZstdCompressor(level=10).compress(data)
+
+
+def decompress(data: bytes, compression: str) -> bytes:
+    if compression == 'gzip':
+        return gzip.decompress(data)
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def check_compression(compression: str) -> None:
+    if compression not in SHARD_SUFFIXES:
+        raise ValueError(f'Unknown dataset compression "{compression}", expected one of {list(SHARD_SUFFIXES)}.')
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError('zstd compressed datasets require the zstandard package.')
+
+
+class ShardedDatasetWriter:
+    """Writer of a sharded and compressed jsonlines dataset
+
+    Each document is compressed on its own, as a gzip member or a zstd frame, and appended to the current shard, which
+    is rotated once it reaches the shard size. Concatenated members are still a valid compressed jsonlines file, so a
+    whole shard can be read with the usual tools. Every document gets a row in the index sidecar with its title,
+    ticker, document type and year, and the shard, offset and length of its compressed record.
+
+    :param path: str path of the dataset directory
+    :param compression: str 'gzip' or 'zstd'
+    :param shard_size: int size in bytes after which a new shard is started
+    :param name: str prefix of the shard file names, writers sharing a dataset directory need their own prefixes
+    """
+
+    __path: Path
+    __name: str
+    __compression: str
+    __shard_size: int
+    __shard: int
+    __shard_file: BinaryIO or None
+    __index_file: TextIO or None
+
+    def __init__(
+            self,
+            path: str,
+            compression: str = DATASET_COMPRESSION,
+            shard_size: int = DATASET_SHARD_SIZE,
+            name: str = 'data'
+    ):
+        check_compression(compression)
+        self.__path = Path(path)
+        self.__name = name
+        self.__compression = compression
+        self.__shard_size = shard_size
+        self.__shard = len(self.shards())  # append new shards
+        self.__shard_file = None
+        self.__index_file = None
+
+    @property
+    def path(self) -> Path:
+        return self.__path
+
+    @property
+    def shard_name(self) -> str:
+        """shard_name: str file name of the current shard"""
+        return f'{self.__name}-{self.__shard:05d}{SHARD_SUFFIXES[self.__compression]}'
+
+    def is_shard(self, shard_name: str) -> bool:
+        """Whether a file name is one of this writer's numbered shards, not one of the writers with a longer prefix"""
+        pattern = rf'{re.escape(self.__name)}-\d{{5,}}{re.escape(SHARD_SUFFIXES[self.__compression])}'
+        return re.fullmatch(pattern, shard_name) is not None
+
+    def shards(self) -> list[Path]:
+        """Get the shards written by this writer"""
+        return [_ for _ in self.__path.glob(f'{self.__name}-*') if self.is_shard(_.name)]
+
+    def write_line(self, line: bytes, record: dict) -> dict:
+        """Compress and append an encoded jsonlines record to the current shard
+
+        :param line: bytes the encoded record, new line included
+        :param record: dict the record, its index fields are copied into the index
+        :return: dict the record's index row
+        """
+        if self.__shard_file is not None and self.__shard_file.tell() >= self.__shard_size:
+            self.__shard_file.close()
+            self.__shard_file = None
+            self.__shard += 1
+        if self.__shard_file is None:
+            self.__path.mkdir(parents=True, exist_ok=True)
+            self.__shard_file = open(self.__path / self.shard_name, 'ab')
+        if self.__index_file is None:
+            # Line buffered, so rows appended by writers sharing the index are never interleaved
+            self.__index_file = open(self.__path / INDEX_FILE, 'a', encoding='utf-8', buffering=1)
+
+        data = compress(line, self.__compression)
+        row = {_: record.get(_) for _ in INDEX_FIELDS}
+        row.update({
+            'shard': self.shard_name,
+            'offset': self.__shard_file.tell(),
+            'length': len(data),
+            'doc_length': len(record['doc']) if record.get('doc') is not None else 0,
+        })
+        self.__shard_file.write(data)
+        self.__index_file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return row
+
+    def write(self, record: dict) -> dict:
+        """Append a record to the dataset
+
+        :param record: dict the record
+        :return: dict the record's index row
+        """
+        return self.write_line((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'), record)
+
+    def flush(self, sync: bool = False) -> None:
+        for _ in (self.__shard_file, self.__index_file):
+            if _ is not None:
+                _.flush()
+                if sync:
+                    os.fsync(_.fileno())
+
+    def clear(self) -> None:
+        """Remove the shards of this writer and their index rows, to be called before rebuilding the dataset
+
+        The shards and index rows of the other writers sharing the dataset directory are kept.
+        """
+        self.close()
+        for _ in self.shards():
+            _.unlink(missing_ok=True)
+        self.__shard = 0
+        index = self.__path / INDEX_FILE
+        if not index.exists():
+            return
+        with open(index, encoding='utf-8') as _:
+            rows = [line for line in _ if line.strip() and not self.is_shard(json.loads(line)['shard'])]
+        if not rows:
+            index.unlink()
+            return
+        with open(index.with_suffix('.tmp'), 'w', encoding='utf-8') as _:
+            _.writelines(rows)
+        os.replace(index.with_suffix('.tmp'), index)
+
+    def close(self) -> None:
+        self.flush(sync=True)
+        for _ in (self.__shard_file, self.__index_file):
+            if _ is not None:
+                _.close()
+        self.__shard_file, self.__index_file = None, None
+
+
+class ShardedDatasetReader:
+    """Reader of a dataset written by ShardedDatasetWriter
+
+    The corpus is listed from the index sidecar without decompressing any document, and each document is read by
+    seeking straight to its compressed record.
+
+    :param path: str path of the dataset directory
+    """
+
+    __path: Path
+
+    def __init__(self, path: str):
+        self.__path = Path(path)
+
+    @staticmethod
+    def get_compression(shard: str) -> str:
+        return [k for k, v in SHARD_SUFFIXES.items() if shard.endswith(v)][0]
+
+    def index(self) -> Iterator[dict]:
+        """Iterate over the index rows of the documents"""
+        with open(self.__path / INDEX_FILE, 'r', encoding='utf-8') as _:
+            for line in _:
+                if line.strip():
+                    yield json.loads(line)
+
+    def read(self, row: dict) -> dict:
+        """Read a single document
+
+        :param row: dict the document's index row
+        :return: dict the document record
+        """
+        with open(self.__path / row['shard'], 'rb') as _:
+            _.seek(row['offset'])
+            data = _.read(row['length'])
+        return json.loads(decompress(data, self.get_compression(row['shard'])))
+
+    def __iter__(self) -> Iterator[dict]:
+        """Iterate over every document, in index order"""
+        for row in self.index():
+            yield self.read(row)
@@ -0,0 +1,113 @@
+import json
+import logging
+import sqlite3
+import time
+
+from pathlib import Path
+
+import httpx
+
+from src.data_crawler.constants import LOGGER_NAME, VALIDATOR_STORE_PATH
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS validators (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    result TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class ValidatorStore:
+    """HTTP validators store for conditional requests
+
+    Keeps the ETag and Last-Modified validators of each crawled url together with the result its consumer produced.
+    Once installed on an AsyncClient, requests to those urls are sent with If-None-Match and If-Modified-Since headers,
+    so unchanged pages come back as small 304 responses whose stored result is reused. The validators of the streamed
+    downloads are not stored: their result holds no document to reuse, and the crawl state skips the documents already
+    completed instead.
+
+    :param path: str path of the SQLite database file
+    """
+
+    __path: str
+    __connection: sqlite3.Connection or None
+
+    def __init__(self, path: str = VALIDATOR_STORE_PATH):
+        self.__path = path
+        self.__connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            Path(self.__path).parent.mkdir(parents=True, exist_ok=True)
+            self.__connection = sqlite3.connect(self.__path, timeout=30)
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+            self.__connection.executescript(SCHEMA)
+        return self.__connection
+
+    @staticmethod
+    def key(url: str or httpx.URL) -> str:
+        return str(httpx.URL(str(url)))
+
+    def install(self, client: httpx.AsyncClient) -> None:
+        """Add the conditional headers hook to the client's request event hooks"""
+        client.event_hooks['request'] = client.event_hooks['request'] + [self.add_conditional_headers]
+
+    async def add_conditional_headers(self, request: httpx.Request) -> None:
+        """AsyncClient request event hook adding the stored validators of the request's url"""
+        if request.method != 'GET':
+            return
+        row = self.connection.execute(
+            'SELECT etag, last_modified FROM validators WHERE url = ?', (self.key(request.url),)
+        ).fetchone()
+        if row is None:
+            return
+        etag, last_modified = row
+        if etag and 'If-None-Match' not in request.headers:
+            request.headers['If-None-Match'] = etag
+        if last_modified and 'If-Modified-Since' not in request.headers:
+            request.headers['If-Modified-Since'] = last_modified
+
+    def save(self, url: str, headers: httpx.Headers, result: dict) -> bool:
+        """Store the validators of a response together with its consumer result
+
+        :param url: str url of the request
+        :param headers: httpx.Headers response headers
+        :param result: dict serialized consumer result
+        :return: bool whether the response had any validators to store
+        """
+        etag, last_modified = headers.get('ETag'), headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return False
+        with self.connection as _:
+            _.execute(
+                'INSERT OR REPLACE INTO validators (url, etag, last_modified, result, updated_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (self.key(url), etag, last_modified, json.dumps(result, default=str), time.time())
+            )
+        return True
+
+    def get_result(self, url: str) -> dict or None:
+        """Get the stored consumer result of a url
+
+        :param url: str url of the request
+        :return: dict or None the serialized consumer result
+        """
+        row = self.connection.execute('SELECT result FROM validators WHERE url = ?', (self.key(url),)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def remove(self, url: str) -> None:
+        """Forget the validators and the stored consumer result of a url, so it is requested unconditionally"""
+        with self.connection as _:
+            _.execute('DELETE FROM validators WHERE url = ?', (self.key(url),))
+
+    def close(self) -> None:
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
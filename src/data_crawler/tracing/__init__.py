@@ -0,0 +1,8 @@
+from .tracer import Tracer, Trace, Span
+
+
+# Request lifecycle tracer shared by the whole crawler, disabled until started
+tracer = Tracer()
+
+
+__all__ = ['Span', 'Trace', 'Tracer', 'tracer']
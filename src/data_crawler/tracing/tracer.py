@@ -0,0 +1,267 @@
+import itertools
+import json
+import logging
+import os
+import random
+import time
+
+from pathlib import Path
+
+from src.data_crawler.constants import LOGGER_NAME, TRACE_PATH, TRACE_SAMPLE_RATE, TRACE_BUFFER_SIZE
+
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class Trace:
+    """Lifecycle of a sampled ScrapeRequest and of its ScrapeResponse
+
+    Shown as its own row of the timeline, named after the request's url. Redirects and retries of the request keep its
+    trace.
+
+    :param trace_id: int id of the trace, the thread id of its events
+    :param name: str name of the trace's row
+    """
+
+    __id: int
+    __name: str
+    __named: bool
+    __marked: float
+
+    def __init__(self, trace_id: int, name: str):
+        self.__id = trace_id
+        self.__name = name
+        self.__named = False
+        self.__marked = time.perf_counter()
+
+    @property
+    def id(self) -> int:
+        return self.__id
+
+    @property
+    def name(self) -> str:
+        return self.__name
+
+    @property
+    def named(self) -> bool:
+        """named: bool whether the name of the trace's row was written"""
+        return self.__named
+
+    @named.setter
+    def named(self, value: bool) -> None:
+        self.__named = value
+
+    @property
+    def marked(self) -> float:
+        """marked: float perf_counter time the trace's item was last queued"""
+        return self.__marked
+
+    def mark(self) -> None:
+        self.__marked = time.perf_counter()
+
+
+class Span:
+    """Stage of a trace, recorded as a complete event once ended
+
+    Used as a context manager around the stage, or started and ended explicitly for stages ending in a callback.
+    """
+
+    __tracer: 'Tracer'
+    __trace: Trace
+    __name: str
+    __args: dict
+    __start: float or None
+
+    def __init__(self, tracer: 'Tracer', trace: Trace, name: str, args: dict):
+        self.__tracer = tracer
+        self.__trace = trace
+        self.__name = name
+        self.__args = args
+        self.__start = None
+
+    def start(self) -> 'Span':
+        self.__start = time.perf_counter()
+        return self
+
+    def end(self, **args) -> None:
+        if self.__start is not None:
+            self.__tracer.record(self.__trace, self.__name, self.__start, time.perf_counter(), {**self.__args, **args})
+            self.__start = None
+
+    def __enter__(self) -> 'Span':
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end(**({'error': exc_type.__name__} if exc_type is not None else {}))
+
+
+class NullSpan:
+    """Span of the requests that aren't traced, doing nothing"""
+
+    def start(self) -> 'NullSpan':
+        return self
+
+    def end(self, **args) -> None:
+        pass
+
+    def __enter__(self) -> 'NullSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    """Span tracer of the requests' lifecycle, disabled until started
+
+    Follows a sample of the ScrapeRequests, and their ScrapeResponses, through the crawler's stages: waiting in the
+    queues, waiting for the politeness rules, the network, the consumer functions, the PDF conversion and the output
+    writer. The spans are written in the Chrome trace event format, to be opened with chrome://tracing or Perfetto,
+    each sampled request on its own row. Events are buffered and appended to the file in batches, the array being left
+    open until the tracer stops, which the trace viewers accept, so the trace of an interrupted crawl can be opened too.
+
+    Every tracing method takes the trace of the item, None for the items that aren't sampled, for which they do nothing.
+    """
+
+    __path: str or None
+    __sample_rate: float
+    __buffer_size: int
+    __random: random.Random
+    __ids: itertools.count
+    __origin: float
+    __pid: int
+    __events: list[dict]
+    __written: int
+
+    def __init__(self):
+        self.__path = None
+        self.__sample_rate = 0
+        self.__buffer_size = TRACE_BUFFER_SIZE
+        self.__random = random.Random()
+        self.__ids = itertools.count(1)
+        self.__origin = time.perf_counter()
+        self.__pid = os.getpid()
+        self.__events = []
+        self.__written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.__path is not None
+
+    @property
+    def path(self) -> str or None:
+        return self.__path
+
+    def start(
+            self,
+            path: str = TRACE_PATH,
+            sample_rate: float = TRACE_SAMPLE_RATE,
+            buffer_size: int = TRACE_BUFFER_SIZE
+    ) -> None:
+        """Start tracing, replacing the trace file
+
+        :param path: str path of the trace file
+        :param sample_rate: float share of the requests to trace, between 0 and 1
+        :param buffer_size: int number of events buffered before they are appended to the file
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as _:
+            _.write('[')
+        self.__path = path
+        self.__sample_rate = sample_rate
+        self.__buffer_size = buffer_size
+        self.__origin = time.perf_counter()
+        self.__events = []
+        self.__written = 0
+        logger.info(f'Tracing {sample_rate:.1%} of the requests into {path}.')
+
+    def trace(self, name: str) -> Trace or None:
+        """Sample a new trace
+
+        :param name: str name of the trace's row, the request's url
+        :return: Trace or None the trace, None if tracing is disabled or the request isn't sampled
+        """
+        if self.__path is None or self.__random.random() >= self.__sample_rate:
+            return None
+        return Trace(next(self.__ids), name)
+
+    def timestamp(self, perf_counter: float) -> float:
+        """Microseconds since the tracer started"""
+        return round((perf_counter - self.__origin) * 1e6, 1)
+
+    def event(self, trace: Trace, event: dict) -> None:
+        if self.__path is None:
+            return
+        if not trace.named:
+            trace.named = True
+            self.__events.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': self.__pid, 'tid': trace.id, 'args': {'name': trace.name}
+            })
+        self.__events.append({**event, 'cat': 'crawler', 'pid': self.__pid, 'tid': trace.id})
+        if len(self.__events) >= self.__buffer_size:
+            self.flush()
+
+    def record(self, trace: Trace, name: str, start: float, end: float, args: dict or None = None) -> None:
+        """Record a complete event of a trace, between two perf_counter times"""
+        self.event(trace, {
+            'name': name, 'ph': 'X', 'ts': self.timestamp(start), 'dur': round((end - start) * 1e6, 1),
+            'args': args or {}
+        })
+
+    def span(self, trace: Trace or None, name: str, **args) -> Span or NullSpan:
+        """Span of a stage of a trace
+
+        :param trace: Trace or None trace of the item
+        :param name: str name of the stage
+        :param args: arguments shown with the span
+        :return: Span or NullSpan the span, to be used as a context manager or started and ended
+        """
+        if trace is None or self.__path is None:
+            return NULL_SPAN
+        return Span(self, trace, name, args)
+
+    def mark(self, trace: Trace or None) -> None:
+        """Mark the item of a trace as queued"""
+        if trace is not None:
+            trace.mark()
+
+    def wait(self, trace: Trace or None, name: str, **args) -> None:
+        """Record the time the item of a trace waited since it was queued, once it is taken from the queue"""
+        if trace is not None:
+            now = time.perf_counter()
+            self.record(trace, name, trace.marked, now, args)
+            trace.mark()
+
+    def instant(self, trace: Trace or None, name: str, **args) -> None:
+        """Record an instant event of a trace, such as a redirect or a retry"""
+        if trace is not None:
+            self.event(trace, {
+                'name': name, 'ph': 'i', 's': 't', 'ts': self.timestamp(time.perf_counter()), 'args': args
+            })
+
+    def flush(self) -> None:
+        """Append the buffered events to the trace file"""
+        if self.__path is None or not self.__events:
+            return
+        lines = [('\n' if self.__written + i == 0 else ',\n') + json.dumps(_, default=str)
+                 for i, _ in enumerate(self.__events)]
+        try:
+            with open(self.__path, 'a') as _:
+                _.write(''.join(lines))
+            self.__written += len(self.__events)
+        except OSError as e:
+            logger.warning(f'Failed to write {len(self.__events)} trace events: {e}')
+        self.__events = []
+
+    def stop(self) -> None:
+        """Write the buffered events and close the trace file's array, disabling the tracer"""
+        if self.__path is None:
+            return
+        self.flush()
+        with open(self.__path, 'a') as _:
+            _.write('\n]\n')
+        logger.info(f'Wrote {self.__written} trace events into {self.__path}.')
+        self.__path = None
@@ -6,6 +6,9 @@ from sys import getsizeof
 from pathlib import Path
 from tabulate import tabulate
 
+from src.data_crawler.constants import DATA_JSONL_PATH, DATASET_DIR
+from src.data_crawler.storage import ShardedDatasetReader
+
 
 Path('./out/data-insight').mkdir(parents=True, exist_ok=True)
 
@@ -32,11 +35,17 @@ def print_section(title: str, printable) -> None:
 def main():
     print('Getting insight from data-crawler output...')
     rows = []
-    with jsonlines.open('./out/data-crawler/data.jsonl') as reader:
-        for line in reader:
-            line['doc_size'] = getsizeof(line['doc'])
-            line.pop('doc')
-            rows.append(line)
+    if Path(DATASET_DIR, 'index.jsonl').exists():
+        # Sharded dataset, the documents are listed from the index without decompressing them
+        for row in ShardedDatasetReader(DATASET_DIR).index():
+            row['doc_size'] = row['doc_length']
+            rows.append(row)
+    else:
+        with jsonlines.open(DATA_JSONL_PATH) as reader:
+            for line in reader:
+                line['doc_size'] = getsizeof(line['doc'])
+                line.pop('doc')
+                rows.append(line)
     df = pd.DataFrame(columns=['ticker', 'title', 'document_type', 'year', 'doc_size'], data=rows)
     df['title'] = df['title'].apply(lambda s: s.upper())
     # df['ticker'] = df['ticker'].apply(lambda s: s.replace('.', ' ').strip())
@@ -16,12 +16,15 @@ from src.summarization.models import load_model
 from src.summarization.document import Document
 from src.summarization.pipelines import refine, map_reduce
 from src.summarization.constants import CHUNK_SIZE, CHUNK_OVERLAP, PIPELINES
+from src.data_crawler.storage import ShardedDatasetReader
 
 BOOLEAN_TRUE_VALUES = (1, 1.0, '1', '1.0', 'true', 'yes', 'y', 'on')
 DATA_PATH = './data/'
 RESPONSES_FILE = 'experiment_responses.jsonl'
 COMMENTS_FILE = 'experiment_comments.jsonl'
 DOCUMENTS_FILE = 'documents.jsonl'
+DATASET_DIR = 'documents'   # sharded dataset written by pdf_converter --compression
+INDEX_LOCATION_FIELDS = ('shard', 'offset', 'length', 'doc_length')
 
 Path(DATA_PATH).mkdir(parents=True, exist_ok=True)
 Path(DATA_PATH + RESPONSES_FILE).touch()
@@ -57,8 +60,24 @@ app.add_middleware(
 )
 
 
+def get_dataset_reader() -> ShardedDatasetReader or None:
+    """Get a reader of the sharded dataset, None if the documents are in the documents.jsonl file"""
+    if not Path(DATA_PATH, DATASET_DIR, 'index.jsonl').exists():
+        return None
+    return ShardedDatasetReader(DATA_PATH + DATASET_DIR)
+
+
 def load_document_from_dataset(title: str, ticker: str, document_type: str, year: str) -> dict:
     doc = None
+    dataset = get_dataset_reader()
+    if dataset is not None:
+        # Found from the index, only the document itself is decompressed
+        for row in dataset.index():
+            if row['title'] == title and row['ticker'] == ticker \
+                    and row['document_type'] == document_type and year == str(row['year']):
+                doc = dataset.read(row)
+                break
+        return doc
     with jsonlines.open(DATA_PATH + DOCUMENTS_FILE) as reader:
         for line in reader:
             if line['title'] == title and line['ticker'] == ticker \
@@ -81,6 +100,12 @@ def load_experiment_from_file(uuid: str) -> dict:
 @app.get("/documents")
 def documents():
     docs = []
+    dataset = get_dataset_reader()
+    if dataset is not None:
+        # Listed from the index without decompressing any document
+        for _ in dataset.index():
+            docs.append({k: v for k, v in _.items() if k not in INDEX_LOCATION_FIELDS})
+        return docs
     with jsonlines.open(DATA_PATH + DOCUMENTS_FILE) as r:
         for _ in r:
             # line['preview'] = line.pop('doc')[:100]
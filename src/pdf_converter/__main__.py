@@ -1,14 +1,16 @@
 import jsonlines
 import httpx
-import pymupdf
-import pymupdf4llm
 import asyncio
 
 from pathlib import Path
-from io import BytesIO
 
 from src.pdf_converter.cli import get_args
+from src.data_crawler.constants import (
+    NO_CONVERSION_WORKERS, PAGE_RANGE_MIN_PAGES, CONVERSION_PROFILE, PAGE_TRIAGE
+)
+from src.data_crawler.conversion import ConversionPool, get_content_hash
 from src.data_crawler.scrape_requests import ScrapeResponse
+from src.data_crawler.storage import ShardedDatasetWriter, ConversionCache
 
 DEFAULT_OUTPUT_PATH = './data'
 
@@ -21,20 +23,32 @@ async def main(
         year: str,
         output_path: str = DEFAULT_OUTPUT_PATH,
         remote: bool = False,
+        compression: str or None = None,
+        workers: int = NO_CONVERSION_WORKERS,
+        split_pages: int or None = PAGE_RANGE_MIN_PAGES,
+        conversion_profile: str = CONVERSION_PROFILE,
+        triage: bool = PAGE_TRIAGE,
 ):
     data: bytes
     metadata: dict
 
     Path(output_path).mkdir(parents=True, exist_ok=True)
 
-    if not remote:
-        doc = pymupdf.open(path)
-    else:
-        response = httpx.get(path)
-        byte_stream = BytesIO(response.content)
-        doc = pymupdf.open(stream=byte_stream)
+    source = path if not remote else httpx.get(path).content
 
-    md_text = pymupdf4llm.to_markdown(doc)
+    # Large documents are split into page ranges converted in parallel by the worker processes, documents converted
+    # before by the crawler or an earlier run are taken from the conversion cache
+    conversion_cache = ConversionCache()
+    conversion_pool = ConversionPool(
+        workers, split_pages=split_pages, profile=conversion_profile, triage=triage, cache=conversion_cache
+    )
+    try:
+        digest = await asyncio.to_thread(get_content_hash, source)
+        page_triage = await conversion_pool.triage_pages(source, digest)     # None unless the pages are triaged
+        md_text = await conversion_pool.convert(source, path, page_triage['pages'] if page_triage else None, digest)
+    finally:
+        conversion_pool.shutdown()
+        conversion_cache.close()
 
     data = md_text.encode()
     metadata = {  # Build metadata
@@ -50,6 +64,17 @@ async def main(
     }
 
     response = ScrapeResponse(metadata=metadata, data=data)
+    jsonline = {**await response.jsonl(), 'conversion': conversion_profile}
+    if page_triage is not None:
+        jsonline['pages'] = page_triage['stats']
+
+    if compression is not None:
+        dataset = ShardedDatasetWriter(str(Path(output_path) / 'documents'), compression=compression)
+        try:
+            dataset.write(jsonline)
+        finally:
+            dataset.close()
+        return
 
     output_file = 'documents.jsonl'
 
@@ -57,7 +82,7 @@ async def main(
         output_file = '/' + output_file
 
     with jsonlines.open(output_path + output_file, 'a') as _:
-        _.write(await response.jsonl())
+        _.write(jsonline)
 
 
 if __name__ == '__main__':
@@ -70,6 +95,11 @@ if __name__ == '__main__':
             args.document_type,
             args.year,
             output_path=args.output,
-            remote=args.remote
+            remote=args.remote,
+            compression=args.compression,
+            workers=args.workers,
+            split_pages=args.split_pages or None,
+            conversion_profile=args.conversion,
+            triage=not args.keep_all_pages
         )
     )
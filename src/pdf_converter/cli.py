@@ -1,5 +1,9 @@
 import argparse
 
+from src.data_crawler.constants import (
+    NO_CONVERSION_WORKERS, PAGE_RANGE_MIN_PAGES, CONVERSION_PROFILES, CONVERSION_PROFILE
+)
+
 
 def get_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description='')
@@ -41,4 +45,36 @@ def get_args() -> argparse.Namespace:
         action='store_true',
         help='Whether or not the path belongs to a remote file url.',
     )
+    parser.add_argument(
+        '--compression',
+        choices=['gzip', 'zstd'],
+        help='Append the document to a sharded dataset of compressed shards, placed in the documents directory of the '
+             'output path, instead of the documents.jsonl file.',
+        default=None
+    )
+    parser.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        help='Number of conversion worker processes, defaults to the number of available cores.',
+        default=NO_CONVERSION_WORKERS
+    )
+    parser.add_argument(
+        '--split-pages',
+        type=int,
+        help='Minimum number of pages of the documents split into page ranges converted in parallel by the workers, '
+             '0 to convert the document as a whole.',
+        default=PAGE_RANGE_MIN_PAGES
+    )
+    parser.add_argument(
+        '--conversion',
+        choices=CONVERSION_PROFILES,
+        help='Convert the file into plain text, text with markdown headings, or markdown with tables, the slowest.',
+        default=CONVERSION_PROFILE
+    )
+    parser.add_argument(
+        '--keep-all-pages',
+        action='store_true',
+        help='Convert every page of the file, instead of skipping its blank, image-only and boilerplate pages.',
+    )
     return parser.parse_args()
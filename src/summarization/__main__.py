@@ -2,6 +2,7 @@ import logging
 
 import jsonlines
 
+from pathlib import Path
 from load_dotenv import load_dotenv
 from langchain_text_splitters.markdown import MarkdownTextSplitter
 
@@ -10,6 +11,8 @@ from src.summarization.document import Document
 from src.summarization.pipelines import refine, map_reduce
 from src.summarization.constants import CHUNK_SIZE, CHUNK_OVERLAP, MODELS, PIPELINES
 from src.summarization.cli import get_args
+from src.data_crawler.constants import DATASET_DIR
+from src.data_crawler.storage import ShardedDatasetReader
 
 
 logging.basicConfig(
@@ -36,13 +39,18 @@ if __name__ == "__main__":
 
     # Load first document in dataset
     doc: Document or None = None
-    with jsonlines.open('./out/pdf_converter/file.jsonl') as f:
-        for line in f:
-            if line['document_type'] != 'annual_report':
-                continue
-            doc = Document(line)
-            logging.info(f'Loaded document: {line["title"]} {line["document_type"]} {line["year"]}')
-            break
+    line: dict or None = None
+    if Path(DATASET_DIR, 'index.jsonl').exists():
+        # Sharded dataset, the document is found from the index and only it is decompressed
+        reader = ShardedDatasetReader(DATASET_DIR)
+        row = next((_ for _ in reader.index() if _['document_type'] == 'annual_report'), None)
+        line = reader.read(row) if row is not None else None
+    else:
+        with jsonlines.open('./out/pdf_converter/file.jsonl') as f:
+            line = next((_ for _ in f if _['document_type'] == 'annual_report'), None)
+    if line is not None:
+        doc = Document(line)
+        logging.info(f'Loaded document: {line["title"]} {line["document_type"]} {line["year"]}')
 
     if not doc:
         logging.error('No Document found on datasource.')
@@ -0,0 +1,97 @@
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+
+from typing import Callable
+
+
+def run_benchmark(name: str, function: Callable[[], any], rounds: int = 50, warmup: int = 5) -> dict:
+    """Time a function over several rounds and measure its memory allocations
+
+    Every round is a single call. Allocations are measured on a separate traced call, so tracing doesn't slow down the
+    timed rounds.
+
+    :param name: str benchmark name
+    :param function: Callable function to benchmark, called without arguments
+    :param rounds: int number of timed calls
+    :param warmup: int number of untimed calls made first
+    :return: dict with the timings in seconds, the calls per second and the allocated memory of a single call
+    """
+    for _ in range(warmup):
+        function()
+
+    gc.collect()
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    timings = []
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        function()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    allocations = [_ for _ in after.compare_to(before, 'lineno') if _.size_diff > 0]
+
+    mean = statistics.mean(timings)
+    return {
+        'name': name,
+        'rounds': rounds,
+        'mean': mean,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'stddev': statistics.stdev(timings) if len(timings) > 1 else 0,
+        'ops': 1 / mean if mean else float('inf'),
+        'allocated_bytes': sum(_.size_diff for _ in allocations),
+        'allocations': sum(_.count_diff for _ in allocations),
+        'peak_bytes': peak,
+    }
+
+
+def format_results(results: list[dict], unit: str = 'pages') -> str:
+    """Render benchmark results as a text table"""
+    header = f'{"name":<50} {"mean (ms)":>10} {"min (ms)":>10} {unit + "/s":>10} {"alloc (KiB)":>12} {"peak (KiB)":>11}'
+    lines = [header, '-' * len(header)]
+    for _ in results:
+        lines.append(
+            f'{_["name"]:<50} {_["mean"] * 1000:>10.3f} {_["min"] * 1000:>10.3f} {_["ops"]:>10.1f} '
+            f'{_["allocated_bytes"] / 1024:>12.1f} {_["peak_bytes"] / 1024:>11.1f}'
+        )
+    return '\n'.join(lines)
+
+
+def compare_results(results: list[dict], baseline_path: str, tolerance: float = 0.2) -> list[str]:
+    """Compare benchmark results against a saved baseline
+
+    :param results: list[dict] benchmark results
+    :param baseline_path: str path of a JSON file with baseline results, as saved with save_results
+    :param tolerance: float relative slowdown of the mean time allowed before reporting a regression
+    :return: list[str] description of the regressions, empty if there are none
+    """
+    with open(baseline_path, 'r') as _:
+        baseline = {b['name']: b for b in json.load(_)}
+    regressions = []
+    for result in results:
+        if result['name'] in baseline and result['mean'] > baseline[result['name']]['mean'] * (1 + tolerance):
+            regressions.append(
+                f'{result["name"]}: {result["mean"] * 1000:.3f}ms vs {baseline[result["name"]]["mean"] * 1000:.3f}ms '
+                f'baseline'
+            )
+    return regressions
+
+
+def save_results(results: list[dict], path: str) -> None:
+    with open(path, 'w') as _:
+        json.dump(results, _, indent=2)
@@ -0,0 +1,342 @@
+"""Crawler throughput benchmark
+
+Runs the whole crawl, scrape_request_handler end to end, against simulated HL and AR sites served by an httpx
+MockTransport, and reports the requests and conversions per second, the peak memory and the CPU usage of the crawler
+and of its conversion workers. No request leaves the machine, so concurrency and politeness changes can be evaluated
+offline and at scale, e.g. 500 firms with 9 reports each on both sites for 10k requests:
+
+    python -m tests.benchmarks.crawler_benchmark [--firms 50] [--reports 4] [--latency 0.05] [--error-rate 0]
+        [--redirect-rate 0] [--crawl-delay 0] [--pdf-pages 2] [--pdf-hosts 1] [--workers 4] [--verbose]
+        [--save baseline.json] [--compare baseline.json]
+
+The crawl writes its output files into a temporary directory, removed once it finishes. Exits with status 1 if the
+crawl is slower than the compared baseline by more than the tolerance, or if some documents weren't converted.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import zlib
+
+import httpx
+import pymupdf
+
+from src.data_crawler.constants import DATA_SRC_URLS, HTTP_CLIENT_CONFIG, NO_CONVERSION_WORKERS, LOGGER_NAME
+from src.data_crawler.conversion import ConversionPool
+from src.data_crawler.parsers.ar_parse import parse_firms_detail_page
+from src.data_crawler.parsers.hl_parse import parse_financial_statements_and_reports
+from src.data_crawler.scrape_requests.handlers.scrape_request_handler import scrape_request_handler
+from tests.benchmarks.benchmark import compare_results, save_results
+
+
+HL_FIRM_PAGE = """<html>
+<head>
+<meta name="Share_Title" content="Firm {firm} plc"/>
+<meta name="Share_EPIC" content="F{firm}"/>
+<meta name="Share_Identifier" content="F{firm}"/>
+</head>
+<body>
+<div id="financials-table-wrapper"><table><tr><th>Revenue</th><td>{firm}00</td></tr></table></div>
+<div class="margin-top tab-content clearfix"><div class="grey-gradient clearfix">{links}</div></div>
+</body>
+</html>"""
+
+HL_REPORT_LINK = '<a href="{url}">Annual Report &amp; Accounts {year} Download</a>'
+
+AR_FIRM_PAGE = """<html>
+<body>
+<div class="left_section"><div class="vendor_name"><h1>Firm {firm} plc</h1></div></div>
+<span class="ticker_name">F{firm}</span>
+<div class="archived_report_content_block"><ul>{reports}</ul></div>
+</body>
+</html>"""
+
+AR_REPORT = ('<li><div><span class="heading">{year} Annual Report</span>'
+             '<span class="btn_archived download"><a href="{path}">Download</a></span></div></li>')
+
+
+def build_pdf(pages: int) -> bytes:
+    """Build a synthetic annual report with a header and a few paragraphs on each page"""
+    document = pymupdf.open()
+    for i in range(pages):
+        page = document.new_page()
+        page.insert_text((72, 96), f'Section {i + 1}', fontsize=20)
+        page.insert_textbox(
+            pymupdf.Rect(72, 120, 520, 760), 'Revenue grew in every segment over the year. ' * 40, fontsize=11
+        )
+    content = document.tobytes()
+    document.close()
+    return content
+
+
+class SimulatedSite:
+    """Simulated HL and AR sites
+
+    Serves robots.txt files, the firms' HL financial statements pages and AR detail pages, and their annual reports as
+    synthetic PDFs, after a random latency. Failures and redirects are injected on a deterministic share of the urls:
+    failed urls answer with a 500 on their first request only, so the crawl completes once they are retried.
+
+    :param firms: int number of firms on each site
+    :param reports: int number of annual reports of each firm on each site
+    :param latency: float mean response latency in seconds, each response takes between half and 1.5 times as long
+    :param error_rate: float share of the urls failing on their first request
+    :param redirect_rate: float share of the report urls redirected to their actual location
+    :param crawl_delay: float Crawl-delay of the robots.txt files, in seconds
+    :param pdf_pages: int number of pages of the reports
+    :param pdf_hosts: int number of hosts the HL reports are spread across
+    :param seed: int seed of the latencies
+    """
+
+    __firms: int
+    __reports: int
+    __latency: float
+    __error_rate: float
+    __redirect_rate: float
+    __crawl_delay: float
+    __pdf_hosts: int
+    __pdf: bytes
+    __random: random.Random
+    __failed: set[str]
+    __served: dict[str, int]
+
+    def __init__(
+            self,
+            firms: int = 50,
+            reports: int = 4,
+            latency: float = 0.05,
+            error_rate: float = 0,
+            redirect_rate: float = 0,
+            crawl_delay: float = 0,
+            pdf_pages: int = 2,
+            pdf_hosts: int = 1,
+            seed: int = 0
+    ):
+        self.__firms = firms
+        self.__reports = reports
+        self.__latency = latency
+        self.__error_rate = error_rate
+        self.__redirect_rate = redirect_rate
+        self.__crawl_delay = crawl_delay
+        self.__pdf_hosts = max(1, pdf_hosts)
+        self.__pdf = build_pdf(pdf_pages)
+        self.__random = random.Random(seed)
+        self.__failed = set()
+        self.__served = {'robots': 0, 'pages': 0, 'reports': 0, 'redirects': 0, 'errors': 0, 'not_found': 0}
+
+    @property
+    def firms(self) -> int:
+        return self.__firms
+
+    @property
+    def reports(self) -> int:
+        return self.__reports
+
+    @property
+    def served(self) -> dict[str, int]:
+        """served: dict[str, int] number of responses served by kind"""
+        return self.__served.copy()
+
+    @property
+    def documents(self) -> int:
+        """documents: int number of annual reports across both sites"""
+        return 2 * self.firms * self.reports
+
+    def requests(self) -> list[dict[str, any]]:
+        """Get the crawl's initial requests, the firms' pages of both sites, as the stocks tables scrapers build them"""
+        requests = []
+        for firm in range(self.__firms):
+            hl_url = f'{DATA_SRC_URLS["hl-base"]}/shares/shares-search-results/f/firm-{firm}'
+            ar_url = f'{DATA_SRC_URLS["ar-base"]}/Company/firm-{firm}'
+            requests.extend([
+                {
+                    'metadata': {
+                        'url_append': DATA_SRC_URLS['hl-financial-statement-and-reports'],
+                        'url': hl_url,
+                        'method': 'GET'
+                    },
+                    'method': 'GET', 'url': hl_url, 'consumer': parse_financial_statements_and_reports
+                },
+                {
+                    'metadata': {'url': ar_url, 'method': 'GET'},
+                    'method': 'GET', 'url': ar_url, 'consumer': parse_firms_detail_page
+                },
+            ])
+        return requests
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    @staticmethod
+    def is_sampled(url: str, rate: float, salt: str) -> bool:
+        """Whether a url is part of the given share of the urls, the same ones on every run"""
+        return zlib.crc32(f'{salt}{url}'.encode()) / 2 ** 32 < rate
+
+    def hl_report_url(self, firm: int, year: int) -> str:
+        host = 'www.hl.co.uk' if self.__pdf_hosts == 1 else f'files{(firm + year) % self.__pdf_hosts}.hl.co.uk'
+        return f'https://{host}/reports/firm-{firm}/{year}.pdf'
+
+    def get_hl_page(self, firm: int) -> str:
+        years = range(2023, 2023 - self.__reports, -1)
+        links = ''.join([HL_REPORT_LINK.format(url=self.hl_report_url(firm, _), year=_) for _ in years])
+        return HL_FIRM_PAGE.format(firm=firm, links=links)
+
+    def get_ar_page(self, firm: int) -> str:
+        years = range(2023, 2023 - self.__reports, -1)
+        reports = ''.join([
+            AR_REPORT.format(year=_, path=f'/HostedData/AnnualReports/PDF/firm-{firm}-{_}.pdf') for _ in years
+        ])
+        return AR_FIRM_PAGE.format(firm=firm, reports=reports)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        url, path = str(request.url), request.url.path
+        if path == '/robots.txt':
+            self.__served['robots'] += 1
+            return httpx.Response(200, text=f'User-agent: *\nCrawl-delay: {self.__crawl_delay}\n')
+
+        await asyncio.sleep(self.__latency * self.__random.uniform(0.5, 1.5))
+        if url not in self.__failed and self.is_sampled(url, self.__error_rate, 'error'):
+            self.__failed.add(url)
+            self.__served['errors'] += 1
+            return httpx.Response(500, text='Internal Server Error')
+
+        if path.endswith('.pdf'):
+            if not request.url.query and self.is_sampled(url, self.__redirect_rate, 'redirect'):
+                self.__served['redirects'] += 1
+                return httpx.Response(301, headers={'Location': f'{path}?v=1'})
+            self.__served['reports'] += 1
+            return httpx.Response(200, headers={'Content-Type': 'application/pdf'}, content=self.__pdf)
+
+        firm = path.split('/firm-')[-1].split('/')[0]
+        if firm.isdigit() and path.endswith(DATA_SRC_URLS['hl-financial-statement-and-reports']):
+            self.__served['pages'] += 1
+            return httpx.Response(200, text=self.get_hl_page(int(firm)))
+        if firm.isdigit() and path.startswith('/Company/'):
+            self.__served['pages'] += 1
+            return httpx.Response(200, text=self.get_ar_page(int(firm)))
+
+        self.__served['not_found'] += 1
+        return httpx.Response(404, text='Not Found')
+
+
+def get_usage() -> tuple[resource.struct_rusage, resource.struct_rusage]:
+    return resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+
+
+async def run_crawl(site: SimulatedSite, workers: int = NO_CONVERSION_WORKERS, autoscale: bool = True) -> dict:
+    """Crawl the simulated site and measure the crawl
+
+    :param site: SimulatedSite site to crawl
+    :param workers: int number of conversion worker processes
+    :param autoscale: bool whether the consumer pools are autoscaled
+    :return: dict with the crawl time, the requests and conversions per second, the peak memory and the CPU usage
+    """
+    client = httpx.AsyncClient(**HTTP_CLIENT_CONFIG, transport=site.transport())
+    conversion_pool = ConversionPool(workers)
+    before = get_usage()
+    start = time.perf_counter()
+    try:
+        await scrape_request_handler(site.requests(), client, conversion_pool=conversion_pool, autoscale=autoscale)
+    finally:
+        await client.aclose()
+    elapsed = time.perf_counter() - start
+    after = get_usage()     # the conversion workers are shut down by the handler, so their usage is accounted for
+
+    served = site.served
+    requests = sum(served.values())
+    converted = conversion_pool.stats()['converted']
+    cpu = [(a.ru_utime + a.ru_stime) - (b.ru_utime + b.ru_stime) for a, b in zip(after, before)]
+    return {
+        'name': f'crawl {site.firms} firms x {site.reports} reports',
+        'time': elapsed,
+        'mean': elapsed / max(1, requests),     # seconds per request, compared against the baselines
+        'requests': requests,
+        'served': served,
+        'documents': site.documents,
+        'converted': converted,
+        'requests_per_second': requests / elapsed,
+        'conversions_per_second': converted / elapsed,
+        'peak_rss_bytes': after[0].ru_maxrss * 1024,
+        'peak_worker_rss_bytes': after[1].ru_maxrss * 1024,
+        'cpu_seconds': cpu[0],
+        'worker_cpu_seconds': cpu[1],
+        'cpu_utilization': cpu[0] / elapsed,
+        'worker_cpu_utilization': cpu[1] / elapsed,
+    }
+
+
+def format_result(result: dict) -> str:
+    """Render a crawl benchmark result as text"""
+    served = ', '.join([f'{k} {v}' for k, v in result['served'].items()])
+    return '\n'.join([
+        f'{"time":<24} {result["time"]:.2f}s',
+        f'{"requests":<24} {result["requests"]} ({served})',
+        f'{"documents":<24} {result["converted"]} converted of {result["documents"]}',
+        f'{"requests/s":<24} {result["requests_per_second"]:.1f}',
+        f'{"conversions/s":<24} {result["conversions_per_second"]:.1f}',
+        f'{"peak memory (MiB)":<24} {result["peak_rss_bytes"] / 1024 ** 2:.1f} crawler, '
+        f'{result["peak_worker_rss_bytes"] / 1024 ** 2:.1f} conversion worker',
+        f'{"CPU (s)":<24} {result["cpu_seconds"]:.2f} crawler ({result["cpu_utilization"]:.0%}), '
+        f'{result["worker_cpu_seconds"]:.2f} conversion workers ({result["worker_cpu_utilization"]:.0%})',
+    ])
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark the crawler against simulated HL and AR sites.')
+    parser.add_argument('--firms', type=int, default=50, help='Number of firms on each site.')
+    parser.add_argument('--reports', type=int, default=4, help='Number of annual reports of each firm.')
+    parser.add_argument('--latency', type=float, default=0.05, help='Mean response latency in seconds.')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of the urls failing on their first request.')
+    parser.add_argument('--redirect-rate', type=float, default=0, help='Share of the report urls redirected.')
+    parser.add_argument('--crawl-delay', type=float, default=0, help='Crawl-delay of the robots.txt files in seconds.')
+    parser.add_argument('--pdf-pages', type=int, default=2, help='Number of pages of the annual reports.')
+    parser.add_argument('--pdf-hosts', type=int, default=1, help='Number of hosts the HL reports are spread across.')
+    parser.add_argument('-w', '--workers', type=int, default=NO_CONVERSION_WORKERS, help='Conversion processes.')
+    parser.add_argument('--no-autoscale', action='store_true', help='Keep the consumer pools at their initial size.')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log the crawler warnings and errors.')
+    parser.add_argument('--save', help='Save the result as a JSON baseline to this path.')
+    parser.add_argument('--compare', help='Compare the result against a JSON baseline saved with --save.')
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2, help='Relative slowdown allowed against the baseline, 0.2 by default.'
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = get_args()
+    if not args.verbose:    # the injected failures are logged as errors by the consumers
+        logging.getLogger(LOGGER_NAME).setLevel(logging.CRITICAL)
+    site = SimulatedSite(
+        args.firms, args.reports, args.latency, args.error_rate, args.redirect_rate, args.crawl_delay, args.pdf_pages,
+        args.pdf_hosts
+    )
+    save, compare = [os.path.abspath(_) if _ else None for _ in (args.save, args.compare)]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)   # the crawler writes its output files relative to the working directory
+        try:
+            result = asyncio.run(run_crawl(site, args.workers, autoscale=not args.no_autoscale))
+        finally:
+            os.chdir(cwd)
+    print(format_result(result))
+
+    status = 0
+    if result['converted'] < result['documents']:
+        print(f'INCOMPLETE {result["documents"] - result["converted"]} documents were not converted')
+        status = 1
+    if save:
+        save_results([result], save)
+    if compare:
+        regressions = compare_results([result], compare, args.tolerance)
+        for _ in regressions:
+            print(f'REGRESSION {_}')
+        status = 1 if regressions else status
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""HL and AR parsers benchmark
+
+Parses the saved HL and AR fixture pages and reports the pages parsed per second and the memory allocated per page.
+
+    python -m tests.benchmarks.parsers_benchmark [--rounds 50] [--save baseline.json] [--compare baseline.json]
+
+Exits with status 1 if a parser is slower than the compared baseline by more than the tolerance.
+"""
+import argparse
+import sys
+
+from unittest.mock import MagicMock
+
+from src.data_crawler.scrape_requests import ScrapeResponse
+from src.data_crawler.parsers import hl_parse, ar_parse
+from tests.benchmarks.benchmark import run_benchmark, format_results, compare_results, save_results
+
+
+MOCKS_DIR = './tests/mocks/data_crawler'
+
+
+def read_mock(name: str) -> str:
+    with open(f'{MOCKS_DIR}/{name}.mock.html', 'r') as _:
+        return _.read()
+
+
+def get_response_mock(text: str) -> ScrapeResponse:
+    response = MagicMock(ScrapeResponse, metadata={})
+    response.request.response.text = text
+    response.url = 'http://test.url'
+    return response
+
+
+def get_benchmarks() -> dict[str, callable]:
+    """Get the parser benchmarks by name, each one parsing a single fixture page"""
+    hl_stocks_table = read_mock('hl-stocks-table')
+    ar_stocks_table = read_mock('ar-stocks-table')
+    hl_financial_statements = get_response_mock(read_mock('hl-financial-statements-abrdn'))
+    ar_firm_detail_page = get_response_mock(read_mock('ar-firm-detail-page-abrdn'))
+    client = MagicMock()
+    return {
+        'hl_parse.parse_stocks_table': lambda: hl_parse.parse_stocks_table(hl_stocks_table),
+        'hl_parse.parse_financial_statements_and_reports': lambda: hl_parse.parse_financial_statements_and_reports(
+            hl_financial_statements, client
+        ),
+        'ar_parse.parse_stocks_table': lambda: ar_parse.parse_stocks_table(ar_stocks_table),
+        'ar_parse.parse_firms_detail_page': lambda: ar_parse.parse_firms_detail_page(ar_firm_detail_page, client),
+    }
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Benchmark the HL and AR parsers over the saved fixture pages.')
+    parser.add_argument('--rounds', type=int, default=50, help='Number of timed parses of each page.')
+    parser.add_argument('--save', help='Save the results as a JSON baseline to this path.')
+    parser.add_argument('--compare', help='Compare the results against a JSON baseline saved with --save.')
+    parser.add_argument(
+        '--tolerance', type=float, default=0.2, help='Relative slowdown allowed against the baseline, 0.2 by default.'
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = get_args()
+    results = [run_benchmark(name, function, args.rounds) for name, function in get_benchmarks().items()]
+    print(format_results(results))
+    if args.save:
+        save_results(results, args.save)
+    if args.compare:
+        regressions = compare_results(results, args.compare, args.tolerance)
+        for _ in regressions:
+            print(f'REGRESSION {_}')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
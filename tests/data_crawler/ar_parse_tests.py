@@ -69,8 +69,8 @@ class ARParseFirmsDetailPageTest(unittest.TestCase):
         )
 
         # Assert
-        self.http_client_mock.request.assert_called()
-        self.assertTrue(10, self.http_client_mock.request.call_count)
+        self.http_client_mock.build_request.assert_called()
+        self.assertEqual(10, self.http_client_mock.build_request.call_count)
         self.assertTrue(len(further_requests) == 10)
         [self.assertTrue(type(r) is ScrapeRequest) for r in further_requests]
 
@@ -0,0 +1,129 @@
+import unittest
+import asyncio
+import logging
+
+from unittest import mock
+
+from src.data_crawler.constants import LOGGING_CONFIG
+from src.data_crawler.conversion import ConversionPool
+from src.data_crawler.politeness import HostScheduler
+from src.data_crawler.scrape_requests.handlers import AsyncTask
+from src.data_crawler.scrape_requests.handlers.autoscaler import ConsumerPool, ConsumerAutoscaler
+
+
+# Set up Logger
+logging.basicConfig(**LOGGING_CONFIG['testing'])
+logger = logging.getLogger('Autoscaler Tests')
+
+
+class SlowConsumer(AsyncTask):
+    """Consumer taking a while to process each item"""
+
+    processed: list
+
+    async def __call__(self) -> None:
+        while not self.retired:
+            item = await self.get_item(self.task_queue)
+            await asyncio.sleep(0.02)
+            self.processed.append(item)
+            self.task_queue.task_done()
+
+
+class ConsumerPoolTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.queue = asyncio.Queue()
+        self.processed = []
+
+    def get_consumer(self, task_id: int) -> SlowConsumer:
+        consumer = SlowConsumer(mock.Mock(), self.queue, None, task_id)
+        consumer.processed = self.processed
+        return consumer
+
+    async def test_resize(self):
+        pool = ConsumerPool('test', self.get_consumer, 4, min_size=2, max_size=6)
+        self.assertEqual(4, pool.size)
+        self.assertEqual(6, pool.resize(10))
+        await asyncio.sleep(0)
+        self.assertEqual(6, pool.idle)
+        self.assertEqual(2, pool.resize(0))
+        await asyncio.sleep(0)
+        self.assertEqual(2, pool.size)
+        pool.cancel()
+        self.assertEqual(0, pool.resize(4))
+
+    async def test_shrink_busy_consumers(self):
+        pool = ConsumerPool('test', self.get_consumer, 4, min_size=1, max_size=4)
+        [self.queue.put_nowait(_) for _ in range(10)]
+        await asyncio.sleep(0.01)
+        self.assertEqual(0, pool.idle)
+
+        pool.resize(1)     # every consumer is busy, the retired ones finish their item first
+        self.assertEqual(1, pool.size)
+        await asyncio.wait_for(self.queue.join(), 1)
+        self.assertEqual(list(range(10)), sorted(self.processed))
+        pool.cancel()
+
+    def tearDown(self):
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class ConsumerAutoscalerTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.task_queue = asyncio.Queue()
+        self.response_queue = asyncio.Queue()
+        self.scheduler = mock.Mock(HostScheduler, waiting=0)
+        self.scheduler.available_hosts.return_value = 1
+        self.conversion_pool = mock.Mock(ConversionPool, size=4, queue_depth=0, profile='markdown', triage=False)
+
+    def get_pool(self, size: int, idle: int) -> ConsumerPool:
+        return mock.Mock(ConsumerPool, size=size, idle=idle)
+
+    def get_autoscaler(self, request_pool: ConsumerPool, response_pool: ConsumerPool) -> ConsumerAutoscaler:
+        return ConsumerAutoscaler(
+            request_pool, response_pool, self.task_queue, self.response_queue, self.scheduler, self.conversion_pool,
+            step=5
+        )
+
+    async def test_request_pool(self):
+        autoscaler = self.get_autoscaler(self.get_pool(10, 0), self.get_pool(10, 0))
+        [self.task_queue.put_nowait(_) for _ in range(20)]
+        self.assertEqual(15, autoscaler.get_request_pool_size())   # backlog and free permits
+
+        self.scheduler.waiting = 8
+        self.assertEqual(10, autoscaler.get_request_pool_size())   # some hosts still grant permits
+        self.scheduler.available_hosts.return_value = 0
+        self.assertEqual(5, autoscaler.get_request_pool_size())    # every host is saturated
+
+        autoscaler = self.get_autoscaler(self.get_pool(10, 6), self.get_pool(10, 0))
+        self.scheduler.waiting = 0
+        while not self.task_queue.empty():
+            self.task_queue.get_nowait()
+        self.assertEqual(7, autoscaler.get_request_pool_size())    # idle consumers
+
+    async def test_response_pool(self):
+        autoscaler = self.get_autoscaler(self.get_pool(10, 0), self.get_pool(10, 0))
+        [self.response_queue.put_nowait(_) for _ in range(3)]
+        self.assertEqual(13, autoscaler.get_response_pool_size())  # backlog and free conversion workers
+
+        self.conversion_pool.queue_depth = 2
+        self.assertEqual(10, autoscaler.get_response_pool_size())  # conversion workers are busy
+        self.conversion_pool.queue_depth = 20
+        self.assertEqual(5, autoscaler.get_response_pool_size())   # conversion backlog
+
+    async def test_scale(self):
+        request_pool, response_pool = self.get_pool(10, 0), self.get_pool(10, 10)
+        autoscaler = self.get_autoscaler(request_pool, response_pool)
+        autoscaler.scale()
+        request_pool.resize.assert_not_called()
+        response_pool.resize.assert_called_once_with(5)
+
+    def tearDown(self):
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+if __name__ == '__main__':
+    unittest.main()
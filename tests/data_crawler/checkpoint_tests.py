@@ -0,0 +1,201 @@
+import unittest
+import asyncio
+import logging
+import os
+import tempfile
+import httpx
+import pypdf
+
+from unittest import mock
+from httpx import AsyncClient
+from io import BytesIO
+
+from src.data_crawler.constants import ASYNC_AWAIT_TIMEOUT, LOGGING_CONFIG
+from src.data_crawler.conversion import ConversionPool
+from src.data_crawler.parsers import parse_pdf_file
+from src.data_crawler.parsers.ar_parse import parse_firms_detail_page
+from src.data_crawler.scrape_requests import ScrapeRequest, ScrapeResponse
+from src.data_crawler.frontier import SqliteFrontier
+from src.data_crawler.scrape_requests.handlers import RetryQueue
+from src.data_crawler.scrape_requests.handlers.consumers import ScrapeRequestConsumer
+from src.data_crawler.scrape_requests.handlers.producers import ScrapeRequestsProducer
+from src.data_crawler.scrape_requests.handlers.graceful_shutdown import ShutdownSignal, checkpoint_crawl
+from src.data_crawler.scrape_requests.handlers.scrape_request_handler import scrape_request_handler
+from src.data_crawler.storage import Checkpoint, JsonlWriter
+
+
+# Set up Logger
+logging.basicConfig(**LOGGING_CONFIG['testing'])
+logger = logging.getLogger('Checkpoint Tests')
+
+
+async def delay(*args):
+    await asyncio.sleep(0)
+    return True
+
+
+class CheckpointTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint = Checkpoint(os.path.join(self.tmp_dir.name, 'checkpoint'))
+        self.client = AsyncClient(transport=httpx.MockTransport(
+            lambda _: httpx.Response(200, headers={'ETag': '"abrdn"'}, content=b'%PDF-1.7 abrdn')
+        ))
+
+    async def test_response_round_trip(self):
+        url = 'https://www.hl.co.uk/abrdn-2023.pdf'
+        request = ScrapeRequest(
+            {
+                'url': url, 'method': 'GET', 'data_type': 'annual_report', 'year': '2023',
+                'share': {'title': 'abrdn', 'ticker': 'ABDN'}
+            },
+            self.client.build_request('GET', url),
+            parse_pdf_file
+        )
+        await request.send(self.client)
+        response = ScrapeResponse(request)
+        response.consume(self.client)
+        spool_path, digest = response.spool_path, response.content_hash
+
+        self.checkpoint.save([], [response.serialize(self.checkpoint.payload_dir)])
+        self.assertFalse(os.path.exists(spool_path))    # moved into the checkpoint
+        requests, responses = self.checkpoint.load()
+        self.assertEqual([], requests)
+
+        restored = ScrapeResponse.deserialize(responses[0], self.client, parse_pdf_file)
+        self.assertTrue(restored.is_pdf)
+        self.assertEqual(digest, restored.content_hash)
+        self.assertEqual(url, restored.url)
+        self.assertEqual('"abrdn"', restored.headers['ETag'])
+        self.assertEqual(response.record, restored.record)
+        with open(restored.source, 'rb') as _:
+            self.assertEqual(b'%PDF-1.7 abrdn', _.read())
+
+        restored.release()
+        self.assertEqual([], os.listdir(self.checkpoint.payload_dir))
+        self.checkpoint.clear(payloads=True)
+        self.assertFalse(self.checkpoint.exists)
+
+    async def test_retries_round_trip(self):
+        url = 'https://www.hl.co.uk/abrdn-2023.pdf'
+        metadata = {
+            'url': url, 'method': 'GET', 'data_type': 'annual_report', 'year': '2023',
+            'share': {'title': 'abrdn', 'ticker': 'ABDN'}
+        }
+        request = ScrapeRequest(metadata, self.client.build_request('GET', url), parse_pdf_file)
+        await request.send(self.client)
+        response = ScrapeResponse(request)
+        response.consume(self.client)
+        response.reset(self.client)
+        retried = ScrapeRequest(metadata, self.client.build_request('GET', url), parse_pdf_file)
+        retried.reset(self.client)
+        retried.reset(self.client)
+
+        self.checkpoint.save([retried.serialize()], [response.serialize(self.checkpoint.payload_dir)])
+        requests, responses = self.checkpoint.load()
+        self.assertEqual(1, ScrapeResponse.deserialize(responses[0], self.client, parse_pdf_file).reset_count)
+
+        # Checkpointed requests keep counting their failed attempts once produced again
+        queue = asyncio.Queue()
+        await ScrapeRequestsProducer(self.client, queue, [{**requests[0], 'consumer': 'parse_pdf_file'}])()
+        self.assertEqual(2, queue.get_nowait().reset_count)
+        self.checkpoint.clear(payloads=True)
+
+    async def test_release_frontier_retries(self):
+        url = 'https://www.hl.co.uk/abrdn-2023.pdf'
+        frontier = SqliteFrontier(self.client, os.path.join(self.tmp_dir.name, 'frontier.sqlite'), worker_id='a')
+        frontier.put_nowait(
+            ScrapeRequest({'url': url, 'method': 'GET'}, self.client.build_request('GET', url), parse_pdf_file)
+        )
+        retried = await asyncio.create_task(frontier.get())    # leased by a consumer task
+        retried.reset(self.client)
+        retry_queue = RetryQueue()
+        retry_queue.schedule(retried, frontier, 60)
+
+        pool = mock.Mock(wait=mock.AsyncMock(return_value=0))
+        await checkpoint_crawl(
+            self.checkpoint, [], frontier, asyncio.Queue(), retry_queue, pool, pool, mock.Mock(), timeout=1
+        )
+
+        # Released to the frontier still holding its leased row, instead of being queued twice on resume
+        self.assertEqual(([], []), self.checkpoint.load())
+        self.assertEqual(1, frontier.qsize())
+        self.assertEqual(1, (await frontier.get()).reset_count)
+        frontier.close()
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class StoppedCrawlTestCase(unittest.IsolatedAsyncioTestCase):
+    """Test a crawl stopped by a shutdown signal and resumed from its checkpoint"""
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint = Checkpoint(os.path.join(self.tmp_dir.name, 'checkpoint'))
+
+        with open('./tests/mocks/data_crawler/ar-firm-detail-page-abrdn.mock.html', 'r') as _:
+            self.firms_detail_page_response_mock = _.read()
+        self.request_mock = mock.Mock(httpx.Request, method='GET', url='http://test.url')
+        writer = pypdf.PdfWriter()
+        writer.add_blank_page(100, 100)
+        byte_stream = BytesIO()
+        writer.write_stream(byte_stream)
+        self.pdf_response_mock = byte_stream.getvalue()
+
+        self.conversion_pool = mock.Mock(ConversionPool, size=2, queue_depth=0, profile='markdown', triage=False)
+        self.conversion_pool.convert = mock.AsyncMock(return_value='# abrdn annual report')
+        self.writer = mock.Mock(JsonlWriter, pending=0)
+
+    async def crawl(self, requests: list[dict], shutdown: ShutdownSignal) -> bool:
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            return await scrape_request_handler(
+                requests, conversion_pool=self.conversion_pool, writer=self.writer, checkpoint=self.checkpoint,
+                shutdown=shutdown, shutdown_timeout=1
+            )
+
+    @mock.patch('httpx.AsyncClient.send', new_callable=mock.AsyncMock)
+    @mock.patch('httpx.AsyncClient.request', new_callable=mock.AsyncMock)
+    @mock.patch.object(ScrapeRequestConsumer, 'delay_request', delay)
+    async def test_resume_stopped_crawl(
+            self,
+            async_client_mock: mock.AsyncMock,
+            async_client_send_mock: mock.AsyncMock,
+    ) -> None:
+        async_client_mock.side_effect = [
+            httpx.Response(200, content=self.firms_detail_page_response_mock, request=self.request_mock),
+        ]
+
+        async def send(*args, **kwargs) -> httpx.Response:
+            await asyncio.sleep(0.05)   # in flight when the crawl is stopped
+            return httpx.Response(200, content=self.pdf_response_mock, request=self.request_mock)
+        async_client_send_mock.side_effect = send
+
+        shutdown = ShutdownSignal()
+        shutdown.set()  # stopped right away, the in-flight requests are finished and checkpointed
+        requests = [{'metadata': {}, 'method': 'GET', 'url': 'http://test.url', 'consumer': parse_firms_detail_page}]
+        self.assertFalse(await self.crawl(requests, shutdown))
+        self.assertTrue(self.checkpoint.exists)
+        checkpoint_requests, checkpoint_responses = self.checkpoint.load()
+        self.assertEqual(10, len(checkpoint_requests) + len(checkpoint_responses) + self.writer.write.call_count)
+
+        self.assertTrue(await self.crawl([], ShutdownSignal()))
+        self.assertFalse(self.checkpoint.exists)
+        self.assertEqual(1, async_client_mock.await_count)   # nothing is requested twice
+        self.assertEqual(10, async_client_send_mock.await_count)
+        self.assertEqual(10, self.writer.write.call_count)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+import unittest
+import asyncio
+import logging
+import os
+import tempfile
+
+import pymupdf
+
+from src.data_crawler.constants import ASYNC_AWAIT_TIMEOUT, LOGGING_CONFIG
+from src.data_crawler.conversion import ConversionPool, convert_pdf, get_page_ranges, triage_pdf
+from src.data_crawler.storage import ConversionCache
+
+
+# Set up Logger
+logging.basicConfig(**LOGGING_CONFIG['testing'])
+logger = logging.getLogger('Conversion Tests')
+
+
+def build_pdf(pages: list[str], headers: list[str] or None = None) -> bytes:
+    """Build a PDF document with one page for each of the given texts, under the given headers"""
+    document = pymupdf.open()
+    for i, text in enumerate(pages):
+        page = document.new_page()
+        if headers is not None:
+            page.insert_text((72, 96), headers[i], fontsize=24 if i % 10 == 0 else 16)
+        page.insert_text((72, 120), text)
+    content = document.tobytes()
+    document.close()
+    return content
+
+
+def build_report_pdf() -> bytes:
+    """Build an annual report PDF with a cover, a photo spread, a chart, a blank page and a boilerplate page"""
+    document = pymupdf.open()
+    body = ' '.join([f'Revenue grew by {_}% over the year across the group\'s markets.' for _ in range(20)])
+    pixmap = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 64, 64), False)
+    pixmap.set_rect(pixmap.irect, (40, 90, 160))
+
+    cover = document.new_page()     # full-page photo under the report's title
+    cover.insert_image(cover.rect, pixmap=pixmap)
+    cover.insert_text((72, 96), 'Annual Report 2023', fontsize=24)
+    document.new_page().insert_textbox(pymupdf.Rect(72, 72, 520, 770), body)
+    chart = document.new_page()     # full-page bar chart with its labels
+    for i in range(6):
+        chart.draw_rect(pymupdf.Rect(72 + i * 75, 700 - i * 100, 132 + i * 75, 770), color=None, fill=(0, .4, .6))
+        chart.insert_text((72 + i * 75, 790), f'FY{2018 + i}')
+    document.new_page()
+    document.new_page().insert_text((200, 400), 'This page has been intentionally left blank.')
+    document.new_page().insert_textbox(pymupdf.Rect(72, 72, 520, 770), body)
+    content = document.tobytes()
+    document.close()
+    return content
+
+
+class ConversionPoolTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.pdf_mock = build_pdf(['Annual Report 2023', 'Strategic Report'])
+        self.pool = ConversionPool(2)
+
+    async def test_convert_pdf_bytes(self):
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            documents = await asyncio.gather(*[self.pool.convert(self.pdf_mock, str(_)) for _ in range(3)])
+
+        for markdown in documents:
+            self.assertIn('Annual Report 2023', markdown)
+            self.assertIn('Strategic Report', markdown)
+
+        stats = self.pool.stats()
+        self.assertEqual(2, stats['size'])
+        self.assertEqual(3, stats['converted'])
+        self.assertEqual(0, stats['queue_depth'])
+        self.assertGreater(stats['max_time'], 0)
+
+    async def test_convert_pdf_path(self):
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as _:
+            _.write(self.pdf_mock)
+            _.flush()
+            async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                markdown = await self.pool.convert(_.name)
+        self.assertIn('Annual Report 2023', markdown)
+
+    async def test_convert_page_ranges(self):
+        self.assertEqual([(0, 4), (4, 8), (8, 10)], get_page_ranges(10, 3))
+        self.assertEqual([(0, 2)], get_page_ranges(2, 1))
+        self.assertEqual([(0, 1), (1, 2)], get_page_ranges(2, 4))
+
+        pdf_mock = build_pdf([f'Page {_} of the annual report' for _ in range(60)], [f'Note {_}' for _ in range(60)])
+        pool = ConversionPool(2, split_pages=50)
+        self.assertEqual([(0, 30), (30, 60)], pool.get_page_ranges(60))
+        self.assertEqual([(0, 40)], pool.get_page_ranges(40))
+        try:
+            async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                markdown = await pool.convert(pdf_mock)
+        finally:
+            pool.shutdown()
+
+        self.assertEqual(convert_pdf(pdf_mock)[0], markdown)    # headers of the whole document, pages in order
+        self.assertIn('# Note 30', markdown)
+        self.assertEqual(1, pool.stats()['converted'])
+
+    async def test_convert_triaged_page_ranges(self):
+        # The larger headers are on skipped pages, the headers of the kept pages are one level up
+        pdf_mock = build_pdf([f'Page {_} of the annual report' for _ in range(60)], [f'Note {_}' for _ in range(60)])
+        pages = [_ for _ in range(60) if _ % 10]
+        pool = ConversionPool(2, split_pages=50)
+        try:
+            async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                markdown = await pool.convert(pdf_mock, pages=pages)
+        finally:
+            pool.shutdown()
+
+        self.assertEqual(convert_pdf(pdf_mock, 'markdown', pages)[0], markdown)
+        self.assertIn('# Note 31', markdown)
+        self.assertNotIn('## Note 31', markdown)
+        self.assertNotIn('Note 30', markdown)
+
+    async def test_conversion_profiles(self):
+        pdf_mock = build_pdf([f'Page {_} of the annual report' for _ in range(60)], [f'Note {_}' for _ in range(60)])
+        text, page_count, _ = convert_pdf(pdf_mock, 'text')
+        self.assertEqual(60, page_count)
+        self.assertIn('Note 30\nPage 30 of the annual report', text)
+        self.assertNotIn('#', text)
+
+        headings = convert_pdf(pdf_mock, 'headings')[0]
+        self.assertIn('# Note 30\n\nPage 30 of the annual report\n\n', headings)
+        self.assertIn('## Note 31\n\n', headings)
+
+        for profile, converted in [('text', text), ('headings', headings)]:
+            pool = ConversionPool(2, split_pages=50, profile=profile)
+            try:
+                async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                    self.assertEqual(converted, await pool.convert(pdf_mock))   # same output split into page ranges
+            finally:
+                pool.shutdown()
+            self.assertEqual(profile, pool.stats()['profile'])
+
+        with self.assertRaises(ValueError):
+            ConversionPool(2, profile='html')
+
+    async def test_page_triage(self):
+        pdf_mock = build_report_pdf()
+        triage = triage_pdf(pdf_mock)
+        self.assertEqual([1, 5], triage['pages'])
+        self.assertEqual({'pages': 6, 'converted': 2, 'blank': 1, 'image': 2, 'boilerplate': 1}, triage['stats'])
+
+        pool = ConversionPool(2, profile='text')
+        try:
+            async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                self.assertEqual(triage, await pool.triage_pages(pdf_mock))
+                text = await pool.convert(pdf_mock, pages=triage['pages'])
+        finally:
+            pool.shutdown()
+        self.assertEqual(convert_pdf(pdf_mock, 'text', [1, 5])[0], text)
+        self.assertNotIn('FY2018', text)
+        self.assertNotIn('left blank', text)
+        self.assertEqual(4, pool.stats()['skipped_pages'])
+        self.assertIsNone(await ConversionPool(2, triage=False).triage_pages(pdf_mock))
+
+    async def test_conversion_cache(self):
+        pdf_mock = build_report_pdf()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ConversionCache(os.path.join(tmp_dir, 'conversion-cache.sqlite'))
+            pool = ConversionPool(2, cache=cache)
+            try:
+                async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                    triage = await pool.triage_pages(pdf_mock)
+                    markdown = await pool.convert(pdf_mock, pages=triage['pages'])
+            finally:
+                pool.shutdown()
+
+            # Later conversions of the same content, by any pool, are taken from the cache
+            pool = ConversionPool(2, cache=cache)
+            async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                self.assertEqual(triage, await pool.triage_pages(pdf_mock))
+                self.assertEqual(markdown, await pool.convert(pdf_mock, pages=triage['pages']))
+            self.assertEqual((0, 1), (pool.stats()['converted'], pool.stats()['cached']))
+
+            # Other options are converted again
+            pool = ConversionPool(2, profile='text', cache=cache)
+            try:
+                async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                    await pool.convert(pdf_mock, pages=triage['pages'])
+            finally:
+                pool.shutdown()
+            self.assertEqual((1, 0), (pool.stats()['converted'], pool.stats()['cached']))
+            self.assertEqual(2, cache.stats()['hits'])
+            cache.close()
+
+    def tearDown(self):
+        self.pool.shutdown()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+import unittest
+import asyncio
+import logging
+import os
+import tempfile
+
+from unittest import mock
+from httpx import AsyncClient
+
+from src.data_crawler.constants import LOGGING_CONFIG, RETRY_POLICIES
+from src.data_crawler.frontier import SqliteFrontier
+from src.data_crawler.politeness import SharedHostScheduler
+from src.data_crawler.scrape_requests import ScrapeRequest
+from src.data_crawler.scrape_requests.handlers import AsyncTask, RetryQueue
+from src.data_crawler.scrape_requests.handlers.consumers.consumer_exception_handler import handle_consumer_exception
+from src.data_crawler.parsers import parse_pdf_file
+
+
+# Set up Logger
+logging.basicConfig(**LOGGING_CONFIG['testing'])
+logger = logging.getLogger('Frontier Tests')
+
+
+class RecordingTask(AsyncTask):
+    """Consumer task keeping the records it writes"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.records = []
+
+    def write_record(self, path, record, callback=None):
+        self.records.append(record)
+
+
+class SqliteFrontierTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'frontier.sqlite')
+        self.client = AsyncClient()
+        self.frontiers = []
+
+    def get_frontier(self, worker_id: str, **kwargs) -> SqliteFrontier:
+        frontier = SqliteFrontier(self.client, self.path, run_id=1, worker_id=worker_id, poll_interval=0.01, **kwargs)
+        self.frontiers.append(frontier)
+        return frontier
+
+    def get_request(self, url: str) -> ScrapeRequest:
+        return ScrapeRequest(
+            metadata={'url': url, 'method': 'GET'}, request=self.client.build_request('GET', url), consumer=parse_pdf_file
+        )
+
+    async def test_share_requests(self):
+        worker_a, worker_b = self.get_frontier('a'), self.get_frontier('b')
+        await worker_a.put(self.get_request('https://www.hl.co.uk/1.pdf'))
+        await worker_a.put(self.get_request('https://www.hl.co.uk/2.pdf'))
+        await worker_b.put(self.get_request('https://www.hl.co.uk/1.pdf'))     # already in the frontier
+        self.assertEqual(2, worker_b.qsize())
+
+        # Leases are held by the task getting the request, as the consumers do
+        first = await worker_b.get()
+        self.assertEqual('https://www.hl.co.uk/1.pdf', first.url)
+        self.assertEqual(parse_pdf_file, first.consumer)
+        worker_b.task_done()
+        second = await worker_b.get()
+        self.assertEqual('https://www.hl.co.uk/2.pdf', second.url)
+        self.assertTrue(worker_a.empty())
+
+        join = asyncio.create_task(worker_a.join())
+        await asyncio.sleep(0.05)
+        self.assertFalse(join.done())   # worker b still holds a lease
+        worker_b.task_done()
+        await asyncio.wait_for(join, 1)
+        self.assertEqual({'worker_id': 'a', 'done': 2}, worker_a.stats())
+
+    async def test_expired_lease(self):
+        worker_a, worker_b = self.get_frontier('a', lease_time=0.05), self.get_frontier('b')
+        await worker_a.put(self.get_request('https://www.hl.co.uk/1.pdf'))
+        await worker_a.get()
+        self.assertIsNone(worker_b.claim())
+
+        worker_a.close()    # worker a died, its leases are no longer renewed
+        await asyncio.sleep(0.1)
+        scrape_request, _ = worker_b.claim()
+        self.assertEqual('https://www.hl.co.uk/1.pdf', scrape_request.url)
+
+        # Only the worker holding the lease marks the request as done
+        worker_a.task_done()
+        self.assertEqual({'worker_id': 'b', 'leased': 1}, worker_b.stats())
+
+    async def test_renew_lease(self):
+        worker_a, worker_b = self.get_frontier('a', lease_time=0.05), self.get_frontier('b')
+        await worker_a.put(self.get_request('https://www.hl.co.uk/1.pdf'))
+        await worker_a.get()
+
+        await asyncio.sleep(0.2)    # long download, past the lease time
+        self.assertIsNone(worker_b.claim())
+        worker_a.task_done()
+        self.assertEqual({'worker_id': 'b', 'done': 1}, worker_b.stats())
+
+    async def test_retry(self):
+        worker_a, worker_b = self.get_frontier('a'), self.get_frontier('b')
+        await worker_a.put(self.get_request('https://www.hl.co.uk/1.pdf'))
+        scrape_request = await worker_a.get()
+
+        await worker_b.put(self.get_request('https://www.hl.co.uk/1.pdf'))     # leased by worker a
+        self.assertEqual(0, worker_b.qsize())
+        worker_a.put_nowait(scrape_request)     # retried by worker a
+        worker_a.task_done()
+        self.assertEqual(1, worker_b.qsize())
+        self.assertEqual('https://www.hl.co.uk/1.pdf', (await worker_b.get()).url)
+
+    async def test_retry_delay(self):
+        worker_a, worker_b = self.get_frontier('a', lease_time=0.05), self.get_frontier('b')
+        retry_queue = RetryQueue()
+        task = RecordingTask(self.client, worker_a, None, retry_queue=retry_queue)
+        await worker_a.put(self.get_request('https://www.hl.co.uk/1.pdf'))
+        scrape_request = await worker_a.get()
+        with mock.patch(
+                'src.data_crawler.scrape_requests.handlers.consumers.consumer_exception_handler.get_retry_delay',
+                return_value=0.2
+        ):
+            await handle_consumer_exception(Exception('500 Internal Server Error'), scrape_request, task)
+
+        # Handed back to the frontier with its delay instead of waiting in the worker past its lease
+        self.assertEqual(0, retry_queue.size)
+        await asyncio.sleep(0.1)    # lease time elapsed
+        self.assertIsNone(worker_b.claim())
+        await asyncio.sleep(0.15)
+        scrape_request, _ = worker_b.claim()
+        self.assertEqual('https://www.hl.co.uk/1.pdf', scrape_request.url)
+        self.assertEqual(1, scrape_request.reset_count)
+
+    async def test_abandon_failing_request(self):
+        worker_a, worker_b = self.get_frontier('a'), self.get_frontier('b')
+        tasks = [RecordingTask(self.client, worker_a, None), RecordingTask(self.client, worker_b, None)]
+        await worker_a.put(self.get_request('https://www.hl.co.uk/404.pdf'))
+
+        # Every attempt fails, the workers claiming the request in turns
+        attempts = 0
+        while worker_a.count('pending', 'leased') > 0:
+            task = tasks[attempts % 2]
+            scrape_request = await task.task_queue.get()
+            self.assertEqual(attempts, scrape_request.reset_count)
+            await handle_consumer_exception(Exception('404 Not Found'), scrape_request, task)
+            attempts += 1
+            self.assertLessEqual(attempts, RETRY_POLICIES['default']['max_retries'])
+
+        self.assertEqual(RETRY_POLICIES['default']['max_retries'], attempts)
+        records = sorted(tasks[0].records + tasks[1].records, key=lambda _: _['attempt'])
+        self.assertEqual(attempts, len(records))     # every failure is logged to the error file
+        self.assertEqual(['retried'] * (attempts - 1) + ['abandoned'], [_['outcome'] for _ in records])
+        self.assertEqual(list(range(attempts)), [_['resets'] for _ in records])     # resets before each attempt
+        self.assertEqual({'default'}, {_['error_class'] for _ in records})
+        self.assertEqual({'worker_id': 'a', 'done': 1}, worker_a.stats())
+
+    async def test_runs(self):
+        await self.get_frontier('a').put(self.get_request('https://www.hl.co.uk/1.pdf'))
+        frontier = SqliteFrontier(self.client, self.path, run_id=2, worker_id='a')
+        self.frontiers.append(frontier)
+        self.assertTrue(frontier.empty())
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    def tearDown(self):
+        [_.close() for _ in self.frontiers]
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class SharedHostSchedulerTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'frontier.sqlite')
+        self.schedulers = [SharedHostScheduler(self.path), SharedHostScheduler(self.path)]
+
+    def test_reserve(self):
+        first = self.schedulers[0].reserve('www.hl.co.uk', 10)
+        second = self.schedulers[1].reserve('www.hl.co.uk', 10)
+        other_host = self.schedulers[1].reserve('www.annualreports.com', 10)
+        self.assertAlmostEqual(10, second - first, delta=0.01)
+        self.assertAlmostEqual(first, other_host, delta=1)
+
+    async def test_acquire(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for scheduler in self.schedulers:
+            await scheduler.acquire('www.hl.co.uk', 0.05)
+            scheduler.release('www.hl.co.uk')
+        self.assertGreaterEqual(loop.time() - start, 0.04)
+
+    def tearDown(self):
+        [_.close() for _ in self.schedulers]
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import asyncio
+import json
+import logging
+import os
+import tempfile
+
+import httpx
+
+from src.data_crawler.constants import LOGGING_CONFIG
+from src.data_crawler.metrics import MetricsRegistry, MetricsExporter
+
+
+# Set up Logger
+logging.basicConfig(**LOGGING_CONFIG['testing'])
+logger = logging.getLogger('Metrics Tests')
+
+
+class MetricsRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.registry = MetricsRegistry()
+
+    def test_snapshot(self):
+        self.registry.counter('crawler_responses_total').inc(status=200)
+        self.registry.counter('crawler_responses_total').inc(2, status=200)
+        self.registry.counter('crawler_responses_total').inc(status=404)
+        latency = self.registry.histogram('crawler_request_seconds', buckets=(0.1, 1))
+        for value in (0.05, 0.05, 0.5, 2):
+            latency.observe(value, host='www.hl.co.uk')
+
+        metrics = self.registry.snapshot()['metrics']
+        self.assertEqual(
+            [{'labels': {'status': '200'}, 'value': 3}, {'labels': {'status': '404'}, 'value': 1}],
+            metrics['crawler_responses_total']
+        )
+        self.assertEqual(
+            {
+                'labels': {'host': 'www.hl.co.uk'}, 'count': 4, 'sum': 2.6, 'mean': 0.65,
+                'p50': 0.1, 'p95': 2, 'max': 2
+            },
+            metrics['crawler_request_seconds'][0]
+        )
+
+    def test_prometheus(self):
+        self.registry.gauge('crawler_queue_depth', 'Number of items waiting in a queue').set(3, queue='task_queue')
+        self.registry.histogram('crawler_parse_seconds', buckets=(0.1,)).observe(0.01, consumer='parse_pdf_file')
+        self.assertEqual(
+            '# HELP crawler_queue_depth Number of items waiting in a queue\n'
+            '# TYPE crawler_queue_depth gauge\n'
+            'crawler_queue_depth{queue="task_queue"} 3\n'
+            '# HELP crawler_parse_seconds \n'
+            '# TYPE crawler_parse_seconds histogram\n'
+            'crawler_parse_seconds_bucket{consumer="parse_pdf_file",le="0.1"} 1\n'
+            'crawler_parse_seconds_bucket{consumer="parse_pdf_file",le="+Inf"} 1\n'
+            'crawler_parse_seconds_sum{consumer="parse_pdf_file"} 0.01\n'
+            'crawler_parse_seconds_count{consumer="parse_pdf_file"} 1\n',
+            self.registry.prometheus()
+        )
+
+    def tearDown(self):
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class MetricsExporterTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'metrics.jsonl')
+        self.registry = MetricsRegistry()
+
+    async def test_export(self):
+        queue = asyncio.Queue()
+        exporter = MetricsExporter(self.registry, {'task_queue': queue.qsize}, self.path, interval=0.01, port=0)
+        await exporter.start()
+        await queue.put(None)
+        await asyncio.sleep(0.05)
+
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f'http://127.0.0.1:{exporter.port}/metrics')
+        self.assertEqual(200, response.status_code)
+        self.assertIn('crawler_queue_depth{queue="task_queue"} 1', response.text)
+
+        queue.get_nowait()
+        await exporter.stop()
+        with open(self.path) as _:
+            snapshots = [json.loads(line) for line in _]
+        self.assertGreater(len(snapshots), 1)
+        self.assertEqual(
+            [{'labels': {'queue': 'task_queue'}, 'value': 0}], snapshots[-1]['metrics']['crawler_queue_depth']
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+if __name__ == '__main__':
+    unittest.main()
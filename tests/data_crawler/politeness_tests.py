@@ -0,0 +1,126 @@
+import unittest
+import asyncio
+import logging
+import os
+import tempfile
+
+import httpx
+
+from src.data_crawler.constants import ASYNC_AWAIT_TIMEOUT, LOGGING_CONFIG
+from src.data_crawler.politeness import RobotsCache, HostScheduler
+
+
+# Set up Logger
+logging.basicConfig(**LOGGING_CONFIG['testing'])
+logger = logging.getLogger('Politeness Tests')
+
+ROBOTS_TXT_MOCK = """
+User-agent: *
+Crawl-delay: 2
+Disallow: /private/
+Sitemap: https://www.test.url/sitemap.xml
+"""
+
+
+class RobotsCacheTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp_dir.name, 'robots.json')
+        self.robots_requests = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            self.robots_requests.append(request)
+            await asyncio.sleep(0.01)
+            return httpx.Response(200, text=ROBOTS_TXT_MOCK)
+
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def test_coalesced_robots_lookups(self):
+        cache = RobotsCache(self.cache_path)
+        url = httpx.URL('https://www.test.url/shares')
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            rules = await asyncio.gather(*[cache.get(url, self.client) for _ in range(10)])
+
+        self.assertEqual(1, len(self.robots_requests))
+        self.assertEqual('https://www.test.url/robots.txt', str(self.robots_requests[0].url))
+        self.assertEqual(2, rules[0].crawl_delay)
+        self.assertTrue(rules[0].can_fetch('https://www.test.url/shares'))
+        self.assertFalse(rules[0].can_fetch('https://www.test.url/private/report.pdf'))
+
+    async def test_persisted_robots_rules(self):
+        url = httpx.URL('https://www.test.url/shares')
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            await RobotsCache(self.cache_path).get(url, self.client)
+            rules = await RobotsCache(self.cache_path).get(url, self.client)
+
+        self.assertEqual(1, len(self.robots_requests))
+        self.assertEqual(2, rules.crawl_delay)
+        self.assertFalse(rules.can_fetch('https://www.test.url/private/report.pdf'))
+
+        # Expired rules are fetched again
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            await RobotsCache(self.cache_path, ttl=0).get(url, self.client)
+        self.assertEqual(2, len(self.robots_requests))
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class HostSchedulerTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+
+    async def test_crawl_delay_per_host(self):
+        scheduler = HostScheduler(max_in_flight=10)
+        loop = asyncio.get_running_loop()
+        permits = {'www.hl.co.uk': [], 'www.annualreports.com': []}
+
+        async def request(host: str, delay: float):
+            await scheduler.acquire(host, delay)
+            permits[host].append(loop.time())
+            scheduler.release(host)
+
+        start = loop.time()
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            await asyncio.gather(
+                *[request('www.hl.co.uk', 0.1) for _ in range(4)],
+                *[request('www.annualreports.com', 0) for _ in range(4)],
+            )
+
+        hl_permits = sorted(permits['www.hl.co.uk'])
+        for previous, current in zip(hl_permits, hl_permits[1:]):
+            self.assertGreaterEqual(current - previous, 0.09)
+        self.assertLess(max(permits['www.annualreports.com']) - start, 0.05)
+
+    async def test_max_in_flight_per_host(self):
+        scheduler = HostScheduler(max_in_flight=2)
+        in_flight, max_in_flight = 0, 0
+
+        async def request():
+            nonlocal in_flight, max_in_flight
+            await scheduler.acquire('www.hl.co.uk', 0)
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            scheduler.release('www.hl.co.uk')
+
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            await asyncio.gather(*[request() for _ in range(6)])
+
+        self.assertEqual(2, max_in_flight)
+        self.assertEqual({'delay': 0, 'in_flight': 0, 'waiting': 0}, scheduler.stats()['www.hl.co.uk'])
+
+    def tearDown(self):
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import asyncio
+import logging
+
+from src.data_crawler.constants import LOGGING_CONFIG
+from src.data_crawler.scrape_requests.handlers import BoundedQueue
+
+
+# Set up Logger
+logging.basicConfig(**LOGGING_CONFIG['testing'])
+logger = logging.getLogger('Queue Tests')
+
+
+class Payload:
+    def __init__(self, size: int):
+        self.size = size
+
+
+class BoundedQueueTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+
+    async def test_byte_bound(self):
+        queue = BoundedQueue(max_bytes=100)
+        await queue.put(Payload(60))
+        await queue.put(Payload(60))    # admitted while under the limit
+        self.assertEqual(120, queue.bytes)
+        self.assertTrue(queue.full())
+
+        put = asyncio.create_task(queue.put(Payload(10)))
+        await asyncio.sleep(0.01)
+        self.assertFalse(put.done())
+
+        await queue.get()
+        await asyncio.wait_for(put, 1)
+        self.assertEqual(70, queue.bytes)
+        self.assertEqual(2, queue.qsize())
+
+    async def test_large_item(self):
+        queue = BoundedQueue(max_bytes=100)
+        await asyncio.wait_for(queue.put(Payload(1000)), 1)
+        self.assertTrue(queue.full())
+        await queue.get()
+        self.assertEqual(0, queue.bytes)
+
+    async def test_item_bound(self):
+        queue = BoundedQueue(2, max_bytes=100)
+        await queue.put('request')
+        await queue.put('request')
+        self.assertEqual(0, queue.bytes)
+        self.assertTrue(queue.full())
+        with self.assertRaises(asyncio.QueueFull):
+            queue.put_nowait('request')
+
+    async def test_put_unbounded(self):
+        queue = BoundedQueue(1, max_bytes=10)
+        await queue.put(Payload(10))
+        queue.put_unbounded(Payload(10))
+        self.assertEqual(2, queue.qsize())
+        self.assertEqual(20, queue.bytes)
+        self.assertTrue(queue.full())
+
+    def tearDown(self):
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,20 @@
 import unittest
 import asyncio
 import logging
+import os
 import httpx
 import pypdf
+import tempfile
 
 from unittest import mock
 from httpx import AsyncClient
 from io import BytesIO
 
-from src.data_crawler.constants import ASYNC_AWAIT_TIMEOUT, LOGGING_CONFIG
+from src.data_crawler.constants import ASYNC_AWAIT_TIMEOUT, LOGGING_CONFIG, PDF_SPOOL_DIR
 from src.data_crawler.scrape_requests.handlers.scrape_request_handler import scrape_request_handler
 from src.data_crawler.scrape_requests import ScrapeRequest, ScrapeResponse
+from src.data_crawler.scrape_requests.handlers import BoundedQueue
+from src.data_crawler.frontier import SqliteFrontier
 from src.data_crawler.scrape_requests.handlers.producers import ScrapeRequestsProducer
 from src.data_crawler.scrape_requests.handlers.consumers import ScrapeRequestConsumer
 from src.data_crawler.parsers.ar_parse import parse_firms_detail_page
@@ -22,6 +26,12 @@ logger = logging.getLogger('Requests Tests')
 
 async def delay(*args):
     await asyncio.sleep(0)
+    return True
+
+
+async def no_request_delay(*args):
+    await asyncio.sleep(0)
+    return 0
 
 
 class ProducerTest(unittest.IsolatedAsyncioTestCase):
@@ -99,7 +109,7 @@ class ConsumerTest(unittest.IsolatedAsyncioTestCase):
             self.consumers = []
             for _ in range(10):
                 c = ScrapeRequestConsumer(self.client, self.queue, self.responses, _)
-                c.get_request_delay = lambda x: 0
+                c.get_request_delay = no_request_delay
                 self.consumers.append(asyncio.create_task(c()))
 
             await self.queue.join()
@@ -222,27 +232,23 @@ class ScrapeRequestHandlerTestCase(unittest.IsolatedAsyncioTestCase):
         byte_stream.seek(0)
         self.pdf_response_mock = byte_stream.read()
 
+    @mock.patch('httpx.AsyncClient.send', new_callable=mock.AsyncMock)
     @mock.patch('httpx.AsyncClient.request', new_callable=mock.AsyncMock)
     @mock.patch.object(ScrapeRequestConsumer, 'delay_request', delay)
     async def test_scrape_ar_firm_detail_page(
             self,
             async_client_mock: mock.AsyncMock,
+            async_client_send_mock: mock.AsyncMock,
     ) -> None:
         """Test the scraping of the stocks' financial statements page"""
         # Set Up Mocks
         async_client_mock.side_effect = [
             httpx.Response(200, content=self.firms_detail_page_response_mock, request=self.request_mock),
-            httpx.Response(200, content=self.pdf_response_mock, request=self.request_mock),
-            httpx.Response(200, content=self.pdf_response_mock, request=self.request_mock),
-            httpx.Response(200, content=self.pdf_response_mock, request=self.request_mock),
-            httpx.Response(200, content=self.pdf_response_mock, request=self.request_mock),
-            httpx.Response(200, content=self.pdf_response_mock, request=self.request_mock),
-            httpx.Response(200, content=self.pdf_response_mock, request=self.request_mock),
-            httpx.Response(200, content=self.pdf_response_mock, request=self.request_mock),
-            httpx.Response(200, content=self.pdf_response_mock, request=self.request_mock),
-            httpx.Response(200, content=self.pdf_response_mock, request=self.request_mock),
-            httpx.Response(200, content=self.pdf_response_mock, request=self.request_mock)
         ]
+        # PDF reports are downloaded through the streaming API
+        async_client_send_mock.side_effect = lambda *args, **kwargs: httpx.Response(
+            200, content=self.pdf_response_mock, request=self.request_mock
+        )
 
         # Call function
         async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
@@ -257,7 +263,89 @@ class ScrapeRequestHandlerTestCase(unittest.IsolatedAsyncioTestCase):
 
         # Assert
         self.assertNoLogs(logging.getLogger('asyncio'), logging.ERROR)
-        self.assertEqual(11, async_client_mock.await_count)
+        self.assertEqual(1, async_client_mock.await_count)
+        self.assertEqual(10, async_client_send_mock.await_count)
+        for _ in async_client_send_mock.await_args_list:
+            self.assertTrue(_.kwargs['stream'])
+        self.assertEqual([], os.listdir(PDF_SPOOL_DIR))
+
+    @mock.patch('httpx.AsyncClient.send', new_callable=mock.AsyncMock)
+    @mock.patch('httpx.AsyncClient.request', new_callable=mock.AsyncMock)
+    @mock.patch.object(ScrapeRequestConsumer, 'delay_request', delay)
+    async def test_scrape_with_bounded_queues(
+            self,
+            async_client_mock: mock.AsyncMock,
+            async_client_send_mock: mock.AsyncMock,
+    ) -> None:
+        """Test the crawl completes when the queues only hold a single item"""
+        # Set Up Mocks
+        async_client_mock.side_effect = [
+            httpx.Response(200, content=self.firms_detail_page_response_mock, request=self.request_mock),
+        ]
+        async_client_send_mock.side_effect = lambda *args, **kwargs: httpx.Response(
+            200, content=self.pdf_response_mock, request=self.request_mock
+        )
+
+        # Call function
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            await scrape_request_handler(
+                [
+                    {
+                        'metadata': {},
+                        'method': 'GET',
+                        'url': 'http://test.url',
+                        'consumer': parse_firms_detail_page
+                    }
+                ],
+                task_queue=BoundedQueue(1),
+                response_queue=BoundedQueue(1, max_bytes=1)
+            )
+
+        # Assert
+        self.assertEqual(10, async_client_send_mock.await_count)
+        self.assertEqual([], os.listdir(PDF_SPOOL_DIR))
+
+    @mock.patch('httpx.AsyncClient.send', new_callable=mock.AsyncMock)
+    @mock.patch('httpx.AsyncClient.request', new_callable=mock.AsyncMock)
+    @mock.patch.object(ScrapeRequestConsumer, 'delay_request', delay)
+    async def test_scrape_with_shared_frontier(
+            self,
+            async_client_mock: mock.AsyncMock,
+            async_client_send_mock: mock.AsyncMock,
+    ) -> None:
+        """Test the crawl through a frontier shared with other workers"""
+        # Set Up Mocks
+        async_client_mock.side_effect = [
+            httpx.Response(200, content=self.firms_detail_page_response_mock, request=self.request_mock),
+        ]
+        async_client_send_mock.side_effect = lambda *args, **kwargs: httpx.Response(
+            200, content=self.pdf_response_mock, request=self.request_mock
+        )
+
+        # Call function
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            client = AsyncClient()
+            frontier = SqliteFrontier(client, os.path.join(tmp_dir, 'frontier.sqlite'), poll_interval=0.01)
+            async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                await scrape_request_handler(
+                    [
+                        {
+                            'metadata': {},
+                            'method': 'GET',
+                            'url': 'http://test.url',
+                            'consumer': parse_firms_detail_page
+                        }
+                    ],
+                    client,
+                    task_queue=frontier
+                )
+            stats = frontier.stats()
+            frontier.close()
+
+        # Assert
+        self.assertEqual(11, stats['done'])
+        self.assertEqual(10, async_client_send_mock.await_count)
+        self.assertEqual([], os.listdir(PDF_SPOOL_DIR))
 
     def tearDown(self):
         logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
@@ -0,0 +1,129 @@
+import unittest
+import asyncio
+import email.utils
+import logging
+import time
+
+import httpx
+
+from src.data_crawler.constants import LOGGING_CONFIG, RETRY_POLICIES, MAX_RETRY_AFTER
+from src.data_crawler.scrape_requests.handlers import RetryQueue
+from src.data_crawler.scrape_requests.handlers.retry_queue import get_error_class, get_retry_after, get_retry_delay
+
+
+# Set up Logger
+logging.basicConfig(**LOGGING_CONFIG['testing'])
+logger = logging.getLogger('Retry Tests')
+
+
+class RetryDelayTestCase(unittest.TestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+
+    def test_error_class(self):
+        self.assertEqual('network', get_error_class(httpx.ConnectTimeout('timeout'), None))
+        self.assertEqual('throttled', get_error_class(Exception(), httpx.Response(429)))
+        self.assertEqual('throttled', get_error_class(Exception(), httpx.Response(503)))
+        self.assertEqual('server', get_error_class(Exception(), httpx.Response(500)))
+        self.assertEqual('default', get_error_class(Exception(), httpx.Response(404)))
+        self.assertEqual('default', get_error_class(Exception(), None))
+        replay_miss = httpx.Response(504, headers={'X-Cache': 'MISS'}, extensions={'replay_miss': True})
+        self.assertEqual('permanent', get_error_class(Exception(), replay_miss))
+        self.assertEqual('server', get_error_class(Exception(), httpx.Response(504, headers={'X-Cache': 'MISS'})))
+
+    def test_retry_after(self):
+        self.assertEqual(120, get_retry_after(httpx.Response(429, headers={'Retry-After': '120'})))
+        date = email.utils.formatdate(time.time() + 60, usegmt=True)
+        self.assertAlmostEqual(60, get_retry_after(httpx.Response(503, headers={'Retry-After': date})), delta=2)
+        self.assertIsNone(get_retry_after(httpx.Response(503, headers={'Retry-After': 'soon'})))
+        self.assertIsNone(get_retry_after(httpx.Response(503)))
+
+    def test_exponential_backoff(self):
+        policy = RETRY_POLICIES['server']
+        for attempt in range(1, 10):
+            delays = [get_retry_delay('server', attempt) for _ in range(100)]
+            self.assertTrue(all(0 <= _ <= min(policy['max_delay'], policy['base_delay'] * 2 ** (attempt - 1))
+                                for _ in delays))
+            self.assertGreater(len(set(delays)), 1)     # jittered
+
+    def test_retry_after_delay(self):
+        response = httpx.Response(429, headers={'Retry-After': '120'})
+        self.assertTrue(all(get_retry_delay('throttled', 1, response) >= 120 for _ in range(100)))
+        response = httpx.Response(429, headers={'Retry-After': str(MAX_RETRY_AFTER * 2)})
+        self.assertLessEqual(get_retry_delay('throttled', 1, response), MAX_RETRY_AFTER)
+
+    def tearDown(self):
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class Item:
+    def __init__(self, url: str):
+        self.url = url
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+class RetryQueueTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+
+    async def test_retry_order(self):
+        queue = asyncio.Queue()
+        retry_queue = RetryQueue()
+        retry_queue.start()
+        items = [Item(f'https://www.hl.co.uk/{_}') for _ in range(3)]
+        for item, delay in zip(items, (0.06, 0.02, 0.04)):
+            await queue.put(item)
+            await queue.get()   # failed attempt, marked as done by the retry queue
+            retry_queue.schedule(item, queue, delay)
+        self.assertEqual(3, retry_queue.size)
+        self.assertTrue(queue.empty())
+
+        retried = [await asyncio.wait_for(queue.get(), 1) for _ in range(3)]
+        self.assertEqual([items[1], items[2], items[0]], retried)
+        self.assertEqual(0, retry_queue.size)
+        [queue.task_done() for _ in retried]
+        await asyncio.wait_for(queue.join(), 1)
+        await retry_queue.stop()
+
+    async def test_join_waits_for_retries(self):
+        queue = asyncio.Queue()
+        retry_queue = RetryQueue()
+        retry_queue.start()
+        item = Item('https://www.hl.co.uk/')
+        await queue.put(item)
+        await queue.get()
+        retry_queue.schedule(item, queue, 0.05)
+
+        join = asyncio.create_task(queue.join())
+        await asyncio.sleep(0.01)
+        self.assertFalse(join.done())
+        self.assertIs(item, await asyncio.wait_for(queue.get(), 1))
+        queue.task_done()
+        await asyncio.wait_for(join, 1)
+        await retry_queue.stop()
+
+    async def test_stop(self):
+        queue = asyncio.Queue()
+        retry_queue = RetryQueue()
+        retry_queue.start()
+        item = Item('https://www.hl.co.uk/')
+        await queue.put(item)
+        await queue.get()
+        retry_queue.schedule(item, queue, 60)
+
+        await retry_queue.stop()
+        self.assertTrue(item.released)
+        self.assertEqual(0, retry_queue.size)
+        await asyncio.wait_for(queue.join(), 1)
+
+    def tearDown(self):
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+if __name__ == '__main__':
+    unittest.main()
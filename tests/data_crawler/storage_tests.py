@@ -0,0 +1,959 @@
+import unittest
+import asyncio
+import logging
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+import jsonlines
+import pymupdf
+
+from pathlib import Path
+
+from unittest import mock
+import httpx
+from httpx import AsyncClient
+
+from src.data_crawler.__main__ import main
+from src.data_crawler.constants import ASYNC_AWAIT_TIMEOUT, LOGGING_CONFIG, DATA_JSONL_PATH
+from src.data_crawler.parsers import parse_firms_detail_page, parse_pdf_file
+from src.data_crawler.scrape_requests import ScrapeRequest, ScrapeResponse
+from src.data_crawler.scrape_requests.handlers.producers import ScrapeRequestsProducer
+from src.data_crawler.scrape_requests.handlers.consumers import ScrapeRequestConsumer, ScrapeResponseConsumer
+from src.data_crawler.conversion import convert_blobs
+from src.data_crawler.storage import (
+    CrawlState, ValidatorStore, RedirectMap, ResponseCache, DocumentIndex, JsonlWriter, ShardedDatasetWriter,
+    ShardedDatasetReader, BlobStore, ConversionCache
+)
+from tests.benchmarks.crawler_benchmark import SimulatedSite
+
+
+# Set up Logger
+logging.basicConfig(**LOGGING_CONFIG['testing'])
+logger = logging.getLogger('Storage Tests')
+
+
+class CrawlStateTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'crawl-state.sqlite')
+        self.detail_page_request = {
+            'metadata': {'url': 'https://www.annualreports.com/Company/abrdn', 'method': 'GET'},
+            'method': 'GET',
+            'url': 'https://www.annualreports.com/Company/abrdn',
+            'consumer': 'parse_firms_detail_page',
+        }
+        self.report_request = {
+            'metadata': {'url': 'https://www.annualreports.com/abrdn-2023.pdf', 'method': 'GET'},
+            'method': 'GET',
+            'url': 'https://www.annualreports.com/abrdn-2023.pdf',
+            'consumer': 'parse_pdf_file',
+            'stream': True,
+        }
+
+    def test_resume_interrupted_run(self):
+        state = CrawlState(self.path)
+        run_id = state.start()
+        self.assertTrue(state.claim(self.detail_page_request))
+        self.assertTrue(state.claim(self.report_request))
+        self.assertFalse(state.claim(self.report_request))     # already queued
+        state.complete(self.detail_page_request['metadata']['url'])
+        state.close()
+
+        # Interrupted run is resumed with its pending requests only
+        state = CrawlState(self.path)
+        self.assertEqual(run_id, state.start())
+        self.assertTrue(state.is_resumed)
+        self.assertEqual([self.report_request], state.pending_requests())
+        self.assertFalse(state.claim(self.detail_page_request))
+        self.assertTrue(state.claim(self.report_request))
+        state.complete_document('ABDN', 'annual_report', 2023, self.report_request['metadata']['url'])
+        state.complete(self.report_request['metadata']['url'])
+        state.finish()
+        state.close()
+
+        # New runs crawl the pages again but skip the documents already downloaded
+        state = CrawlState(self.path)
+        self.assertNotEqual(run_id, state.start())
+        self.assertFalse(state.is_resumed)
+        self.assertTrue(state.claim(self.detail_page_request))
+        self.assertFalse(state.claim(self.report_request))
+        self.assertTrue(state.has_document('ABDN', 'annual_report', '2023', self.report_request['metadata']['url']))
+        state.close()
+
+    async def test_producer_skips_done_requests(self):
+        state = CrawlState(self.path)
+        state.start()
+        state.claim(self.report_request)
+        state.complete(self.report_request['metadata']['url'])
+
+        queue = asyncio.Queue()
+        client = mock.AsyncMock(AsyncClient)
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            await ScrapeRequestsProducer(
+                client, queue, [self.detail_page_request, self.report_request], crawl_state=state
+            )()
+
+        self.assertEqual(1, queue.qsize())
+        item = queue.get_nowait()
+        self.assertIs(parse_firms_detail_page, item.consumer)
+        await item.send()
+        state.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+async def allow_pages_only(url: httpx.URL):
+    await asyncio.sleep(0)
+    return not url.path.endswith('.pdf')
+
+
+async def allow_all(url: httpx.URL):
+    await asyncio.sleep(0)
+    return True
+
+
+class ValidatorStoreTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = ValidatorStore(os.path.join(self.tmp_dir.name, 'validators.sqlite'))
+        self.url = 'https://www.annualreports.com/Company/abrdn'
+        self.conditional_requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.headers.get('If-None-Match') == '"v1"':
+                self.conditional_requests.append(request)
+                return httpx.Response(304, headers={'ETag': '"v1"'})
+            return httpx.Response(200, text='<html></html>', headers={'ETag': '"v1"'})
+
+        self.client = AsyncClient(transport=httpx.MockTransport(handler))
+        self.store.install(self.client)
+
+    @staticmethod
+    def parse_page(response: ScrapeResponse, client: AsyncClient):
+        url = 'https://www.annualreports.com/abrdn-2023.pdf'
+        return (
+            {'url': response.request.metadata['url'], 'data_type': 'financial_results'},
+            b'| table |',
+            [ScrapeRequest({'url': url, 'method': 'GET'}, client.build_request('GET', url), parse_pdf_file)]
+        )
+
+    async def crawl(self) -> asyncio.Queue:
+        queue, responses = asyncio.Queue(), asyncio.Queue()
+        consumer = ScrapeRequestConsumer(self.client, queue, responses, validator_store=self.store)
+        consumer.delay_request = allow_pages_only
+        task = asyncio.create_task(consumer())
+        await queue.put(ScrapeRequest(
+            {'url': self.url, 'method': 'GET'}, self.client.request('GET', self.url), self.parse_page
+        ))
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            while responses.empty():
+                await asyncio.sleep(0.01)
+        await queue.join()
+        task.cancel()
+        return responses
+
+    async def test_not_modified_reuses_stored_result(self):
+        responses = await self.crawl()
+        self.assertEqual(0, len(self.conditional_requests))
+        self.assertEqual(b'| table |', responses.get_nowait().data)
+
+        # The second crawl gets a not modified response and reuses the stored result
+        responses = await self.crawl()
+        self.assertEqual(1, len(self.conditional_requests))
+        response = responses.get_nowait()
+        self.assertEqual(304, response.status)
+        self.assertEqual(b'| table |', response.data)
+        self.assertEqual('financial_results', response.metadata['data_type'])
+        self.assertEqual(1, len(response.further_requests))
+        self.assertIs(parse_pdf_file, response.further_requests[0].consumer)
+        self.assertTrue(response.further_requests[0].is_streamed)
+
+    async def test_not_modified_download_is_requested_again(self):
+        # Validators of a download stored by an earlier version, with no document in their stored result
+        url = 'https://www.annualreports.com/abrdn-2023.pdf'
+        self.store.save(url, httpx.Headers({'ETag': '"v1"'}), {
+            'metadata': {'url': url}, 'data': None, 'data_is_bytes': False, 'further_requests': None
+        })
+        queue, responses = asyncio.Queue(), asyncio.Queue()
+        consumer = ScrapeRequestConsumer(self.client, queue, responses, validator_store=self.store)
+        consumer.delay_request = allow_all
+        task = asyncio.create_task(consumer())
+        metadata = {'url': url, 'method': 'GET', 'data_type': 'annual_report', 'share': {'ticker': 'ABDN'}}
+        await queue.put(ScrapeRequest(metadata, self.client.build_request('GET', url), parse_pdf_file))
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            await queue.join()
+        task.cancel()
+
+        self.assertEqual(1, len(self.conditional_requests))
+        self.assertIsNone(self.store.get_result(url))
+        response = responses.get_nowait()
+        self.assertEqual(200, response.status)
+        self.assertTrue(response.is_pdf)
+        response.release()
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class RedirectMapTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'redirects.sqlite')
+        self.redirect_map = RedirectMap(self.path, max_hops=3)
+        self.requested = []
+        self.redirects = {
+            'https://www.annualreports.com/Company/abrdn': (301, 'https://www.annualreports.com/Company/abrdn-plc'),
+            'https://www.annualreports.com/Company/abrdn-plc': (302, '/Company/abrdn-group'),
+            'https://www.annualreports.com/Company/aviva': (301, 'https://www.annualreports.com/Company/aviva-plc'),
+            'https://www.annualreports.com/Company/aviva-plc': (301, 'https://www.annualreports.com/Company/aviva'),
+        }
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requested.append(str(request.url))
+            if str(request.url) in self.redirects:
+                status, location = self.redirects[str(request.url)]
+                return httpx.Response(status, headers={'Location': location})
+            return httpx.Response(200, text='<html></html>')
+
+        self.client = AsyncClient(transport=httpx.MockTransport(handler))
+
+    @staticmethod
+    def parse_page(response: ScrapeResponse, client: AsyncClient):
+        return dict(response.request.metadata), b'', []
+
+    async def crawl(self, url: str) -> asyncio.Queue:
+        queue, responses = asyncio.Queue(), asyncio.Queue()
+        consumer = ScrapeRequestConsumer(self.client, queue, responses, redirect_map=self.redirect_map)
+        consumer.delay_request = allow_pages_only
+        task = asyncio.create_task(consumer())
+        await queue.put(ScrapeRequest({'url': url, 'method': 'GET'}, self.client.request('GET', url), self.parse_page))
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            await queue.join()
+        task.cancel()
+        return responses
+
+    def test_resolve(self):
+        self.redirect_map.add('https://www.hl.co.uk/a', 'https://www.hl.co.uk/b')
+        self.redirect_map.add('https://www.hl.co.uk/b', 'https://www.hl.co.uk/c')
+        self.assertEqual(
+            ('https://www.hl.co.uk/c', ['https://www.hl.co.uk/a', 'https://www.hl.co.uk/b']),
+            self.redirect_map.resolve('https://www.hl.co.uk/a')
+        )
+        self.assertEqual(('https://www.hl.co.uk/c', []), self.redirect_map.resolve('https://www.hl.co.uk/c'))
+
+        # Loops and chains longer than max_hops aren't followed
+        self.redirect_map.add('https://www.hl.co.uk/c', 'https://www.hl.co.uk/a')
+        self.assertEqual(('https://www.hl.co.uk/a', []), self.redirect_map.resolve('https://www.hl.co.uk/a'))
+        for i in range(5):
+            self.redirect_map.add(f'https://www.hl.co.uk/{i}', f'https://www.hl.co.uk/{i + 1}')
+        self.assertEqual(('https://www.hl.co.uk/0', []), self.redirect_map.resolve('https://www.hl.co.uk/0'))
+        self.assertEqual(
+            ('https://www.hl.co.uk/5', ['https://www.hl.co.uk/2', 'https://www.hl.co.uk/3', 'https://www.hl.co.uk/4']),
+            self.redirect_map.resolve('https://www.hl.co.uk/2')
+        )
+
+        # The redirects persist across runs
+        self.redirect_map.close()
+        self.assertEqual({'redirects': 8}, RedirectMap(self.path).stats())
+
+    async def test_permanent_redirects_are_recorded(self):
+        responses = await self.crawl('https://www.annualreports.com/Company/abrdn')
+        self.assertEqual([
+            'https://www.annualreports.com/Company/abrdn', 'https://www.annualreports.com/Company/abrdn-plc',
+            'https://www.annualreports.com/Company/abrdn-group'
+        ], self.requested)
+        response = responses.get_nowait()
+        self.assertEqual('https://www.annualreports.com/Company/abrdn-group', response.metadata['url'])
+        self.assertEqual([
+            'https://www.annualreports.com/Company/abrdn', 'https://www.annualreports.com/Company/abrdn-plc'
+        ], response.metadata['redirect_chain'])
+
+        # Only the 301 is recorded, the temporary redirect is requested again
+        self.assertEqual({'redirects': 1}, self.redirect_map.stats())
+        self.assertIsNone(self.redirect_map.get('https://www.annualreports.com/Company/abrdn-plc'))
+        queue = asyncio.Queue()
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            await ScrapeRequestsProducer(self.client, queue, [{
+                'url': 'https://www.annualreports.com/Company/abrdn', 'method': 'GET', 'metadata': {},
+                'consumer': parse_firms_detail_page
+            }], redirect_map=self.redirect_map)()
+        item = queue.get_nowait()
+        self.assertEqual('https://www.annualreports.com/Company/abrdn-plc', item.metadata['url'])
+        self.assertEqual('https://www.annualreports.com/Company/abrdn', item.metadata['redirected_from'])
+        await item.send()
+
+    async def test_redirect_loop_is_dropped(self):
+        responses = await self.crawl('https://www.annualreports.com/Company/aviva')
+        self.assertEqual([
+            'https://www.annualreports.com/Company/aviva', 'https://www.annualreports.com/Company/aviva-plc'
+        ], self.requested)
+        self.assertTrue(responses.empty())
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    def tearDown(self):
+        self.redirect_map.close()
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class ResponseCacheTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.network_requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.network_requests.append(request)
+            if request.url.path.endswith('.pdf'):
+                return httpx.Response(200, content=b'%PDF-1.7' * 1024, headers={'Content-Type': 'application/pdf'})
+            return httpx.Response(200, text='<html>abrdn</html>', headers={'Content-Type': 'text/html'})
+
+        self.network = httpx.MockTransport(handler)
+
+    async def test_record_and_replay(self):
+        page_url, mirror_url = 'https://www.hl.co.uk/shares/abrdn', 'https://www.hl.co.uk/shares/abrdn-mirror'
+        pdf_url = 'https://www.annualreports.com/abrdn-2023.pdf'
+
+        # Record
+        cache = ResponseCache(self.tmp_dir.name)
+        async with AsyncClient(transport=cache.async_transport(self.network)) as client:
+            self.assertEqual('<html>abrdn</html>', (await client.get(page_url)).text)
+            self.assertEqual('<html>abrdn</html>', (await client.get(mirror_url)).text)
+            async with client.stream('GET', pdf_url) as response:
+                pdf = b''.join([_ async for _ in response.aiter_bytes(1024)])
+            async with client.stream('GET', pdf_url + '?partial') as response:
+                await anext(response.aiter_raw(1024))     # partially read bodies are not recorded
+        with httpx.Client(transport=cache.transport(self.network)) as client:
+            self.assertEqual('<html>abrdn</html>', client.get(page_url).text)
+        self.assertEqual({'hits': 0, 'misses': 0, 'recorded': 4}, cache.stats())
+        self.assertEqual(2, len(list(Path(self.tmp_dir.name, 'blobs').glob('*/*'))))   # identical bodies kept once
+        self.assertEqual([], os.listdir(cache.spool_dir))
+        cache.close()
+
+        # Replay without network access
+        self.network_requests.clear()
+        cache = ResponseCache(self.tmp_dir.name, replay=True)
+        async with AsyncClient(transport=cache.async_transport()) as client:
+            response = await client.get(page_url)
+            self.assertEqual('<html>abrdn</html>', response.text)
+            self.assertEqual('text/html', response.headers['Content-Type'])
+            async with client.stream('GET', pdf_url) as response:
+                self.assertEqual(pdf, b''.join([_ async for _ in response.aiter_bytes()]))
+            response = await client.get(pdf_url + '?partial')
+            self.assertEqual(504, response.status_code)
+            self.assertTrue(response.extensions['replay_miss'])     # not retried
+        self.assertEqual([], self.network_requests)
+        self.assertEqual({'hits': 2, 'misses': 1, 'recorded': 0}, cache.stats())
+        cache.close()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class RecordedCrawlTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp_dir.name)     # the crawler writes its output files relative to the working directory
+        self.site = SimulatedSite(firms=2, reports=2, latency=0)
+
+    @staticmethod
+    def build_pdf(text: str) -> bytes:
+        document = pymupdf.open()
+        document.new_page().insert_text((72, 96), text, fontsize=12)
+        content = document.tobytes()
+        document.close()
+        return content
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        """Serve the simulated sites, a distinct report for each url, answering the conditional requests with a 304"""
+        if request.headers.get('If-None-Match') == '"v1"':
+            return httpx.Response(304, headers={'ETag': '"v1"'})
+        response = await self.site.handle(request)
+        if request.url.path.endswith('.pdf') and response.status_code == 200:
+            response = httpx.Response(200, headers=response.headers, content=self.build_pdf(str(request.url)))
+        response.headers['ETag'] = '"v1"'
+        return response
+
+    async def crawl(self, **kwargs) -> list[dict]:
+        """Run the crawl against the simulated sites, getting the written documents"""
+        async def handle_async_request(_, request: httpx.Request) -> httpx.Response:
+            return await self.handle(request)
+
+        with (
+            mock.patch.object(httpx.AsyncHTTPTransport, 'handle_async_request', handle_async_request),
+            mock.patch('src.data_crawler.__main__.safely_start_logger', mock.AsyncMock()),
+            mock.patch('src.data_crawler.__main__.scrape_hl_index_stocks_table', mock.AsyncMock(return_value=[])),
+            mock.patch('src.data_crawler.__main__.scrape_ar_stocks_table', return_value=self.site.requests()),
+        ):
+            await main(**kwargs)
+        with jsonlines.open(DATA_JSONL_PATH) as _:
+            return [record for record in _ if 'conversion' in record]   # the converted reports
+
+    async def test_replay_recorded_crawl(self):
+        # Earlier crawl completing every report and storing the validators of the pages
+        documents = await self.crawl()
+        self.assertEqual(self.site.documents, len(documents))
+
+        # Recorded crawl requesting the completed reports and the unchanged pages again
+        await self.crawl(record=True)
+        self.assertEqual(self.site.documents, len(ResponseCache().connection.execute(
+            "SELECT url FROM responses WHERE url LIKE '%.pdf%'"
+        ).fetchall()))
+
+        # Nothing is lost when the dataset is rebuilt from the cache
+        replayed = await self.crawl(replay=True)
+        self.assertEqual(sorted([_['doc'] for _ in documents]), sorted([_['doc'] for _ in replayed]))
+
+    async def test_stores_closed_when_records_are_left(self):
+        with (
+            mock.patch.object(JsonlWriter, 'close', side_effect=OSError(28, 'No space left on device')),
+            mock.patch.object(CrawlState, 'close', autospec=True, side_effect=CrawlState.close) as close_state,
+            mock.patch.object(ConversionCache, 'close', autospec=True, side_effect=ConversionCache.close) as close,
+            self.assertRaises(OSError)
+        ):
+            await self.crawl()
+        close_state.assert_called_once()
+        close.assert_called_once()
+
+        # The run isn't finished, the next crawl resumes it
+        state = CrawlState()
+        state.start()
+        self.assertTrue(state.is_resumed)
+        state.close()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class DocumentIndexTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index = DocumentIndex(os.path.join(self.tmp_dir.name, 'documents.sqlite'))
+        self.data_path = os.path.join(self.tmp_dir.name, 'data.jsonl')
+        self.client = AsyncClient(transport=httpx.MockTransport(lambda _: httpx.Response(200, content=b'%PDF-1.7')))
+
+        async def convert(*args):
+            await asyncio.sleep(0.05)
+            return '# abrdn annual report'
+
+        self.conversion_pool = mock.Mock(profile='markdown', triage=False)
+        self.conversion_pool.convert = mock.AsyncMock(side_effect=convert)
+
+    async def get_response(self, url: str, ticker: str) -> ScrapeResponse:
+        request = ScrapeRequest(
+            {
+                'url': url, 'method': 'GET', 'data_type': 'annual_report', 'year': '2023',
+                'share': {'title': 'abrdn', 'ticker': ticker}
+            },
+            self.client.build_request('GET', url),
+            parse_pdf_file
+        )
+        await request.send(self.client)
+        response = ScrapeResponse(request)
+        response.consume(self.client)
+        return response
+
+    async def test_duplicated_pdfs_are_converted_once(self):
+        hl_response = await self.get_response('https://www.hl.co.uk/abrdn-2023.pdf', 'ABDN')
+        ar_response = await self.get_response('https://www.annualreports.com/abrdn-2023.pdf', 'ABDN')
+        digest = hl_response.content_hash
+        self.assertEqual(digest, ar_response.content_hash)
+        responses = asyncio.Queue()
+        await responses.put(hl_response)
+        await responses.put(ar_response)
+
+        with mock.patch(
+            'src.data_crawler.scrape_requests.handlers.consumers.scrape_response_consumer.DATA_JSONL_PATH',
+            self.data_path
+        ):
+            consumers = [
+                asyncio.create_task(ScrapeResponseConsumer(
+                    self.client, asyncio.Queue(), responses, _, self.conversion_pool, document_index=self.index
+                )())
+                for _ in range(2)
+            ]
+            async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                await responses.join()
+            [_.cancel() for _ in consumers]
+
+        self.conversion_pool.convert.assert_awaited_once()
+        with open(self.data_path) as _:
+            self.assertEqual(1, len(_.readlines()))
+        self.assertEqual({'converted': 1, 'reused': 1, 'aliases': 1}, self.index.stats())
+        self.assertEqual('https://www.hl.co.uk/abrdn-2023.pdf', self.index.get_primary_url(digest))
+
+        # Later downloads of the same content are converted by the pool, through its versioned conversion cache
+        response = await self.get_response('https://www.hl.co.uk/abrdn-2023-mirror.pdf', 'ABDN')
+        self.assertEqual('# abrdn annual report', await response.get_document(self.conversion_pool, self.index))
+        self.assertEqual(2, self.conversion_pool.convert.await_count)
+        response.release()
+
+    async def test_conversions_of_each_page_set(self):
+        async def convert():
+            await asyncio.sleep(0.05)
+            return '# abrdn annual report'
+
+        # Conversions in flight are only shared by the same triaged pages
+        converted = await asyncio.gather(
+            self.index.get_document('abc', convert, 'markdown', [0, 1, 2]),
+            self.index.get_document('abc', convert, 'markdown', [0, 1, 2]),
+            self.index.get_document('abc', convert, 'markdown', [1, 2]),
+            self.index.get_document('abc', convert, 'markdown'),
+        )
+        self.assertEqual(['# abrdn annual report'] * 4, converted)
+        self.assertEqual({'converted': 3, 'reused': 1, 'aliases': 0}, self.index.stats())
+
+    async def test_stale_conversions(self):
+        # Indexes written before the conversion cache hold conversions of older converter versions
+        response = await self.get_response('https://www.hl.co.uk/abrdn-2023.pdf', 'ABDN')
+        path = os.path.join(self.tmp_dir.name, 'documents-v2.sqlite')
+        connection = sqlite3.connect(path)
+        with connection as _:
+            _.execute('CREATE TABLE conversions (digest TEXT, profile TEXT, markdown TEXT, converted_at REAL)')
+            _.execute(
+                'INSERT INTO conversions VALUES (?, ?, ?, ?)',
+                (response.content_hash, 'markdown', '# stale annual report', 0)
+            )
+        connection.close()
+        index = DocumentIndex(path)
+        self.assertEqual('# abrdn annual report', await response.get_document(self.conversion_pool, index))
+        self.assertEqual({'converted': 1, 'reused': 0, 'aliases': 0}, index.stats())
+
+        # Conversions of each profile are kept apart
+        self.conversion_pool.profile = 'text'
+        jsonline = await response.jsonl(self.conversion_pool, index)
+        self.assertEqual('text', jsonline['conversion'])
+        self.assertEqual(2, self.conversion_pool.convert.await_count)
+        response.release()
+        index.close()
+
+    async def test_documents_with_every_page_triaged_away(self):
+        stats = {'pages': 3, 'converted': 0, 'blank': 2, 'image': 1, 'boilerplate': 0}
+        self.conversion_pool.triage = True
+        self.conversion_pool.triage_pages = mock.AsyncMock(return_value={'pages': [], 'stats': stats})
+        error_path = os.path.join(self.tmp_dir.name, 'error.jsonl')
+        responses = asyncio.Queue()
+        await responses.put(await self.get_response('https://www.hl.co.uk/abrdn-2023.pdf', 'ABDN'))
+
+        consumer_path = 'src.data_crawler.scrape_requests.handlers.consumers.scrape_response_consumer'
+        with mock.patch(f'{consumer_path}.DATA_JSONL_PATH', self.data_path), \
+                mock.patch(f'{consumer_path}.ERROR_JSONL_PATH', error_path):
+            consumer = asyncio.create_task(ScrapeResponseConsumer(
+                self.client, asyncio.Queue(), responses, 0, self.conversion_pool, document_index=self.index
+            )())
+            async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                await responses.join()
+            consumer.cancel()
+
+        # Logged with its triage stats instead of written without contents
+        self.conversion_pool.convert.assert_not_awaited()
+        self.assertFalse(os.path.exists(self.data_path))
+        with jsonlines.open(error_path) as _:
+            errors = list(_)
+        self.assertEqual(1, len(errors))
+        self.assertEqual(('skipped', stats), (errors[0]['outcome'], errors[0]['pages']))
+        self.assertEqual('https://www.hl.co.uk/abrdn-2023.pdf', errors[0]['url'])
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class ConversionCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'conversion-cache.sqlite')
+        self.cache = ConversionCache(self.path, max_bytes=100)
+
+    def test_keys(self):
+        self.cache.put('abc', '1', {'profile': 'markdown', 'pages': None}, '# abrdn annual report')
+        self.assertEqual('# abrdn annual report', self.cache.get('abc', '1', {'pages': None, 'profile': 'markdown'}))
+        self.assertIsNone(self.cache.get('abc', '2', {'profile': 'markdown', 'pages': None}))   # upgraded converter
+        self.assertIsNone(self.cache.get('abc', '1', {'profile': 'text', 'pages': None}))
+        self.assertIsNone(self.cache.get('abc', '1', {'profile': 'markdown', 'pages': [0, 2]}))
+
+        # The conversions are shared with the other processes and runs
+        self.cache.close()
+        cache = ConversionCache(self.path)
+        self.assertEqual('# abrdn annual report', cache.get('abc', '1', {'profile': 'markdown', 'pages': None}))
+        self.assertEqual({'hits': 1, 'misses': 0, 'evicted': 0, 'conversions': 1, 'size': 21}, cache.stats())
+        cache.close()
+
+    def test_least_recently_used_eviction(self):
+        for digest in ['a', 'b', 'c']:
+            self.cache.put(digest, '1', {}, digest * 40)
+            time.sleep(0.01)
+        self.assertEqual(2, self.cache.stats()['conversions'])
+        self.assertIsNone(self.cache.get('a', '1', {}))
+
+        self.cache.get('b', '1', {})    # c is now the least recently used
+        time.sleep(0.01)
+        self.cache.put('d', '1', {}, 'd' * 40)
+        self.assertEqual('b' * 40, self.cache.get('b', '1', {}))
+        self.assertIsNone(self.cache.get('c', '1', {}))
+        self.assertEqual({'conversions': 2, 'size': 80, 'evicted': 2}, {
+            _: self.cache.stats()[_] for _ in ['conversions', 'size', 'evicted']
+        })
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class BlobStoreTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.blob_store = BlobStore(os.path.join(self.tmp_dir.name, 'blobs'))
+        self.index = DocumentIndex(os.path.join(self.tmp_dir.name, 'blobs', 'documents.sqlite'))
+        self.documents_path = os.path.join(self.tmp_dir.name, 'documents.jsonl')
+        self.contents = {
+            'https://www.hl.co.uk/abrdn-2023.pdf': b'%PDF-1.7 abrdn',
+            'https://www.annualreports.com/abrdn-2023.pdf': b'%PDF-1.7 abrdn',
+            'https://www.hl.co.uk/3i-2023.pdf': b'%PDF-1.7 3i',
+        }
+        self.client = AsyncClient(
+            transport=httpx.MockTransport(lambda _: httpx.Response(200, content=self.contents[str(_.url)]))
+        )
+
+        async def convert(source: str, label: str, pages: list[int] or None = None, digest: str or None = None):
+            with open(source, 'rb') as _:
+                return f'# {label} {_.read().decode()}'
+
+        self.conversion_pool = mock.Mock(size=2, profile='markdown', triage=False)
+        self.conversion_pool.convert = mock.AsyncMock(side_effect=convert)
+
+    async def store(self, *urls: str) -> None:
+        responses = asyncio.Queue()
+        for url in urls:
+            request = ScrapeRequest(
+                {
+                    'url': url, 'method': 'GET', 'data_type': 'annual_report', 'year': '2023',
+                    'share': {'title': url.split('/')[-1][:-9], 'ticker': 'ABDN'}
+                },
+                self.client.build_request('GET', url),
+                parse_pdf_file
+            )
+            await request.send(self.client)
+            response = ScrapeResponse(request)
+            response.consume(self.client)
+            await responses.put(response)
+
+        consumer = asyncio.create_task(ScrapeResponseConsumer(
+            self.client, asyncio.Queue(), responses, 0, self.conversion_pool, blob_store=self.blob_store
+        )())
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            await responses.join()
+        consumer.cancel()
+
+    async def convert(self, reconvert: bool = False) -> dict:
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            return await convert_blobs(
+                self.blob_store, conversion_pool=self.conversion_pool, document_index=self.index,
+                output_path=self.documents_path, reconvert=reconvert
+            )
+
+    def read(self) -> list[dict]:
+        with jsonlines.open(self.documents_path) as _:
+            return list(_)
+
+    async def test_deferred_conversion(self):
+        await self.store(*self.contents.keys())
+        self.conversion_pool.convert.assert_not_awaited()     # downloads are only stored
+        self.assertEqual(
+            {'documents': 3, 'blobs': 2, 'converted': 0, 'pending': 3, 'size': 39}, self.blob_store.stats()
+        )
+
+        stats = await self.convert()
+        self.assertEqual((2, 1, 0), (stats['converted'], stats['aliases'], stats['failed']))
+        self.assertEqual(2, self.conversion_pool.convert.await_count)
+        self.assertEqual(
+            [
+                {'title': 'abrdn', 'ticker': 'ABDN', 'year': '2023', 'document_type': 'annual_report',
+                 'doc': '# abrdn : annual_report 2023 %PDF-1.7 abrdn', 'conversion': 'markdown'},
+                {'title': '3i', 'ticker': 'ABDN', 'year': '2023', 'document_type': 'annual_report',
+                 'doc': '# 3i : annual_report 2023 %PDF-1.7 3i', 'conversion': 'markdown'},
+            ],
+            self.read()
+        )
+
+        # Later runs only convert the new or changed documents
+        self.assertEqual(0, (await self.convert())['converted'])
+        self.contents['https://www.hl.co.uk/3i-2023.pdf'] = b'%PDF-1.7 3i restated'
+        await self.store('https://www.hl.co.uk/3i-2023.pdf', 'https://www.hl.co.uk/abrdn-2023.pdf')
+        self.assertEqual(1, self.blob_store.stats()['pending'])
+        self.assertEqual(1, (await self.convert())['converted'])
+        self.assertEqual(3, len(self.read()))
+
+        # Converting again rewrites the output file without any download
+        self.assertEqual(2, (await self.convert(reconvert=True))['converted'])
+        self.assertEqual(2, len(self.read()))
+        self.assertEqual(5, self.conversion_pool.convert.await_count)
+
+    async def test_deferred_conversion_into_dataset(self):
+        path = os.path.join(self.tmp_dir.name, 'dataset')
+        crawl = ShardedDatasetWriter(path, compression='gzip')
+        crawl.write({'title': 'aviva', 'ticker': 'AV', 'year': '2023', 'document_type': 'annual_report', 'doc': '#'})
+        crawl.close()
+        await self.store(*self.contents.keys())
+
+        async def convert(reconvert: bool = False) -> list[dict]:
+            async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                await convert_blobs(
+                    self.blob_store, conversion_pool=self.conversion_pool, document_index=self.index,
+                    output_path=self.documents_path, reconvert=reconvert,
+                    dataset=ShardedDatasetWriter(path, compression='gzip', name='documents')
+                )
+            return list(ShardedDatasetReader(path))
+
+        # Written into shards of their own next to the crawl's, instead of the output file
+        self.assertEqual(['AV', 'ABDN', 'ABDN'], [_['ticker'] for _ in await convert()])
+        self.assertFalse(os.path.exists(self.documents_path))
+        self.assertEqual(['data-00000.jsonl.gz', 'documents-00000.jsonl.gz', 'index.jsonl'], sorted(os.listdir(path)))
+
+        # Converting again only rewrites the convert stage's shards
+        self.assertEqual(['AV', 'ABDN', 'ABDN'], [_['ticker'] for _ in await convert(reconvert=True)])
+
+    async def test_deferred_conversion_with_every_page_triaged_away(self):
+        stats = {'pages': 3, 'converted': 0, 'blank': 3, 'image': 0, 'boilerplate': 0}
+        self.conversion_pool.triage = True
+        self.conversion_pool.triage_pages = mock.AsyncMock(return_value={'pages': [], 'stats': stats})
+        error_path = os.path.join(self.tmp_dir.name, 'error.jsonl')
+        await self.store('https://www.hl.co.uk/3i-2023.pdf')
+
+        with mock.patch('src.data_crawler.conversion.blob_converter.ERROR_JSONL_PATH', error_path):
+            result = await self.convert()
+
+        # Logged with its triage stats instead of written without contents, and not converted again
+        self.assertEqual((0, 1, 0), (result['converted'], result['skipped'], result['failed']))
+        self.conversion_pool.convert.assert_not_awaited()
+        self.assertFalse(os.path.exists(self.documents_path))
+        with jsonlines.open(error_path) as _:
+            errors = list(_)
+        self.assertEqual([('skipped', stats)], [(_['outcome'], _['pages']) for _ in errors])
+        self.assertEqual(0, self.blob_store.stats()['pending'])
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    def tearDown(self):
+        self.blob_store.close()
+        self.index.close()
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class JsonlWriterTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_path = os.path.join(self.tmp_dir.name, 'data.jsonl')
+        self.error_path = os.path.join(self.tmp_dir.name, 'error.jsonl')
+
+    def read(self, path: str) -> list[dict]:
+        with jsonlines.open(path) as _:
+            return list(_)
+
+    async def test_batched_writes(self):
+        writer = JsonlWriter(flush_size=1024, flush_interval=0.05)
+        writer.start()
+        written = []
+
+        # Size threshold
+        for _ in range(10):
+            writer.write(self.data_path, {'ticker': 'ABDN', 'doc': 'é' * 100}, lambda i=_: written.append(i))
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            while len(written) < 5:
+                await asyncio.sleep(0.001)
+        self.assertGreaterEqual(len(self.read(self.data_path)), len(written))
+
+        # Time threshold
+        writer.write(self.error_path, {'response': 404})
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            while len(written) < 10 or not os.path.exists(self.error_path):
+                await asyncio.sleep(0.01)
+        self.assertEqual(list(range(10)), written)
+        self.assertEqual([{'response': 404}], self.read(self.error_path))
+
+        # Shutdown
+        writer.write(self.data_path, {'ticker': 'III', 'doc': None})
+        await writer.close()
+        records = self.read(self.data_path)
+        self.assertEqual(11, len(records))
+        self.assertEqual({'ticker': 'III', 'doc': None}, records[-1])
+        stats = writer.stats()
+        self.assertEqual(12, stats['records'])
+        self.assertEqual(0, stats['pending'])
+        self.assertEqual(os.path.getsize(self.data_path) + os.path.getsize(self.error_path), stats['bytes'])
+
+    async def test_failed_writes(self):
+        writer = JsonlWriter(flush_size=1024, flush_interval=0.01)
+        writer.start()
+        written = []
+        failing = True
+
+        def open_file(*args, **kwargs):
+            if failing:
+                raise OSError(28, 'No space left on device')
+            return open(*args, **kwargs)
+
+        with mock.patch('src.data_crawler.storage.jsonl_writer.open', side_effect=open_file):
+            # Kept buffered while failing
+            for _ in range(3):
+                writer.write(self.data_path, {'ticker': 'ABDN', 'year': 2020 + _}, lambda i=_: written.append(i))
+            await asyncio.sleep(0.1)
+            self.assertEqual([], written)
+            self.assertEqual(3, writer.pending)
+            self.assertFalse(os.path.exists(self.data_path))
+
+            # Retried once writable
+            failing = False
+            async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                while len(written) < 3:
+                    await asyncio.sleep(0.01)
+            self.assertEqual([0, 1, 2], written)
+            self.assertEqual([2020, 2021, 2022], [_['year'] for _ in self.read(self.data_path)])
+
+            # Failing loudly on close
+            failing = True
+            writer.write(self.error_path, {'response': 404}, lambda: written.append(3))
+            with self.assertRaises(OSError):
+                await writer.close()
+        self.assertEqual([0, 1, 2], written)
+        self.assertEqual(1, writer.stats()['pending'])
+        self.assertEqual(3, writer.stats()['records'])
+
+    async def test_failed_dataset_writes(self):
+        dataset = ShardedDatasetWriter(os.path.join(self.tmp_dir.name, 'dataset'), compression='gzip')
+        writer = JsonlWriter(flush_size=1024, flush_interval=0.01, datasets={self.data_path: dataset})
+        writer.start()
+        written = []
+
+        # Compression errors keep the records buffered as well, instead of stopping the writer
+        compress = mock.Mock(side_effect=ValueError('Unsupported compression level'))
+        with mock.patch('src.data_crawler.storage.sharded_dataset.compress', compress):
+            for _ in range(2):
+                writer.write(self.data_path, {'ticker': 'ABDN', 'year': 2020 + _}, lambda i=_: written.append(i))
+            async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+                while compress.call_count < 2:    # retried
+                    await asyncio.sleep(0.01)
+            self.assertEqual([], written)
+            self.assertEqual(2, writer.pending)
+        await writer.close()
+        self.assertEqual([0, 1], written)
+        self.assertEqual([2020, 2021], [_['year'] for _ in ShardedDatasetReader(str(dataset.path))])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class ShardedDatasetTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.records = [
+            {'title': 'abrdn', 'ticker': 'ABDN', 'year': str(year), 'document_type': 'annual_report', 'doc': f'# {year}'}
+            for year in range(2015, 2025)
+        ]
+
+    async def test_sharded_writes(self):
+        dataset = ShardedDatasetWriter(self.tmp_dir.name, compression='gzip', shard_size=64)
+        writer = JsonlWriter(datasets={'data.jsonl': dataset})
+        writer.start()
+        for record in self.records:
+            writer.write('data.jsonl', record)
+        await writer.close()
+
+        # Documents are listed from the index and read by seeking to them
+        reader = ShardedDatasetReader(self.tmp_dir.name)
+        index = list(reader.index())
+        self.assertEqual(10, len(index))
+        self.assertEqual(
+            {'title': 'abrdn', 'ticker': 'ABDN', 'document_type': 'annual_report', 'year': '2020', 'doc_length': 6},
+            {k: v for k, v in index[5].items() if k not in ('shard', 'offset', 'length')}
+        )
+        self.assertEqual(self.records[5], reader.read(index[5]))
+        self.assertEqual(self.records, list(reader))
+
+        # Shards are rotated and are valid gzip compressed jsonlines files on their own
+        shards = sorted({_['shard'] for _ in index})
+        self.assertGreater(len(shards), 1)
+        with gzip.open(os.path.join(self.tmp_dir.name, shards[0]), 'rt') as _:
+            self.assertEqual(self.records[0], json.loads(_.readline()))
+
+        # New writers append new shards
+        dataset = ShardedDatasetWriter(self.tmp_dir.name, compression='gzip', shard_size=64)
+        dataset.write(self.records[0])
+        dataset.close()
+        self.assertEqual(11, len(list(reader.index())))
+        self.assertNotIn(list(reader.index())[-1]['shard'], shards)
+
+    def test_clear_own_shards(self):
+        writers = [
+            ShardedDatasetWriter(self.tmp_dir.name, compression='gzip', shard_size=64, name=_)
+            for _ in ('data', 'data-1a2b-42', 'data-7-42')    # worker shards, their host names starting with digits
+        ]
+        for record in self.records:
+            for writer in writers:
+                writer.write(record)
+        for writer in writers:
+            writer.close()
+
+        # Only the shards and index rows of the cleared writer are removed
+        writers[0].clear()
+        index = list(ShardedDatasetReader(self.tmp_dir.name).index())
+        self.assertEqual(20, len(index))
+        self.assertFalse(any([writers[0].is_shard(_['shard']) for _ in index]))
+        self.assertEqual(sorted([_['shard'] for _ in index]), sorted(os.listdir(self.tmp_dir.name))[:-1])
+
+        # New writers start after their own shards only
+        self.assertEqual('data-00000.jsonl.gz', ShardedDatasetWriter(self.tmp_dir.name, 'gzip').shard_name)
+        worker = ShardedDatasetWriter(self.tmp_dir.name, 'gzip', name='data-7-42')
+        self.assertEqual(f'data-7-42-{len(writers[2].shards()):05d}.jsonl.gz', worker.shard_name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+if __name__ == '__main__':
+    unittest.main()
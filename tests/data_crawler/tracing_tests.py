@@ -0,0 +1,151 @@
+import unittest
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import httpx
+import pypdf
+
+from unittest import mock
+from io import BytesIO
+
+from src.data_crawler.constants import ASYNC_AWAIT_TIMEOUT, LOGGING_CONFIG
+from src.data_crawler.conversion import ConversionPool
+from src.data_crawler.parsers.ar_parse import parse_firms_detail_page
+from src.data_crawler.scrape_requests.handlers.consumers import ScrapeRequestConsumer
+from src.data_crawler.scrape_requests.handlers.scrape_request_handler import scrape_request_handler
+from src.data_crawler.tracing import Tracer, tracer
+
+
+# Set up Logger
+logging.basicConfig(**LOGGING_CONFIG['testing'])
+logger = logging.getLogger('Tracing Tests')
+
+
+async def delay(*args):
+    await asyncio.sleep(0)
+    return True
+
+
+def read_trace(path: str) -> list[dict]:
+    with open(path, 'r') as _:
+        return json.load(_)
+
+
+class TracerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'trace.json')
+        self.tracer = Tracer()
+
+    def test_disabled(self):
+        self.assertIsNone(self.tracer.trace('https://www.hl.co.uk/abrdn-2023.pdf'))
+        with self.tracer.span(None, 'network') as span:
+            span.end(status=200)
+        self.tracer.start(self.path, sample_rate=0)
+        self.assertIsNone(self.tracer.trace('https://www.hl.co.uk/abrdn-2023.pdf'))
+        self.tracer.stop()
+        self.assertEqual([], read_trace(self.path))
+
+    def test_spans(self):
+        self.tracer.start(self.path, sample_rate=1)
+        trace = self.tracer.trace('https://www.hl.co.uk/abrdn-2023.pdf')
+        self.tracer.wait(trace, 'task_queue')
+        with self.tracer.span(trace, 'network', host='www.hl.co.uk') as span:
+            span.end(status=200)
+        self.tracer.instant(trace, 'retry', attempt=1)
+        with self.assertRaises(ValueError):
+            with self.tracer.span(trace, 'parse_pdf_file'):
+                raise ValueError()
+        self.tracer.stop()
+
+        events = read_trace(self.path)
+        self.assertEqual(
+            ['thread_name', 'task_queue', 'network', 'retry', 'parse_pdf_file'], [_['name'] for _ in events]
+        )
+        self.assertEqual({trace.id}, {_['tid'] for _ in events})
+        self.assertEqual('https://www.hl.co.uk/abrdn-2023.pdf', events[0]['args']['name'])
+        self.assertEqual({'host': 'www.hl.co.uk', 'status': 200}, events[2]['args'])
+        self.assertEqual(['M', 'X', 'X', 'i', 'X'], [_['ph'] for _ in events])
+        self.assertEqual({'error': 'ValueError'}, events[4]['args'])
+        self.assertLessEqual(events[1]['ts'] + events[1]['dur'], events[2]['ts'])
+
+    def test_interrupted_trace(self):
+        self.tracer.start(self.path, sample_rate=1, buffer_size=2)
+        trace = self.tracer.trace('https://www.hl.co.uk/abrdn-2023.pdf')
+        self.tracer.instant(trace, 'redirect')
+        self.tracer.instant(trace, 'retry')
+        with open(self.path, 'r') as _:
+            content = _.read()
+        self.assertEqual(2, len(json.loads(content + ']')))   # trace viewers accept the array left open
+
+    def tearDown(self):
+        self.tracer.stop()
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+class TracedCrawlTestCase(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        logger.debug(f'{"-" * 20} Starting {self.__class__.__name__} case... {"-" * 20}')
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'trace.json')
+
+        with open('./tests/mocks/data_crawler/ar-firm-detail-page-abrdn.mock.html', 'r') as _:
+            self.firms_detail_page_response_mock = _.read()
+        self.request_mock = mock.Mock(httpx.Request, method='GET', url='http://test.url')
+        writer = pypdf.PdfWriter()
+        writer.add_blank_page(100, 100)
+        byte_stream = BytesIO()
+        writer.write_stream(byte_stream)
+        self.pdf_response_mock = byte_stream.getvalue()
+
+        self.conversion_pool = mock.Mock(ConversionPool, size=2, queue_depth=0, profile='markdown', triage=False)
+        self.conversion_pool.convert = mock.AsyncMock(return_value='# abrdn annual report')
+
+    @mock.patch('httpx.AsyncClient.send', new_callable=mock.AsyncMock)
+    @mock.patch('httpx.AsyncClient.request', new_callable=mock.AsyncMock)
+    @mock.patch.object(ScrapeRequestConsumer, 'delay_request', delay)
+    async def test_request_lifecycle(
+            self,
+            async_client_mock: mock.AsyncMock,
+            async_client_send_mock: mock.AsyncMock,
+    ) -> None:
+        async_client_mock.side_effect = [
+            httpx.Response(200, content=self.firms_detail_page_response_mock, request=self.request_mock),
+        ]
+        async_client_send_mock.side_effect = lambda *args, **kwargs: httpx.Response(
+            200, content=self.pdf_response_mock, request=self.request_mock
+        )
+
+        tracer.start(self.path, sample_rate=1)
+        requests = [{'metadata': {}, 'method': 'GET', 'url': 'http://test.url', 'consumer': parse_firms_detail_page}]
+        async with asyncio.timeout(ASYNC_AWAIT_TIMEOUT):
+            await scrape_request_handler(requests, conversion_pool=self.conversion_pool)
+        tracer.stop()
+
+        traces = {}
+        for event in read_trace(self.path):
+            traces.setdefault(event['tid'], []).append(event['name'])
+        self.assertEqual(11, len(traces))   # the firm's page and its 10 reports
+        self.assertIn(
+            ['thread_name', 'task_queue', 'delay_request', 'network', 'parse_firms_detail_page', 'response_queue'],
+            traces.values()
+        )
+        self.assertEqual(10, list(traces.values()).count([
+            'thread_name', 'task_queue', 'delay_request', 'network', 'parse_pdf_file', 'response_queue', 'conversion',
+            'writer'
+        ]))
+
+    def tearDown(self):
+        tracer.stop()
+        self.tmp_dir.cleanup()
+        logger.debug(f'{"-" * 20} Ending {self.__class__.__name__} case... {"-" * 20}')
+
+
+if __name__ == '__main__':
+    unittest.main()